@@ -5,7 +5,12 @@ from diffusers import StableDiffusionInpaintPipeline
 from backend.core.config import settings
 from backend.services.logging import logger
 from backend.utils.memory import memory_manager
+from backend.services.image_cache import image_cache
+from backend.services.pyramid import select_level
+from backend.services.storage import save_generated_image
+from typing import Optional
 import gc
+import uuid
 
 class InpaintProvider:
     def __init__(self):
@@ -62,20 +67,29 @@ class InpaintProvider:
             logger.error(f"Failed to load inpaint model: {e}")
             raise
 
-    def inpaint(self, image_path: Path, mask_path: Path, prompt: str, strength: float = 1.0) -> Path:
+    def inpaint(self, image_path: Path, mask_path: Path, prompt: str, strength: float = 1.0, output_format: Optional[str] = None) -> Path:
+        # Loading and inference hold the GPU slot; only the encode runs after it is released
+        with memory_manager.gpu_lock:
+            output = self._inpaint_locked(image_path, mask_path, prompt, strength)
+
+        # Save output (encoded on a worker thread)
+        return save_generated_image(
+            output, fmt=output_format, stem=f"edit_{image_path.stem}_{uuid.uuid4().hex[:8]}",
+            parent_id=image_path.stem, operation="inpaint"
+        )
+
+    def _inpaint_locked(self, image_path: Path, mask_path: Path, prompt: str, strength: float) -> Image.Image:
         self.initialize()
         
-        # Open images
-        image = Image.open(image_path).convert("RGB")
-        mask_image = Image.open(mask_path).convert("L") # Mask must be grayscale
-        
         # Prepare mask and image
         # STRICT RULE: Cap resolution at 512x512
         target_size = (512, 512)
         
         # Resize inputs -> Strictly 512x512 for optimization
         # (Even for Normal mode, keeping 512 for inpainting consistency is better)
-        image_resized = image.resize(target_size, Image.Resampling.LANCZOS)
+        level_path, _ = select_level(image_path, min_short=max(target_size))
+        image_resized = image_cache.get_pil(level_path, target_size, Image.Resampling.LANCZOS)
+        mask_image = Image.open(mask_path).convert("L") # Mask must be grayscale
         mask_resized = mask_image.resize(target_size, Image.Resampling.NEAREST)
         
         # Enhanced prompt
@@ -126,12 +140,7 @@ class InpaintProvider:
                     guidance_scale=7.0     
                 ).images[0]
 
-        # Save output
-        output_filename = f"edit_{image_path.name}"
-        output_path = settings.generated_dir / output_filename
-        output.save(output_path)
-        
-        return output_path
+        return output
 
 # Global instance
 inpaint_provider = InpaintProvider()
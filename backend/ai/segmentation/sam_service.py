@@ -1,81 +1,131 @@
 import torch
 import numpy as np
 import cv2
-import os
 import gc
+import uuid
+import threading
+from collections import OrderedDict
 from typing import Optional
 from pathlib import Path
-from ultralytics import SAM
+from ultralytics.models.sam import Predictor as SAMPredictor
 from backend.services.logging import logger
 from backend.core.config import settings
 from backend.utils.memory import memory_manager
+from backend.services.image_cache import image_cache
+from backend.services.pyramid import select_level, original_size
+from backend.services.asset_registry import asset_registry
 
 class SamSegmenter:
+    # Image embeddings kept in RAM (~4MB each for sam_b)
+    MAX_CACHED_EMBEDDINGS = 8
+
     def __init__(self):
         self.model = None
         # STRICT RULE: SAM must ALWAYS run on CPU for both profiles
         self.device = "cpu"
         self.model_name = "sam_b.pt"
+        # image path -> encoder features, so clicks on the same image skip the ViT encoder
+        self._embeddings = OrderedDict()
+        # The predictor holds per-image state; precompute and requests share it
+        self._lock = threading.Lock()
 
     def initialize(self):
-        """Lazy load SAM model on CPU."""
+        """Lazy load SAM predictor on CPU."""
         if self.model is not None:
             return
 
         logger.info(f"Loading Ultralytics SAM model ({self.model_name})...")
         try:
-            self.model = SAM(self.model_name)
-            # FORCE CPU - Never allow CUDA
-            self.model.to("cpu")
-            
+            self.model = SAMPredictor(overrides={
+                "model": self.model_name,
+                "task": "segment",
+                "mode": "predict",
+                "imgsz": 1024,
+                "device": "cpu", # FORCE CPU - Never allow CUDA
+                "retina_masks": True,
+                "save": False,
+                "verbose": False
+            })
+
             # Log strictly as requested
             logger.info("[SAM] device=cpu dtype=float32 (LOW_VRAM)")
-            
+
             # We do NOT register with memory_manager because it doesn't use VRAM
             logger.info("SAM model loaded successfully.")
         except Exception as e:
             logger.error(f"Failed to load SAM model: {e}")
             raise RuntimeError(f"Could not load SAM model. Error: {e}")
 
+    def _set_image(self, image_path: Path):
+        """
+        Point the predictor at an image, reusing cached encoder features if present.
+        Returns (BGR array to pass as the prediction source, level scale).
+        """
+        key = str(image_path)
+        # SAM encodes at 1024 on the long side - never feed it more than that
+        level_path, scale = select_level(image_path, min_long=1024)
+        image = image_cache.get_array(level_path, order="BGR")
+        features = self._embeddings.get(key)
+        if features is not None:
+            self._embeddings.move_to_end(key)
+            self.model.setup_source(image)
+            self.model.features = features
+            return image, scale
+
+        self.model.set_image(image)
+        self._embeddings[key] = self.model.features
+        while len(self._embeddings) > self.MAX_CACHED_EMBEDDINGS:
+            self._embeddings.popitem(last=False)
+        return image, scale
+
+    def precompute_embedding(self, image_path: Path) -> bool:
+        """
+        Run the SAM image encoder ahead of time (called from the upload pipeline).
+        Returns True if the embedding is cached.
+        """
+        self.initialize()
+        with self._lock:
+            if str(image_path) not in self._embeddings:
+                self._set_image(image_path)
+        return True
+
     def generate_mask(self, image_path: Path, x: Optional[int] = None, y: Optional[int] = None, box: Optional[list] = None) -> Path:
         """
         Generate mask from a single point click or box using Ultralytics SAM.
         Returns path to saved mask.
         """
         self.initialize()
-        
-        # Prepare prompts
-        kwargs = {
-            "source": str(image_path),
-            "device": "cpu", # Explicitly CPU
-            "retina_masks": True,
-            "verbose": False
-        }
-        
-        if box:
-            kwargs["bboxes"] = [box]
-        elif x is not None and y is not None:
-            kwargs["points"] = [[x, y]]
-            kwargs["labels"] = [1]
-        else:
+
+        if not box and (x is None or y is None):
             raise ValueError("Must provide either point (x,y) or box.")
 
         # Predict
         try:
-            results = self.model(**kwargs)
-            
+            with self._lock:
+                image, scale = self._set_image(image_path)
+
+                # Prompts arrive in original-image pixels; map them onto the pyramid level
+                kwargs = {}
+                if box:
+                    kwargs["bboxes"] = [[v * scale for v in box]]
+                else:
+                    kwargs["points"] = [[x * scale, y * scale]]
+                    kwargs["labels"] = [1]
+
+                results = self.model(source=image, **kwargs)
+
             # Extract mask
             if results[0].masks is None:
                 raise ValueError("No mask detected at this point.")
-                
+
             # Get the first mask (usually the best one)
             mask_tensor = results[0].masks.data[0]
-            
+
             # Convert to numpy uint8 (0 or 255)
             mask_np = mask_tensor.cpu().numpy().astype(np.uint8) * 255
-            
-            # Ensure mask is same size as original image
-            orig_h, orig_w = results[0].orig_shape
+
+            # Ensure mask is same size as original image (not the pyramid level)
+            orig_w, orig_h = original_size(image_path) or results[0].orig_shape[::-1]
             # Resize if needed (SAM sometimes returns smaller masks)
             if mask_np.shape[:2] != (orig_h, orig_w):
                  mask_np = cv2.resize(mask_np, (orig_w, orig_h), interpolation=cv2.INTER_NEAREST)
@@ -83,30 +133,26 @@ class SamSegmenter:
             # Dilate mask slightly to cover edges for inpainting
             kernel = np.ones((5, 5), np.uint8)
             mask_dilated = cv2.dilate(mask_np, kernel, iterations=2)
-            
-            # Save mask
-            mask_filename = f"mask_{int(os.path.getmtime(image_path))}_{x}_{y}.png"
+
+            # Save mask (unique name - mtime-based names collided across images)
+            mask_filename = f"mask_{image_path.stem}_{uuid.uuid4().hex[:8]}.png"
             mask_path = settings.storage_dir / "masks" / mask_filename
             mask_path.parent.mkdir(parents=True, exist_ok=True)
-            
+
             cv2.imwrite(str(mask_path), mask_dilated)
+            asset_registry.register(
+                mask_path.stem, "mask", mask_path,
+                width=orig_w, height=orig_h,
+                size_bytes=mask_path.stat().st_size,
+                parent_id=image_path.stem, operation="segment"
+            )
             logger.info(f"Generated mask saved to {mask_path}")
-            
+
             return mask_path
-            
+
         finally:
-            # CLEANUP: No need to offload since it's already CPU
-            pass
-            # We don't need SAM again immediately usually.
-            if self.model:
-                 logger.info("Offloading SAM to CPU...")
-                 self.model.to("cpu")
-                 torch.cuda.empty_cache()
-                 # We need to tell memory manager it's gone?
-                 # Actually, memory manager tracks it. We just moved it.
-                 # But next time ensure_gpu("sam") is called, it might try to offload others.
-                 # Since we manually offloaded, we are good.
-                 pass
+            # CLEANUP: SAM never leaves the CPU, just release any stray cache
+            torch.cuda.empty_cache()
 
 # Global instance
 sam_segmenter = SamSegmenter()
@@ -5,6 +5,8 @@ from pathlib import Path
 from backend.services.logging import logger
 from backend.core.config import settings
 from backend.utils.memory import memory_manager
+from backend.services.image_cache import image_cache
+from backend.services.pyramid import select_level
 
 class YOLODetector:
     """Singleton YOLO detector for furniture detection"""
@@ -63,10 +65,24 @@ class YOLODetector:
         """
         logger.info(f"Running YOLO detection on: {image_path.name}")
         
-        self._load_model()
+        # YOLO letterboxes to 640 on the long side; boxes are mapped back to original pixels
+        level_path, scale = select_level(image_path, min_long=640)
+        image = image_cache.get_array(level_path, order="BGR")
         
-        # Run inference
-        results = self._model(str(image_path), conf=confidence_threshold, verbose=False)
+        # Hold the GPU slot from ensure_gpu() until the model is offloaded again
+        with memory_manager.gpu_lock:
+            self._load_model()
+            
+            # Run inference (Ultralytics takes BGR arrays, same as its own cv2 loader)
+            results = self._model(image, conf=confidence_threshold, verbose=False)
+            
+            # STRICT CLEANUP for LOW_VRAM
+            if settings.low_vram:
+                if self._model:
+                    self._model.to("cpu")
+                    # self._model = None # Optional: Keep object but offload
+                torch.cuda.empty_cache()
+                gc.collect()
         
         detections = []
         
@@ -79,7 +95,7 @@ class YOLODetector:
                 cls_id = int(box.cls[0])
                 label = names[cls_id]
                 confidence = float(box.conf[0])
-                bbox = box.xyxy[0].tolist()  # [x1, y1, x2, y2]
+                bbox = [v / scale for v in box.xyxy[0].tolist()]  # [x1, y1, x2, y2]
                 
                 # Only include mapped furniture categories
                 if label in self.CATEGORY_MAP:
@@ -92,12 +108,4 @@ class YOLODetector:
         
         logger.info(f"✓ Detected {len(detections)} furniture items")
         
-        # STRICT CLEANUP for LOW_VRAM
-        if settings.low_vram:
-            if self._model:
-                self._model.to("cpu")
-                # self._model = None # Optional: Keep object but offload
-            torch.cuda.empty_cache()
-            gc.collect()
-        
         return detections
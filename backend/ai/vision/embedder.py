@@ -0,0 +1,73 @@
+"""
+Compact image encoder for visual similarity search.
+
+CLIP ViT-B/32 image tower: 512-d embeddings, fast enough on CPU to embed a
+batch of detection crops per request. Runs on CPU like the room classifier
+so it never competes with the diffusion models for the GPU slot.
+"""
+import threading
+import time
+from typing import List
+
+import numpy as np
+import torch
+from PIL import Image
+from transformers import CLIPImageProcessor, CLIPVisionModelWithProjection
+
+from backend.core.config import settings
+from backend.services.logging import logger
+
+
+class ImageEmbedder:
+    """Lazy-loaded CLIP image encoder producing L2-normalized embeddings."""
+
+    def __init__(self, model_name: str = settings.visual_embed_model):
+        self.model_name = model_name
+        self.device = "cpu"
+        self.model = None
+        self.processor = None
+        self._lock = threading.Lock()
+
+    def initialize(self):
+        if self.model is not None:
+            return
+        with self._lock:
+            if self.model is not None:
+                return
+            start = time.time()
+            logger.info(f"[Embedder] Loading {self.model_name}")
+            self.processor = CLIPImageProcessor.from_pretrained(self.model_name)
+            model = CLIPVisionModelWithProjection.from_pretrained(self.model_name)
+            model.eval().to(self.device)
+            self.model = model
+            logger.info(f"[Embedder] Loaded in {time.time() - start:.2f}s")
+
+    @property
+    def dim(self) -> int:
+        self.initialize()
+        return self.model.config.projection_dim
+
+    @torch.inference_mode()
+    def embed(self, images: List[Image.Image], batch_size: int = 32) -> np.ndarray:
+        """
+        Embed images in batches.
+
+        Args:
+            images: RGB PIL images (any size; the processor resizes to 224)
+            batch_size: Images per forward pass
+
+        Returns:
+            float32 array of shape (len(images), dim), unit-length rows
+        """
+        self.initialize()
+        out = []
+        for i in range(0, len(images), batch_size):
+            inputs = self.processor(images=images[i:i + batch_size], return_tensors="pt")
+            feats = self.model(pixel_values=inputs["pixel_values"].to(self.device)).image_embeds
+            feats = torch.nn.functional.normalize(feats, dim=-1)
+            out.append(feats.cpu().numpy().astype(np.float32))
+        return np.concatenate(out) if out else np.empty((0, self.dim), dtype=np.float32)
+
+
+# Global instance
+image_embedder = ImageEmbedder()
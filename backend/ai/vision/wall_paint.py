@@ -1,8 +1,13 @@
 import cv2
 import numpy as np
+import uuid
 from pathlib import Path
+from typing import Optional
+from PIL import Image
 from backend.services.logging import logger
 from backend.core.config import settings
+from backend.services.image_cache import image_cache
+from backend.services.storage import save_generated_image
 
 class WallPainter:
     """Non-AI fast recoloring for walls."""
@@ -15,14 +20,14 @@ class WallPainter:
         hsv = cv2.cvtColor(hsv_pixel, cv2.COLOR_BGR2HSV)[0][0]
         return hsv
 
-    def recolor_wall(self, image_path: Path, mask_path: Path, color_hex: str) -> Path:
+    def recolor_wall(self, image_path: Path, mask_path: Path, color_hex: str, output_format: Optional[str] = None) -> Path:
         """
         Recolor wall using HSV preservation (keeps texture, changes hue/sat).
         """
         logger.info(f"Recoloring wall to {color_hex}")
         
         # Load images
-        image = cv2.imread(str(image_path))
+        image = image_cache.get_array(image_path, order="BGR")
         mask = cv2.imread(str(mask_path), 0)  # Load as grayscale
         
         # Resize mask to match image
@@ -59,11 +64,11 @@ class WallPainter:
         # Blend: final = blended * mask + original * (1-mask)
         output = (final_bgr * mask_3ch + image * (1 - mask_3ch)).astype(np.uint8)
         
-        # Save output
-        output_filename = f"recolor_{image_path.name}"
-        output_path = settings.generated_dir / output_filename
-        cv2.imwrite(str(output_path), output)
-        
-        return output_path
+        # Save output (encoded on a worker thread)
+        output_image = Image.fromarray(cv2.cvtColor(output, cv2.COLOR_BGR2RGB))
+        return save_generated_image(
+            output_image, fmt=output_format, stem=f"recolor_{image_path.stem}_{uuid.uuid4().hex[:8]}",
+            parent_id=image_path.stem, operation="recolor"
+        )
 
 wall_painter = WallPainter()
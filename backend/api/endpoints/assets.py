@@ -0,0 +1,82 @@
+from pathlib import Path
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query
+from backend.core.config import settings
+from backend.services.precompute import precompute_pipeline, AssetRecord
+from backend.services.asset_registry import asset_registry, asset_url, ASSET_KINDS
+from backend.services.encoding import thumbnail_path
+from backend.services.pyramid import load_manifest, pyramid_dir
+
+router = APIRouter()
+
+
+def _thumbnail_url(row: dict) -> str:
+    """Smallest ready-made preview for a gallery entry."""
+    if row["kind"] == "generated":
+        return asset_url({"path": thumbnail_path(Path(row["path"])).as_posix()})
+    if row["kind"] == "upload":
+        manifest = load_manifest(settings.storage_dir / row["path"])
+        if manifest and "thumb" in manifest["levels"]:
+            thumb = pyramid_dir(Path(row["path"])) / manifest["levels"]["thumb"]["file"]
+            return asset_url({"path": thumb.as_posix()})
+    return asset_url(row)
+
+
+@router.get("/api/assets")
+async def list_assets(
+    kind: Optional[str] = None,
+    parent_id: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+):
+    """
+    Paginated gallery of indexed assets, newest first.
+    Pass the returned next_cursor to fetch the following page.
+    """
+    if kind and kind not in ASSET_KINDS:
+        raise HTTPException(400, f"Invalid kind: {kind}. Must be one of {list(ASSET_KINDS)}")
+
+    try:
+        rows, next_cursor = asset_registry.list(kind=kind, limit=limit, cursor=cursor, parent_id=parent_id)
+    except ValueError:
+        raise HTTPException(400, f"Invalid cursor: {cursor}")
+
+    return {
+        "items": [
+            {
+                "asset_id": row["asset_id"],
+                "kind": row["kind"],
+                "url": asset_url(row),
+                "thumbnail_url": _thumbnail_url(row),
+                "width": row["width"],
+                "height": row["height"],
+                "parent_id": row["parent_id"],
+                "operation": row["operation"],
+                "created_at": row["created_at"]
+            }
+            for row in rows
+        ],
+        "next_cursor": next_cursor
+    }
+
+
+@router.get("/api/assets/{asset_id}")
+async def get_asset(asset_id: str, wait: Optional[str] = None, timeout: float = 30.0):
+    """
+    Get an asset's index entry; uploads also include their precomputed results.
+    Pass ?wait=<stage> to block (up to timeout seconds) until that stage finishes.
+    """
+    row = asset_registry.get(asset_id)
+    record = precompute_pipeline.ensure(asset_id)
+    if record is None:
+        if row is None:
+            raise HTTPException(404, f"Unknown asset: {asset_id}")
+        # Generated images and masks have no precompute stages
+        return {**row, "url": asset_url(row), "thumbnail_url": _thumbnail_url(row)}
+
+    if wait:
+        if wait not in AssetRecord.STAGES:
+            raise HTTPException(400, f"Invalid stage: {wait}. Must be one of {list(AssetRecord.STAGES)}")
+        await precompute_pipeline.result(asset_id, wait, timeout=timeout)
+
+    return record.to_dict()
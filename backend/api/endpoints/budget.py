@@ -1,7 +1,8 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from backend.core.budget_engine import budget_engine
+from backend.core.config import settings
 from backend.services.logging import logger
 
 router = APIRouter()
@@ -9,6 +10,20 @@ router = APIRouter()
 class CalculateRequest(BaseModel):
     plan_steps: List[Dict[str, Any]]
 
+class Scenario(BaseModel):
+    name: Optional[str] = None
+    quality: Optional[str] = None                   # low / medium / high for every purchase
+    qualities: Dict[int, str] = {}                  # Per-step quality, by step index
+    include: Optional[List[int]] = None             # Only these steps
+    exclude: List[int] = []                         # Drop these steps
+    style: Optional[str] = None                     # Price from this style's items
+    budget: Optional[int] = None                    # Overrides the request budget
+
+class ScenarioRequest(BaseModel):
+    plan_steps: List[Dict[str, Any]]
+    scenarios: List[Scenario]
+    budget: Optional[int] = None
+
 @router.post("/api/budget/calculate")
 async def calculate_cost(request: CalculateRequest):
     """Calculate cost for a plan."""
@@ -17,3 +32,18 @@ async def calculate_cost(request: CalculateRequest):
     except Exception as e:
         logger.error(f"Failed to calculate cost: {e}")
         raise HTTPException(500, str(e))
+
+@router.post("/api/budget/scenarios")
+async def evaluate_scenarios(request: ScenarioRequest):
+    """Price a base plan and many what-if variations of it in one pass."""
+    if len(request.scenarios) > settings.budget_max_scenarios:
+        raise HTTPException(400, f"At most {settings.budget_max_scenarios} scenarios per request")
+    try:
+        return budget_engine.evaluate_scenarios(
+            request.plan_steps,
+            [scenario.model_dump() for scenario in request.scenarios],
+            budget=request.budget
+        )
+    except Exception as e:
+        logger.error(f"Failed to evaluate scenarios: {e}")
+        raise HTTPException(500, str(e))
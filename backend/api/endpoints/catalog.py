@@ -0,0 +1,32 @@
+from typing import Literal, Optional
+from fastapi import APIRouter, HTTPException, Query
+from backend.services.catalog import catalog
+
+router = APIRouter()
+
+@router.get("/api/catalog/search")
+async def search_catalog(
+    category: Optional[str] = None,
+    style: Optional[str] = None,
+    min_price: Optional[int] = Query(None, ge=0),
+    max_price: Optional[int] = Query(None, ge=0),
+    sort: Literal["price_asc", "price_desc"] = "price_asc",
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+):
+    """
+    Catalog items filtered by category, style and price range, sorted by price.
+    Pass the returned next_offset to fetch the following page.
+    """
+    if min_price is not None and max_price is not None and min_price > max_price:
+        raise HTTPException(400, "min_price must not exceed max_price")
+
+    return catalog.search(
+        category=category,
+        style=style,
+        min_price=min_price,
+        max_price=max_price,
+        limit=limit,
+        offset=offset,
+        descending=sort == "price_desc"
+    )
@@ -1,9 +1,18 @@
+import asyncio
+from pathlib import Path
+from typing import Dict, List, Optional
 from fastapi import APIRouter, HTTPException, UploadFile, File, Form
 from backend.services.logging import logger
-from backend.services.storage import save_uploaded_image
+from backend.services.ingest import ingest_upload
+from backend.services.precompute import precompute_pipeline
 from backend.ai.vision.detector import YOLODetector
 from backend.services.replacement_engine import ReplacementEngine
 from backend.services.vendor_links import VendorLinks
+from backend.services.web_suggest import web_suggest
+from backend.services.image_cache import image_cache
+from backend.services.pyramid import select_level
+from backend.services.visual_index import visual_index
+from backend.core.config import settings
 
 router = APIRouter()
 
@@ -12,39 +21,80 @@ yolo_detector = YOLODetector()
 replacement_engine = ReplacementEngine()
 vendor_links = VendorLinks()
 
+
+def _visual_matches(image_path: Path, detections: List[Dict], budget: int) -> List[Dict]:
+    """Embed every detection crop in one batch and look up look-alike catalog items."""
+    from backend.ai.vision.embedder import image_embedder
+
+    # The encoder works at 224px, so a mid pyramid level is plenty for crops
+    level_path, scale = select_level(image_path, min_short=512)
+    image = image_cache.get_pil(level_path)
+    crops = []
+    for detection in detections:
+        x1, y1, x2, y2 = (v * scale for v in detection["bbox"])
+        crops.append(image.crop((int(x1), int(y1), max(int(x2), int(x1) + 1), max(int(y2), int(y1) + 1))))
+
+    vectors = image_embedder.embed(crops)
+    matches = visual_index.search(vectors, [d["category"] for d in detections], max_price=budget)
+    return [
+        {"detection_index": index, "items": items}
+        for index, items in enumerate(matches)
+    ]
+
+
 @router.post("/vision/detect")
 async def detect_furniture(
-    image: UploadFile = File(...),
+    image: Optional[UploadFile] = File(None),
     budget: int = Form(...),
+    asset_id: Optional[str] = Form(None),
 ):
     """Detect furniture and suggest replacements."""
     logger.info("=== Furniture Detection Request ===")
     logger.info(f"Budget: {budget}")
     
-    if not image.content_type.startswith("image/"):
-        raise HTTPException(status_code=400, detail="File must be an image")
+    detections = None
+    if asset_id:
+        # Reuse the upload-time YOLO pass instead of re-uploading/re-detecting
+        record = precompute_pipeline.ensure(asset_id)
+        if record is None:
+            raise HTTPException(status_code=404, detail=f"Unknown asset: {asset_id}")
+        image_path = record.path
+        detections = await precompute_pipeline.result(asset_id, "detections", timeout=60.0)
+    else:
+        if image is None:
+            raise HTTPException(status_code=400, detail="Provide an image or an asset_id")
+        if not image.content_type.startswith("image/"):
+            raise HTTPException(status_code=400, detail="File must be an image")
+        
+        try:
+            image_path = await ingest_upload(image)
+            logger.info(f"Saved upload: {image_path.name}")
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to save image: {str(e)}")
     
-    try:
-        image_data = await image.read()
-        image_path = save_uploaded_image(image_data, image.filename)
-        logger.info(f"Saved upload: {image_path.name}")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to save image: {str(e)}")
-    
-    try:
-        detections = yolo_detector.detect_furniture(image_path)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Detection failed: {str(e)}")
+    if detections is None:
+        try:
+            detections = await asyncio.to_thread(yolo_detector.detect_furniture, image_path)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Detection failed: {str(e)}")
     
     try:
-        suggestions, remaining_budget = replacement_engine.suggest_replacements(detections, budget)
+        suggestions, remaining_budget, allocations = await asyncio.to_thread(
+            replacement_engine.suggest_replacements, detections, budget
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Suggestion generation failed: {str(e)}")
     
+    visual_matches = []
+    if settings.visual_search_enabled and detections and visual_index.available:
+        try:
+            visual_matches = await asyncio.to_thread(_visual_matches, image_path, detections, budget)
+        except Exception as e:
+            logger.warning(f"Visual search failed: {e}")
+
     # Get online suggestions for each detected category using vendor directory or web search
-    from backend.services.web_suggest import WebSuggest
-    web_suggest = WebSuggest()
-    
     online_suggestions = {}
     for detection in detections:
         category = detection["category"]
@@ -56,13 +106,18 @@ async def detect_furniture(
                 # If no static links, fall back to Web Search
                 if not links.get("results"):
                     logger.info(f"Using WebSuggest for {category}")
-                    links = web_suggest.search_suggestions(category, budget=budget)
+                    links = await web_suggest.search_suggestions(category, budget=budget)
                 
                 online_suggestions[category] = links
                 logger.info(f"✓ Loaded {len(online_suggestions[category]['results'])} links for {category}")
             except Exception as e:
                 logger.warning(f"Links failed for {category}: {e}")
-                online_suggestions[category] = {"results": [], "cache": "error", "latency_ms": 0}
+                online_suggestions[category] = {
+                    "results": [],
+                    "source": None,
+                    "cache": {"status": "error", "key": category, "hit_rate": None},
+                    "latency_ms": 0
+                }
     
     logger.info(f"✓ Detection complete: {len(detections)} items, {len(suggestions)} suggestions")
     logger.info("=== Request Complete ===")
@@ -70,6 +125,8 @@ async def detect_furniture(
     return {
         "detections": detections,
         "suggestions": suggestions,
+        "allocations": allocations,
+        "visual_matches": visual_matches,
         "online_suggestions": online_suggestions,
         "remaining_budget": remaining_budget
     }
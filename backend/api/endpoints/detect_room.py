@@ -1,19 +1,36 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException
-from backend.services.storage import save_uploaded_image
+from typing import Optional
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException
+from backend.services.ingest import ingest_upload
+from backend.services.precompute import precompute_pipeline
 from backend.room_type_detection.room_classifier import room_classifier
 from backend.services.logging import logger
 
 router = APIRouter()
 
 @router.post("/api/room-detect")
-async def detect_room_type(image: UploadFile = File(...)):
+async def detect_room_type(
+    image: Optional[UploadFile] = File(None),
+    asset_id: Optional[str] = Form(None),
+):
     """
     Explicitly detect room type from uploaded image.
+    Pass asset_id to reuse the classification from upload time.
     """
+    if asset_id:
+        result = await precompute_pipeline.result(asset_id, "room", timeout=30.0)
+        if result is not None:
+            return result
+        if precompute_pipeline.get(asset_id) is None:
+            raise HTTPException(status_code=404, detail=f"Unknown asset: {asset_id}")
+    elif image is None:
+        raise HTTPException(status_code=400, detail="Provide an image or an asset_id")
+
     try:
-        # Save temp image
-        content = await image.read()
-        saved_path = save_uploaded_image(content, image.filename)
+        if asset_id:
+            saved_path = precompute_pipeline.get(asset_id).path
+        else:
+            # Stream to the store (dedups repeat uploads)
+            saved_path = await ingest_upload(image)
         
         # Run classification
         room_type, confidence, candidates = room_classifier.classify(saved_path)
@@ -23,6 +40,8 @@ async def detect_room_type(image: UploadFile = File(...)):
             "room_confidence": confidence,
             "room_top3": candidates
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Room detection failed: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -1,30 +1,130 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form
+from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Request
 from fastapi.responses import JSONResponse
+from pathlib import Path
+from typing import Any, Dict, Optional
+import asyncio
 import time
 
 from backend.services.logging import logger
-from backend.services.storage import save_uploaded_image
+from backend.services.ingest import ingest_upload
+from backend.services.precompute import precompute_pipeline
+from backend.services.encoding import negotiate_format, thumbnail_path
 from backend.services.budget import estimate_cost, check_budget_status
 from backend.providers.offline_diffusers import offline_provider
 from backend.providers.online_replicate import replicate_provider
 from backend.providers.online_hf_inference import hf_provider
 from backend.llm.agents.prompt import prompt_agent
+from backend.core.config import settings
 
 router = APIRouter()
 
+async def _offline_generate(
+    image_path: Path,
+    room_type: str,
+    style: str,
+    strength: float,
+    asset_id: Optional[str],
+    output_format: str,
+    deadline: float
+) -> Dict[str, Any]:
+    """
+    Offline generation as a small dependency graph:
+
+        prompt optimization (LLM) --(if done by the deadline)--+
+        working image -> decode/resize -------------------------+--> diffusion
+        pipeline warm-up ---------------------------------------+
+
+    The LLM call and the image decode run concurrently with everything else.
+    Warm-up and diffusion both take the provider's GPU lock, so a warm-up waits
+    behind another request's generation rather than running beside it. The LLM
+    branch is never started when its result could not be used (disabled, or no
+    time left before the deadline).
+    """
+    timings: Dict[str, float] = {}
+
+    async def timed(name: str, coro):
+        t0 = time.perf_counter()
+        try:
+            return await coro
+        finally:
+            timings[name] = round(time.perf_counter() - t0, 3)
+
+    async def prepare_input():
+        working_image = None
+        if asset_id:
+            working_image = await precompute_pipeline.result(asset_id, "working", timeout=10.0)
+        return await asyncio.to_thread(offline_provider.load_input, image_path, working_image)
+
+    base_prompt = f"{room_type} in {style} style"
+    prompt_task = None
+    if settings.generate_optimize_prompt and deadline > time.time():
+        prompt_task = asyncio.create_task(timed("prompt", prompt_agent.optimize_prompt(base_prompt, style)))
+    else:
+        prompt_status = "skipped"
+
+    try:
+        input_image, _ = await asyncio.gather(
+            timed("input", prepare_input()),
+            timed("warmup", asyncio.to_thread(offline_provider.initialize))
+        )
+    except BaseException:
+        if prompt_task is not None:
+            prompt_task.cancel()
+        raise
+
+    # Use the optimized prompt only if it arrives before the deadline
+    prompt, negative_prompt = None, None
+    if prompt_task is not None:
+        try:
+            optimized = await asyncio.wait_for(prompt_task, timeout=max(0.0, deadline - time.time()))
+            if optimized.get("fallback") or not optimized.get("optimized_prompt"):
+                prompt_status = "failed"
+            else:
+                prompt = optimized["optimized_prompt"]
+                negative_prompt = optimized.get("negative_prompt")
+                prompt_status = "optimized"
+                logger.info(f"Optimized Prompt: {prompt}")
+        except asyncio.TimeoutError:
+            # wait_for cancelled the LLM call
+            prompt_status = "timeout"
+            logger.info("Prompt optimization missed the deadline, using the style template")
+
+    output_path, generation_time = await timed("generate", asyncio.to_thread(
+        offline_provider.generate_image,
+        image_path,
+        room_type,
+        style,
+        strength=strength,
+        input_image=input_image,
+        output_format=output_format,
+        prompt=prompt,
+        negative_prompt=negative_prompt
+    ))
+    return {
+        "output_path": output_path,
+        "generation_time": generation_time,
+        "prompt_source": prompt_status,
+        "stage_times_sec": timings
+    }
+
 @router.post("/api/generate")
 async def generate_design(
-    image: UploadFile = File(...),
+    http_request: Request,
+    image: Optional[UploadFile] = File(None),
     room_type: str = Form(...),
     style: str = Form(...),
     budget: int = Form(...),
     provider: str = Form(...),
     strength: float = Form(0.55),
+    asset_id: Optional[str] = Form(None),
+    output_format: Optional[str] = Form(None),
+    prompt_deadline_s: Optional[float] = Form(None),
 ):
     """
     Generate interior design based on uploaded image and parameters.
     """
     start_time = time.time()
+    deadline = start_time + (settings.generate_prompt_deadline_s if prompt_deadline_s is None else prompt_deadline_s)
     
     try:
         # Log request
@@ -41,13 +141,21 @@ async def generate_design(
                 detail=f"Invalid provider: {provider}. Must be 'offline', 'replicate', or 'hf'"
             )
         
-        # Save uploaded image
-        image_data = await image.read()
-        if not image_data:
-            raise HTTPException(status_code=400, detail="Empty image file")
+        if asset_id:
+            # Reuse the upload; its precomputed working-resolution image is picked up below
+            record = precompute_pipeline.ensure(asset_id)
+            if record is None:
+                raise HTTPException(status_code=404, detail=f"Unknown asset: {asset_id}")
+            image_path = record.path
+        else:
+            if image is None:
+                raise HTTPException(status_code=400, detail="Provide an image or an asset_id")
+            
+            # Stream uploaded image to the store (rejects empty/oversized files)
+            image_path = await ingest_upload(image)
+            logger.info(f"Saved upload: {image_path.name}")
         
-        image_path = save_uploaded_image(image_data, image.filename or "upload.jpg")
-        logger.info(f"Saved upload: {image_path.name}")
+        output_format = negotiate_format(http_request.headers.get("accept"), output_format)
         
         # Estimate cost
         estimated_cost = estimate_cost(style)
@@ -57,33 +165,25 @@ async def generate_design(
         # Generate image based on provider
         output_path = None
         generation_time = 0.0
+        # Online providers build their own prompts, so they never wait on the LLM
+        offline_details: Dict[str, Any] = {}
         
         try:
             if provider == "offline":
-                # Optimize prompt
-                base_prompt = f"{room_type} in {style} style"
-                try:
-                    optimized = await prompt_agent.optimize_prompt(base_prompt, style)
-                    final_prompt = optimized.get("optimized_prompt", base_prompt)
-                    logger.info(f"Optimized Prompt: {final_prompt}")
-                except Exception:
-                    final_prompt = base_prompt
-
-                output_path, generation_time = offline_provider.generate_image(
-                    image_path,
-                    room_type, # Changed from final_prompt to room_type based on instruction
-                    style,
-                    strength=strength # Added strength based on instruction
+                offline_details = await _offline_generate(
+                    image_path, room_type, style, strength, asset_id, output_format, deadline
                 )
+                output_path = offline_details["output_path"]
+                generation_time = offline_details["generation_time"]
                 
             elif provider == "replicate":
                 output_path, generation_time = replicate_provider.generate_image(
-                    image_path, room_type, style
+                    image_path, room_type, style, output_format=output_format
                 )
                 
             elif provider == "hf":
                 output_path, generation_time = hf_provider.generate_image(
-                    image_path, room_type, style
+                    image_path, room_type, style, output_format=output_format
                 )
         
         except RuntimeError as e:
@@ -107,6 +207,7 @@ async def generate_design(
         
         response = {
             "image_url": image_url,
+            "thumbnail_url": f"/generated/thumbs/{thumbnail_path(output_path).name}",
             "provider_used": provider,
             "estimated_cost": estimated_cost,
             "budget": budget,
@@ -114,6 +215,9 @@ async def generate_design(
             "time_taken_sec": round(generation_time, 2),
             "total_time_sec": round(total_time, 2),
         }
+        if offline_details:
+            response["prompt_source"] = offline_details["prompt_source"]
+            response["stage_times_sec"] = offline_details["stage_times_sec"]
         
         logger.info(f"✓ Generation complete in {total_time:.1f}s")
         logger.info(f"=== Request complete ===\n")
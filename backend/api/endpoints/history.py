@@ -1,6 +1,7 @@
-from fastapi import APIRouter, HTTPException
+from datetime import datetime
+from fastapi import APIRouter, HTTPException, Query
 from pydantic import BaseModel
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from backend.services.history_service import history_service
 from backend.services.logging import logger
 
@@ -12,20 +13,31 @@ class SessionRequest(BaseModel):
     total_cost: int
 
 @router.get("/api/history")
-async def get_history():
-    """Get all past sessions."""
-    return history_service.get_history()
+async def get_history(
+    project: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[int] = None,
+):
+    """
+    Past sessions, newest first.
+    Filter by project name and/or time range; pass next_cursor to page.
+    """
+    sessions, next_cursor = history_service.list_sessions(
+        project_name=project, since=since, until=until, limit=limit, cursor=cursor
+    )
+    return {"items": sessions, "next_cursor": next_cursor}
 
 @router.post("/api/history")
 async def save_session(session: SessionRequest):
     """Save a new session."""
-    try:
-        history_service.add_session(
-            session.project_name,
-            session.actions,
-            session.total_cost
-        )
-        return {"status": "success"}
-    except Exception as e:
-        logger.error(f"Failed to save session: {e}")
-        raise HTTPException(500, str(e))
+    session_id = history_service.add_session(
+        session.project_name,
+        session.actions,
+        session.total_cost
+    )
+    if session_id is None:
+        logger.error(f"Failed to save session: {session.project_name}")
+        raise HTTPException(500, "Failed to save session")
+    return {"status": "success", "id": session_id}
@@ -1,24 +1,31 @@
-from fastapi import APIRouter, HTTPException
+import asyncio
+from fastapi import APIRouter, HTTPException, Request
 from backend.core.schemas import InpaintRequest
-from backend.core.utils import resolve_path
+from backend.core.utils import resolve_path, resolve_image
 from backend.ai.diffusion.inpaint import inpaint_provider
 from backend.services.logging import logger
+from backend.services.encoding import negotiate_format, thumbnail_path
 
 router = APIRouter()
 
 @router.post("/edit/inpaint")
-async def inpaint_object(request: InpaintRequest):
+async def inpaint_object(request: InpaintRequest, http_request: Request):
     """Replace object using Stable Diffusion Inpainting."""
-    logger.info(f"Inpainting {request.image_path} with prompt: {request.prompt}")
+    logger.info(f"Inpainting {request.asset_id or request.image_path} with prompt: {request.prompt}")
     try:
-        image_path = resolve_path(request.image_path)
-        mask_path = resolve_path(request.mask_path)
+        image_path = await asyncio.to_thread(resolve_image, request.image_path, request.asset_id)
+        mask_path = await asyncio.to_thread(resolve_path, request.mask_path)
+        output_format = negotiate_format(http_request.headers.get("accept"), request.output_format)
         
         # Inpaint
-        output_path = inpaint_provider.inpaint(image_path, mask_path, request.prompt, request.strength)
+        # Waits for the GPU slot (a generation may hold it) - never on the event loop
+        output_path = await asyncio.to_thread(
+            inpaint_provider.inpaint, image_path, mask_path, request.prompt, request.strength, output_format=output_format
+        )
         
         return {
             "image_url": f"/generated/{output_path.name}",
+            "thumbnail_url": f"/generated/thumbs/{thumbnail_path(output_path).name}",
             "image_path": str(output_path)
         }
     except Exception as e:
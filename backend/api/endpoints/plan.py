@@ -1,12 +1,59 @@
+import asyncio
+import json
+import time
+from typing import Any, Dict, Optional
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from backend.core.schemas import PlanRequest
 from backend.llm.agents.planner import planner_agent
 from backend.llm.agents.budget import budget_agent
-from backend.services.web_suggest import WebSuggest
+from backend.services.web_suggest import web_suggest
+from backend.services.search_index import product_search
 from backend.services.logging import logger
+from backend.core.config import settings
 
 router = APIRouter()
 
+SUGGEST_ACTIONS = ["inpaint", "replace", "suggest", "buy"]
+
+def _resolve_step(step: Dict[str, Any]) -> Optional[str]:
+    """
+    Local half of enrichment: ranked catalog products + vendor directory (BM25,
+    no network). Sets the step's suggestions, and its category when the step
+    text names one.
+
+    Returns:
+        The query still needing a web search, or None when done / not a purchase step
+    """
+    action = step.get("action", "").lower()
+    if action not in SUGGEST_ACTIONS:
+        return None
+    query = step.get("prompt") or step.get("target") or ""
+    if not query:
+        return None
+
+    logger.info(f"Fetching suggestions for: {query}")
+    resolved = product_search.resolve(query, limit=5)
+    step["suggestions"] = resolved["results"]
+    if resolved["category"]:
+        step["category"] = resolved["category"]
+    return None if resolved["results"] else query
+
+async def _web_fallback(step: Dict[str, Any], query: str, budget: int, limit: asyncio.Semaphore):
+    """Web half of enrichment, for steps nothing matched locally."""
+    async with limit:
+        web_data = await web_suggest.search_suggestions(query, budget=budget, max_results=3)
+    step["suggestions"] = web_data.get("results", [])
+
+async def _enrich_step(step: Dict[str, Any], budget: int, limit: asyncio.Semaphore) -> bool:
+    """Attach suggestions (local index first, web as fallback) to a purchase step. Returns True if it applied."""
+    if step.get("action", "").lower() not in SUGGEST_ACTIONS or not (step.get("prompt") or step.get("target")):
+        return False
+    query = _resolve_step(step)
+    if query:
+        await _web_fallback(step, query, budget, limit)
+    return True
+
 @router.post("/api/plan")
 async def create_plan(request: PlanRequest):
     """
@@ -14,65 +61,158 @@ async def create_plan(request: PlanRequest):
     and verify it against the budget.
     """
     logger.info(f"Planning request: {request.user_request} | Budget: {request.budget}")
+    start = time.perf_counter()
+    timings: Dict[str, float] = {}
+
+    async def timed(name: str, coro):
+        t0 = time.perf_counter()
+        try:
+            return await coro
+        finally:
+            timings[name] = round(time.perf_counter() - t0, 3)
+
     try:
         # Step 1: Generate Plan
-        plan = await planner_agent.create_plan(
+        plan = await timed("plan", planner_agent.create_plan(
             user_request=request.user_request,
             detected_items=request.detected_items
+        ))
+        steps = plan.get("steps") or []
+        if not steps:
+            timings["total"] = round(time.perf_counter() - start, 3)
+            return {
+                "plan": plan,
+                "verification": {"approved": False, "feedback": "No steps generated to verify."},
+                "stage_times_sec": timings
+            }
+
+        # Step 1.5: Local suggestions + categories for every step (in-memory index, fast).
+        # Budget verification only needs the categories, so it can start right after.
+        t0 = time.perf_counter()
+        pending = []
+        for step in steps:
+            query = _resolve_step(step)
+            if query:
+                pending.append((step, query))
+        timings["resolve"] = round(time.perf_counter() - t0, 3)
+
+        # Step 2: Web fallbacks (bounded) and budget verification, concurrently
+        limit = asyncio.Semaphore(settings.plan_enrich_concurrency)
+        web_results, verification = await asyncio.gather(
+            timed("enrich", asyncio.gather(
+                *(_web_fallback(step, query, request.budget, limit) for step, query in pending),
+                return_exceptions=True
+            )),
+            timed("verify", budget_agent.verify_plan(
+                plan=steps,
+                budget=request.budget,
+                phrase_feedback=request.llm_feedback
+            ))
         )
-        
-        # Step 1.5: Enhance Plan with Web Suggestions
-        from backend.services.vendor_links import VendorLinks
-        web_suggester = WebSuggest()
-        vendor_linker = VendorLinks()
-
-        if "steps" in plan and plan["steps"]:
-            for step in plan["steps"]:
-                action = step.get("action", "").lower()
-                if action in ["inpaint", "replace", "suggest", "buy"]:
-                    query = step.get("prompt") or step.get("target") or ""
-                    
-                    if query:
-                        logger.info(f"Fetching suggestions for: {query}")
-                        # 1. Try Vendor Directory First
-                        # Simple keyword match for category
-                        category = None
-                        query_lower = query.lower()
-                        if "sofa" in query_lower or "couch" in query_lower: category = "sofa"
-                        elif "bed" in query_lower: category = "bed"
-                        elif "table" in query_lower: category = "table"
-                        elif "chair" in query_lower: category = "chair"
-                        elif "tv" in query_lower or "monitor" in query_lower: category = "tv"
-                        elif "lamp" in query_lower or "plant" in query_lower or "decor" in query_lower: category = "decor"
-
-                        suggestions = []
-                        if category:
-                            vendor_data = vendor_linker.get_vendor_links(category)
-                            suggestions = vendor_data.get("results", [])
-                        
-                        # 2. Fallback to Web Search if empty
-                        if not suggestions:
-                            web_data = web_suggester.search_suggestions(query, budget=request.budget, max_results=3)
-                            suggestions = web_data.get("results", [])
-
-                        step["suggestions"] = suggestions
-
-        # Step 2: Verify Budget (if plan generation succeeded)
-        verification = {}
-        if "steps" in plan and plan["steps"]:
-            verification = await budget_agent.verify_plan(
-                plan=plan["steps"],
-                budget=request.budget
-            )
-        else:
-             verification = {"approved": False, "feedback": "No steps generated to verify."}
+        for (step, query), result in zip(pending, web_results):
+            if isinstance(result, Exception):
+                logger.warning(f"Web suggestions failed for {query}: {result}")
+                step["suggestions"] = []
+
+        timings["total"] = round(time.perf_counter() - start, 3)
+        logger.info(f"Plan ready in {timings['total']}s ({len(pending)} web lookups)")
 
         # Combine results
         return {
             "plan": plan,
-            "verification": verification
+            "verification": verification,
+            "stage_times_sec": timings
         }
             
     except Exception as e:
         logger.error(f"Plan endpoint error: {e}")
         raise HTTPException(500, str(e))
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+@router.post("/api/plan/stream")
+async def stream_plan(request: PlanRequest):
+    """
+    Server-sent events version of /api/plan.
+
+    Events, in order of availability:
+        step         {"index", "step", "elapsed_ms"} - as soon as the model finishes the step
+        suggestions  {"index", "category", "suggestions", "elapsed_ms"} - per purchase step
+        plan         {"plan", "verification", "elapsed_ms"} - complete, enriched plan
+        error        {"detail"}
+    """
+    logger.info(f"Streaming plan request: {request.user_request} | Budget: {request.budget}")
+    start = time.perf_counter()
+    queue: asyncio.Queue = asyncio.Queue()
+    limit = asyncio.Semaphore(settings.plan_enrich_concurrency)
+
+    def elapsed_ms() -> int:
+        return int((time.perf_counter() - start) * 1000)
+
+    async def enrich(index: int, step: Dict[str, Any]):
+        try:
+            if await _enrich_step(step, request.budget, limit):
+                await queue.put(_sse("suggestions", {
+                    "index": index,
+                    "category": step.get("category"),
+                    "suggestions": step.get("suggestions", []),
+                    "elapsed_ms": elapsed_ms()
+                }))
+        except Exception as e:
+            logger.warning(f"Suggestions failed for step {index}: {e}")
+
+    async def produce():
+        tasks = []
+        try:
+            steps = []
+            plan: Dict[str, Any] = {}
+            async for kind, payload in planner_agent.stream_plan(request.user_request, request.detected_items):
+                if kind == "step":
+                    index = len(steps)
+                    steps.append(payload)
+                    await queue.put(_sse("step", {"index": index, "step": payload, "elapsed_ms": elapsed_ms()}))
+                    # Suggestion lookup starts while the model is still writing the next step
+                    tasks.append(asyncio.create_task(enrich(index, payload)))
+                else:
+                    plan = payload
+
+            await asyncio.gather(*tasks)
+            # The streamed step objects carry the suggestions
+            if steps:
+                plan["steps"] = steps
+
+            if plan.get("steps"):
+                verification = await budget_agent.verify_plan(
+                    plan=plan["steps"],
+                    budget=request.budget,
+                    phrase_feedback=request.llm_feedback
+                )
+            else:
+                verification = {"approved": False, "feedback": "No steps generated to verify."}
+            await queue.put(_sse("plan", {"plan": plan, "verification": verification, "elapsed_ms": elapsed_ms()}))
+        except Exception as e:
+            logger.error(f"Plan stream error: {e}")
+            await queue.put(_sse("error", {"detail": str(e)}))
+        finally:
+            for task in tasks:
+                task.cancel()
+            await queue.put(None)
+
+    async def events():
+        producer = asyncio.create_task(produce())
+        try:
+            while True:
+                message = await queue.get()
+                if message is None:
+                    break
+                yield message
+        finally:
+            # Client went away: stop generating
+            producer.cancel()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
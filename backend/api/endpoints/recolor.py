@@ -1,23 +1,29 @@
-from fastapi import APIRouter, HTTPException
+import asyncio
+from fastapi import APIRouter, HTTPException, Request
 from backend.core.schemas import RecolorRequest
-from backend.core.utils import resolve_path
+from backend.core.utils import resolve_path, resolve_image
 from backend.ai.vision.wall_paint import wall_painter
 from backend.services.logging import logger
+from backend.services.encoding import negotiate_format, thumbnail_path
 
 router = APIRouter()
 
 @router.post("/edit/recolor")
-async def recolor_wall(request: RecolorRequest):
+async def recolor_wall(request: RecolorRequest, http_request: Request):
     """Recolor wall using OpenCV (Fast)."""
-    logger.info(f"Recoloring {request.image_path} to {request.color_hex}")
+    logger.info(f"Recoloring {request.asset_id or request.image_path} to {request.color_hex}")
     try:
-        image_path = resolve_path(request.image_path)
-        mask_path = resolve_path(request.mask_path)
+        image_path = await asyncio.to_thread(resolve_image, request.image_path, request.asset_id)
+        mask_path = await asyncio.to_thread(resolve_path, request.mask_path)
+        output_format = negotiate_format(http_request.headers.get("accept"), request.output_format)
         
-        output_path = wall_painter.recolor_wall(image_path, mask_path, request.color_hex)
+        output_path = await asyncio.to_thread(
+            wall_painter.recolor_wall, image_path, mask_path, request.color_hex, output_format=output_format
+        )
         
         return {
             "image_url": f"/generated/{output_path.name}",
+            "thumbnail_url": f"/generated/thumbs/{thumbnail_path(output_path).name}",
             "image_path": str(output_path)
         }
     except Exception as e:
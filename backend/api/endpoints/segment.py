@@ -1,6 +1,7 @@
+import asyncio
 from fastapi import APIRouter, HTTPException
 from backend.core.schemas import SegmentRequest
-from backend.core.utils import resolve_path
+from backend.core.utils import resolve_image
 from backend.ai.segmentation.sam_service import sam_segmenter
 from backend.services.logging import logger
 
@@ -10,13 +11,13 @@ router = APIRouter()
 async def segment_object(request: SegmentRequest):
     """Generate mask from click point using SAM."""
     try:
-        full_path = resolve_path(request.image_path)
+        full_path = await asyncio.to_thread(resolve_image, request.image_path, request.asset_id)
         
         if request.box:
-            logger.info(f"Segmenting {request.image_path} with box {request.box}")
+            logger.info(f"Segmenting {full_path.name} with box {request.box}")
             mask_path = sam_segmenter.generate_mask(full_path, box=request.box)
         else:
-            logger.info(f"Segmenting {request.image_path} at {request.x}, {request.y}")
+            logger.info(f"Segmenting {full_path.name} at {request.x}, {request.y}")
             mask_path = sam_segmenter.generate_mask(full_path, x=request.x, y=request.y)
         
         return {
@@ -0,0 +1,15 @@
+from fastapi import APIRouter
+from backend.services.suggest_warmer import suggest_warmer
+
+router = APIRouter()
+
+@router.get("/api/suggestions/cache")
+async def suggestion_cache_status():
+    """Warmth of the web suggestion cache (per target age/expiry, hit rate, last warm cycle)."""
+    return suggest_warmer.stats()
+
+@router.post("/api/suggestions/cache/warm")
+async def warm_suggestion_cache():
+    """Run a warm cycle now (e.g. ahead of peak hours)."""
+    warmed = await suggest_warmer.run_once()
+    return {"warmed": warmed, "status": suggest_warmer.stats()}
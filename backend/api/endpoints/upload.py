@@ -1,27 +1,30 @@
 from fastapi import APIRouter, UploadFile, File, HTTPException
-from backend.services.storage import save_uploaded_image
-from backend.room_type_detection.room_classifier import room_classifier
+from backend.services.storage import upload_url
+from backend.services.ingest import ingest_upload
+from backend.services.precompute import precompute_pipeline
 
 router = APIRouter()
 
 @router.post("/api/upload")
 async def upload_image(image: UploadFile = File(...)):
     try:
-        # Save image
-        content = await image.read()
-        saved_path = save_uploaded_image(content, image.filename)
-        
-        # Run Room Classification
-        room_type, confidence, candidates = room_classifier.classify(saved_path)
-        
+        # Stream to the store (size/pixel limits enforced while reading)
+        saved_path = await ingest_upload(image)
+        # Content hash - re-uploading the same photo returns the same id
+        asset_id = saved_path.stem
+
+        # Room type, YOLO, working resize and SAM embedding run in the background.
+        # Poll GET /api/assets/{asset_id} (or pass asset_id to later endpoints).
+        record = precompute_pipeline.submit(asset_id, saved_path)
+
         return {
-            "status": "success", 
-            "image_path": f"/uploads/{saved_path.name}",
+            "status": "success",
+            "asset_id": asset_id,
+            "image_path": upload_url(saved_path),
             "filename": saved_path.name,
-            # Room Detection Results
-            "detected_room_type": room_type,
-            "room_confidence": confidence,
-            "room_top3": candidates
+            "precompute": record.to_dict()["stages"]
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
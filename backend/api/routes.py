@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from backend.api.endpoints import generate, inpaint, segment, detect, recolor, upload, plan, history, budget, detect_room
+from backend.api.endpoints import generate, inpaint, segment, detect, recolor, upload, plan, history, budget, detect_room, assets, suggestions, catalog
 
 router = APIRouter()
 
@@ -11,6 +11,9 @@ router.include_router(detect.router, tags=["detect"]) # YOLO
 router.include_router(detect_room.router, tags=["room-detect"]) # Classifier
 router.include_router(recolor.router, tags=["recolor"])
 router.include_router(upload.router, tags=["upload"])
+router.include_router(assets.router, tags=["assets"])
 router.include_router(plan.router, tags=["plan"])
 router.include_router(history.router, tags=["history"])
 router.include_router(budget.router, tags=["budget"])
+router.include_router(suggestions.router, tags=["suggestions"])
+router.include_router(catalog.router, tags=["catalog"])
@@ -1,61 +1,323 @@
-from typing import Dict, List, Any
-from backend.core.config import settings, BUDGET_ESTIMATES
+"""
+Deterministic plan pricing.
+
+Per-category, per-quality price tables are derived from the catalog (low /
+medium / high = 25th / 50th / 75th percentile price, plus the cheapest item)
+and rebuilt whenever the catalog version changes. A plan is priced in one
+pass: each step resolves to a (category, quality) cell or an exact SKU price,
+costs are gathered from the table with numpy, and when the total is over
+budget the largest available savings are taken first until the overage is
+covered.
+
+What-if scenarios (quality changes, item subsets, a different style) are
+priced together: the plan is resolved once and every scenario is a row in a
+(scenarios x steps) gather from the same table.
+"""
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from backend.services.catalog import CatalogSnapshot, catalog
 from backend.services.logging import logger
+from backend.services.search_index import canonical_token, tokenize
+
+QUALITY_TIERS = ("low", "medium", "high")
+QUALITY_PERCENTILES = (25, 50, 75)
+
+# Actions that mean buying an item vs. painting
+PURCHASE_ACTIONS = {"inpaint", "replace", "suggest", "buy"}
+PAINT_ACTIONS = {"recolor"}
+
+PAINT_COST = 200  # Fixed paint cost estimate (per room/wall)
+DEFAULT_ITEM_COST = 500  # Generic furniture cost when nothing in the catalog matches
+
+
+class PriceTable:
+    """Per-category (and per-style) price percentiles and cheapest item for one catalog version."""
+
+    def __init__(self, snapshot: CatalogSnapshot):
+        self.version = snapshot.version
+        self.categories = list(snapshot.by_category)
+        self.codes = {category: code for code, category in enumerate(self.categories)}
+        self.unknown = len(self.categories)
+        # (categories + 1, tiers); the extra last row is the "unknown item" fallback
+        self.prices = np.full((len(self.categories) + 1, len(QUALITY_TIERS)), DEFAULT_ITEM_COST, dtype=np.int64)
+        self.cheapest = np.full(len(self.categories) + 1, DEFAULT_ITEM_COST, dtype=np.int64)
+        self.cheapest_row = np.full(len(self.categories) + 1, -1, dtype=np.int64)
+        for code, category in enumerate(self.categories):
+            index = snapshot.by_category[category]
+            # index.prices is already sorted, so percentiles are direct lookups
+            self.prices[code] = np.percentile(index.prices, QUALITY_PERCENTILES, method="nearest")
+            self.cheapest[code] = index.prices[0]
+            self.cheapest_row[code] = index.rows[0]
+
+        # (styles + 1, categories + 1, tiers); style 0 = any style. A style with no
+        # items in a category falls back to that category's overall prices.
+        self.styles = {style: code + 1 for code, style in enumerate(snapshot.by_style)}
+        self.style_prices = np.repeat(self.prices[None], len(self.styles) + 1, axis=0)
+        for style, style_code in self.styles.items():
+            style_rows = snapshot.by_style[style].rows
+            for code, category in enumerate(self.categories):
+                index = snapshot.by_category[category]
+                prices = index.prices[np.isin(index.rows, style_rows)]
+                if len(prices):
+                    self.style_prices[style_code, code] = np.percentile(prices, QUALITY_PERCENTILES, method="nearest")
+
+        self.skus = {sku: row for row, sku in enumerate(snapshot.columns["sku"]) if sku}
+
+    def table(self) -> Dict[str, Dict[str, int]]:
+        return {
+            category: {tier: int(price) for tier, price in zip(QUALITY_TIERS, self.prices[code])}
+            for code, category in enumerate(self.categories)
+        }
+
 
 class BudgetEngine:
     """Core logic for cost estimation."""
-    
+
     def __init__(self):
-        self.estimates = BUDGET_ESTIMATES
+        self._table: Optional[PriceTable] = None
+
+    def price_table(self, snapshot: Optional[CatalogSnapshot] = None) -> PriceTable:
+        """Price table for the current catalog version (rebuilt on reload)."""
+        snapshot = snapshot or catalog.snapshot
+        table = self._table
+        if table is None or table.version != snapshot.version:
+            table = PriceTable(snapshot)
+            self._table = table
+        return table
+
+    @staticmethod
+    def _category_code(table: PriceTable, step: Dict[str, Any]) -> int:
+        """Catalog category for a step: explicit "category", else a word in target/prompt."""
+        category = step.get("category")
+        if category and category.lower() in table.codes:
+            return table.codes[category.lower()]
+        text = f"{step.get('target') or ''} {step.get('prompt') or ''}"
+        for token in tokenize(text):
+            token = canonical_token(token)
+            if token in table.codes:
+                return table.codes[token]
+        return table.unknown
+
+    @staticmethod
+    def _quality_index(quality: Optional[str]) -> int:
+        quality = (quality or "medium").lower()
+        return QUALITY_TIERS.index(quality) if quality in QUALITY_TIERS else 1
+
+    @staticmethod
+    def _style_code(table: PriceTable, style: str) -> int:
+        """Style row in the price table (0 = any style, also used for unknown styles)."""
+        return table.styles.get(style.lower(), 0)
 
     def calculate_item_cost(self, item_name: str, quality: str = "medium") -> int:
         """Get estimated cost for a single item."""
-        # Normalize item name
-        item_lower = item_name.lower()
-        
-        # Check direct mapping
-        if item_lower in self.estimates:
-            return self.estimates[item_lower].get(quality, self.estimates[item_lower]["medium"])
-            
-        # Check category mapping (simple heuristic)
-        for category, costs in self.estimates.items():
-            if category in item_lower:
-                return costs.get(quality, costs["medium"])
-                
-        # Default fallback
-        logger.warning(f"No cost estimate found for {item_name}, using default.")
-        return 500 # Generic furniture cost
+        table = self.price_table()
+        code = self._category_code(table, {"target": item_name})
+        if code == table.unknown:
+            logger.warning(f"No cost estimate found for {item_name}, using default.")
+        return int(table.prices[code, self._quality_index(quality)])
+
+    def _resolve(self, table: PriceTable, snapshot: CatalogSnapshot, plan_steps: List[Dict[str, Any]]):
+        """Per-step arrays: category code, quality tier, exact SKU price (-1 = none), kind (0 free, 1 purchase, 2 paint)."""
+        n = len(plan_steps)
+        codes = np.full(n, table.unknown, dtype=np.int64)
+        tiers = np.ones(n, dtype=np.int64)
+        exact = np.full(n, -1, dtype=np.int64)
+        kind = np.zeros(n, dtype=np.int8)
+        for i, step in enumerate(plan_steps):
+            action = str(step.get("action", "")).lower()
+            if action in PURCHASE_ACTIONS:
+                kind[i] = 1
+                codes[i] = self._category_code(table, step)
+                tiers[i] = self._quality_index(step.get("quality"))
+                row = table.skus.get(step.get("sku"))
+                if row is not None:
+                    exact[i] = snapshot.price[row]
+            elif action in PAINT_ACTIONS:
+                kind[i] = 2
+        return codes, tiers, exact, kind
+
+    def verify_plan(self, plan_steps: List[Dict[str, Any]], budget: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Price a plan and check it against a budget.
+
+        Args:
+            plan_steps: Planner steps ({"action", "target", optional "category", "quality", "sku"})
+            budget: User's budget (None = just price the plan)
+
+        Returns:
+            {"approved", "total_cost", "budget", "overage", "remaining", "breakdown",
+             "substitutions", "projected_cost", "feedback"}
+        """
+        snapshot = catalog.snapshot
+        table = self.price_table(snapshot)
+
+        codes, tiers, exact, kind = self._resolve(table, snapshot, plan_steps)
+        costs = np.where(kind == 1, table.prices[codes, tiers], 0)
+        costs = np.where(exact >= 0, exact, costs)
+        costs = np.where(kind == 2, PAINT_COST, costs)
+        total_cost = int(costs.sum())
+
+        # Savings if each purchase dropped to the cheapest item in its category
+        savings = np.where((kind == 1) & (codes != table.unknown), costs - table.cheapest[codes], 0)
+        savings = np.maximum(savings, 0)
+
+        overage = max(0, total_cost - budget) if budget is not None else 0
+        substitutions = []
+        projected_cost = total_cost
+        if overage > 0:
+            # Biggest savings first, just enough of them to cover the overage
+            order = np.argsort(-savings, kind="stable")
+            order = order[savings[order] > 0]
+            covered = np.cumsum(savings[order])
+            needed = int(np.searchsorted(covered, overage, side="left")) + 1
+            for i in order[:needed]:
+                item = snapshot.item(table.cheapest_row[codes[i]])
+                substitutions.append({
+                    "step_index": int(i),
+                    "target": plan_steps[i].get("target"),
+                    "current_cost": int(costs[i]),
+                    "substitute": item,
+                    "savings": int(savings[i])
+                })
+                projected_cost -= int(savings[i])
+
+        breakdown = [
+            {
+                "action": step.get("action"),
+                "target": step.get("target"),
+                "category": table.categories[codes[i]] if kind[i] == 1 and codes[i] != table.unknown else None,
+                "quality": QUALITY_TIERS[tiers[i]] if kind[i] == 1 else None,
+                "estimated_cost": int(costs[i])
+            }
+            for i, step in enumerate(plan_steps)
+        ]
+
+        approved = budget is None or total_cost <= budget
+        result = {
+            "approved": approved,
+            "total_cost": total_cost,
+            "budget": budget,
+            "overage": overage,
+            "remaining": budget - total_cost if budget is not None else None,
+            "breakdown": breakdown,
+            "substitutions": substitutions,
+            "projected_cost": projected_cost,
+        }
+        result["feedback"] = self.feedback(result)
+        return result
+
+    def evaluate_scenarios(
+        self,
+        plan_steps: List[Dict[str, Any]],
+        scenarios: List[Dict[str, Any]],
+        budget: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Price a base plan and many variations of it in one vectorized pass.
+
+        Args:
+            plan_steps: Base plan steps (as for verify_plan)
+            scenarios: Variations, each with optional keys:
+                name, quality (all purchases), qualities ({step index: quality}),
+                include / exclude (step indices), style, budget
+            budget: Default budget for feasibility
+
+        Returns:
+            {"base": {...}, "scenarios": [{"name", "total_cost", "delta", "feasible",
+             "items", "budget"}], "cheapest_feasible": int | None}
+        """
+        snapshot = catalog.snapshot
+        table = self.price_table(snapshot)
+        codes, tiers, exact, kind = self._resolve(table, snapshot, plan_steps)
+        n, s = len(plan_steps), len(scenarios)
+
+        # (scenarios, steps) overrides on top of the base plan
+        tier_grid = np.repeat(tiers[None], s, axis=0)
+        included = np.ones((s, n), dtype=bool)
+        style_codes = np.zeros(s, dtype=np.int64)
+        budgets = np.full(s, -1 if budget is None else budget, dtype=np.int64)
+        for j, scenario in enumerate(scenarios):
+            if scenario.get("quality"):
+                tier_grid[j] = self._quality_index(scenario["quality"])
+            for step_index, quality in (scenario.get("qualities") or {}).items():
+                if 0 <= int(step_index) < n:
+                    tier_grid[j, int(step_index)] = self._quality_index(quality)
+            if scenario.get("include") is not None:
+                included[j] = False
+                included[j, [i for i in scenario["include"] if 0 <= i < n]] = True
+            if scenario.get("exclude"):
+                included[j, [i for i in scenario["exclude"] if 0 <= i < n]] = False
+            if scenario.get("style"):
+                style_codes[j] = self._style_code(table, scenario["style"])
+            if scenario.get("budget") is not None:
+                budgets[j] = scenario["budget"]
+
+        def price(style_codes, tier_grid):
+            costs = table.style_prices[style_codes[:, None], codes[None, :], tier_grid]
+            costs = np.where(exact >= 0, exact, costs)
+            costs = np.where(kind == 1, costs, np.where(kind == 2, PAINT_COST, 0))
+            return costs
+
+        base_total = int(price(np.zeros(1, dtype=np.int64), tiers[None]).sum())
+        totals = (price(style_codes, tier_grid) * included).sum(axis=1)
+        feasible = (budgets < 0) | (totals <= budgets)
+        item_counts = (included & (kind == 1)).sum(axis=1)
+
+        cheapest = None
+        if feasible.any():
+            candidates = np.nonzero(feasible)[0]
+            cheapest = int(candidates[np.argmin(totals[candidates])])
+
+        return {
+            "base": {
+                "total_cost": base_total,
+                "budget": budget,
+                "feasible": budget is None or base_total <= budget
+            },
+            "scenarios": [
+                {
+                    "name": scenario.get("name") or f"scenario-{j}",
+                    "total_cost": int(totals[j]),
+                    "delta": int(totals[j]) - base_total,
+                    "feasible": bool(feasible[j]),
+                    "items": int(item_counts[j]),
+                    "budget": int(budgets[j]) if budgets[j] >= 0 else None
+                }
+                for j, scenario in enumerate(scenarios)
+            ],
+            "cheapest_feasible": cheapest,
+            "catalog_version": table.version
+        }
+
+    @staticmethod
+    def feedback(result: Dict[str, Any]) -> str:
+        """Plain-text summary of a verify_plan result."""
+        if result["budget"] is None:
+            return f"Estimated cost: ₹{result['total_cost']}."
+        if result["approved"]:
+            return f"Plan fits within budget: ₹{result['total_cost']} of ₹{result['budget']} (₹{result['remaining']} left)."
+        text = f"Exceeds budget by ₹{result['overage']} (₹{result['total_cost']} vs ₹{result['budget']})."
+        if result["substitutions"]:
+            swaps = ", ".join(
+                f"{s['target']} -> {s['substitute']['name']} (save ₹{s['savings']})"
+                for s in result["substitutions"]
+            )
+            verdict = "fits" if result["projected_cost"] <= result["budget"] else "still over"
+            text += f" Cheaper options: {swaps}; projected ₹{result['projected_cost']} ({verdict})."
+        return text
 
     def calculate_plan_cost(self, plan_steps: List[Dict[str, Any]]) -> Dict[str, Any]:
         """
         Calculate total cost of a plan.
         Returns detailed breakdown.
         """
-        total_cost = 0
-        breakdown = []
-        
-        for step in plan_steps:
-            action = step.get("action")
-            target = step.get("target")
-            
-            cost = 0
-            if action == "inpaint":
-                # Assuming replacement involves buying new item
-                cost = self.calculate_item_cost(target)
-            elif action == "recolor":
-                # Paint cost assumption (per room/wall)
-                cost = 200 # Fixed paint cost estimate
-                
-            total_cost += cost
-            breakdown.append({
-                "action": action,
-                "target": target,
-                "estimated_cost": cost
-            })
-            
+        result = self.verify_plan(plan_steps)
         return {
-            "total_cost": total_cost,
-            "breakdown": breakdown
+            "total_cost": result["total_cost"],
+            "breakdown": result["breakdown"]
         }
 
+
 budget_engine = BudgetEngine()
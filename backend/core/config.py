@@ -20,6 +20,9 @@ class Settings(BaseSettings):
     storage_dir: Path = base_dir / "storage"
     uploads_dir: Path = storage_dir / "uploads"
     generated_dir: Path = storage_dir / "generated"
+    catalog_path: Path = base_dir / "catalog.json"
+    catalog_reload_check_s: float = 2.0   # How often the catalog file's mtime is checked
+    budget_max_scenarios: int = 10000     # Upper bound on what-if scenarios per /api/budget/scenarios call
     
     # Model configuration
     diffusers_model: str = "runwayml/stable-diffusion-v1-5"
@@ -46,7 +49,90 @@ class Settings(BaseSettings):
     # Ollama Settings
     ollama_url: str = "http://localhost:11434"
     ollama_model: str = "llama3"
-    
+    ollama_max_connections: int = 8        # Pooled client, created in the app lifespan
+    ollama_max_keepalive: int = 4          # Idle connections kept open for reuse
+    ollama_keepalive_expiry_s: float = 120.0
+    ollama_connect_timeout_s: float = 5.0
+    ollama_json_timeout_s: float = 60.0    # Structured generation (plans, prompts)
+    ollama_text_timeout_s: float = 30.0    # Free-text generation
+
+    # LLM gateway (admission control + circuit breaker in front of Ollama)
+    llm_max_concurrency: int = 2           # Calls in flight to the local Ollama at once
+    llm_queue_timeout_s: float = 10.0      # Max wait for a slot before failing fast to the fallback
+    llm_breaker_failures: int = 3          # Consecutive failures that open the circuit
+    llm_breaker_cooldown_s: float = 30.0   # Open -> half-open (one trial call) after this long
+    llm_breaker_probe_s: float = 10.0      # Background liveness probe interval while open
+
+    # LLM response cache (planner, prompt optimizer)
+    llm_cache_enabled: bool = True
+    llm_cache_ttl_hours: float = 24
+    llm_cache_max_entries: int = 1024
+    llm_cache_flush_s: float = 2.0         # Debounce for the disk write
+    llm_cache_fuzzy: bool = False          # Also answer near-duplicate prompts
+    llm_cache_fuzzy_threshold: float = 0.8 # Word Jaccard needed for a near-duplicate hit
+
+    # /api/generate: LLM prompt optimization runs alongside image prep and model warm-up
+    generate_optimize_prompt: bool = True
+    generate_prompt_deadline_s: float = 4.0  # Optimized prompt is used only if ready this soon after the request starts
+
+    # /api/plan: concurrent web lookups per plan
+    plan_enrich_concurrency: int = 4
+
+    # Upload Precompute (room type, YOLO, working image, SAM embedding)
+    precompute_enabled: bool = True
+    precompute_workers: int = 1        # GPU stages also queue on memory_manager.gpu_lock with request-path models
+    precompute_sam: bool = True        # SAM encoder is ~seconds on CPU
+    precompute_max_assets: int = 256   # In-memory records kept per process
+
+    # Decoded-image cache shared by all vision stages
+    image_cache_mb: int = 512
+
+    # Upload limits (enforced while streaming, before the file is stored)
+    max_upload_mb: int = 25
+    max_upload_pixels: int = 50_000_000   # ~50MP, guards decode memory
+    upload_chunk_kb: int = 1024
+
+    # Generated image encoding (webp | jpeg | png)
+    output_format: str = "webp"
+    output_quality: int = 85
+    thumbnail_size: int = 256
+    encode_workers: int = 2
+
+    # Storage retention (per asset kind; 0 disables that limit)
+    retention_enabled: bool = True
+    retention_interval_s: int = 60          # Sweeper tick
+    retention_batch: int = 200              # Max deletions per kind per tick
+    retention_upload_max_mb: int = 5120
+    retention_upload_max_age_days: int = 30
+    retention_generated_max_mb: int = 5120
+    retention_generated_max_age_days: int = 30
+    retention_mask_max_mb: int = 1024
+    retention_mask_max_age_days: int = 7
+
+    # Web suggestion cache (in memory, persisted with write-behind)
+    suggest_cache_ttl_hours: int = 24
+    suggest_cache_stale_hours: int = 168     # Serve stale (and refresh) up to this age
+    suggest_cache_max_entries: int = 512
+    suggest_cache_flush_s: float = 2.0        # Debounce for the disk write
+    suggest_query_timeout_s: float = 4.0      # Per DuckDuckGo query
+    suggest_workers: int = 5                  # Concurrent queries (one DDGS session each)
+    suggest_pool_size: int = 10               # Raw results cached per query, filtered per budget
+
+    # Visual similarity search (catalog images -> float16 memmap, built offline)
+    visual_search_enabled: bool = True
+    visual_embed_model: str = "openai/clip-vit-base-patch32"
+    visual_index_dir: Path = storage_dir / "visual_index"
+    visual_top_k: int = 5
+
+    # Suggestion cache warmer (refreshes entries before they expire)
+    suggest_warm_enabled: bool = False        # Offline-first: opt in where web search is reachable
+    suggest_warm_initial_delay_s: float = 60.0  # Let startup settle before the first cycle
+    suggest_warm_interval_s: int = 900
+    suggest_warm_refresh_ratio: float = 0.8   # Refresh once an entry is this far into its TTL
+    suggest_warm_concurrency: int = 2
+    suggest_warm_jitter_s: float = 5.0        # Random delay before each warm call
+    suggest_warm_top_queries: int = 20        # Most requested queries warmed besides categories
+
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
@@ -2,7 +2,8 @@ from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 
 class SegmentRequest(BaseModel):
-    image_path: str
+    image_path: Optional[str] = None
+    asset_id: Optional[str] = None  # Preferred: reuses the precomputed SAM embedding
     mode: str = "point"  # point, box
     points: Optional[List[List[int]]] = None
     box: Optional[List[int]] = None
@@ -10,16 +11,20 @@ class SegmentRequest(BaseModel):
     y: Optional[int] = None  # Legacy support
 
 class InpaintRequest(BaseModel):
-    image_path: str
+    image_path: Optional[str] = None
+    asset_id: Optional[str] = None
     mask_path: str
     prompt: str
     strength: float = 1.0  # Default to max strength for replacement
     guidance_scale: float = 10.0
+    output_format: Optional[str] = None  # webp, jpeg, png (else negotiated from Accept)
 
 class RecolorRequest(BaseModel):
-    image_path: str
+    image_path: Optional[str] = None
+    asset_id: Optional[str] = None
     mask_path: str
     color_hex: str
+    output_format: Optional[str] = None  # webp, jpeg, png (else negotiated from Accept)
 
 class GenerateRequest(BaseModel):
     image_path: str
@@ -32,3 +37,4 @@ class PlanRequest(BaseModel):
     user_request: str
     detected_items: Optional[List[Dict[str, Any]]] = None # Changed to list of dicts for details
     budget: int = 10000 # Default budget
+    llm_feedback: bool = False  # Have the LLM phrase budget feedback (totals are always computed locally)
@@ -1,12 +1,37 @@
+from typing import Optional
 from pathlib import Path
 from fastapi import HTTPException
 from backend.core.config import settings
 from backend.services.logging import logger
+from backend.services.encoding import wait_for_encode
+from backend.services.asset_registry import asset_registry
 
 def resolve_path(path_str: str) -> Path:
-    """Find file in known directories."""
+    """
+    Find file in known directories.
+
+    May block for up to a minute on a pending background encode, so async
+    endpoints call it through asyncio.to_thread.
+    """
     clean_name = Path(path_str).name
     
+    # Indexed lookup by asset id (file stem) - no stat calls, no name collisions
+    row = asset_registry.get(Path(clean_name).stem)
+    if row is not None:
+        asset_registry.touch(row["asset_id"])
+        path = settings.storage_dir / row["path"]
+        if row["kind"] == "generated":
+            # Generated images are encoded in the background - make sure this one is on disk
+            wait_for_encode(path)
+        return path
+    
+    # Legacy files written before the registry existed
+    path = _probe_legacy_path(path_str, clean_name)
+    _backfill_registry(path)
+    return path
+
+
+def _probe_legacy_path(path_str: str, clean_name: str) -> Path:
     # Check absolute path first if provided
     if Path(path_str).exists():
         return Path(path_str).resolve()
@@ -33,3 +58,34 @@ def resolve_path(path_str: str) -> Path:
     # Raise 404 if not found
     logger.error(f"File not found: {path_str}. Checked: {[str(c) for c in candidates]}")
     raise HTTPException(404, f"File not found: {path_str}")
+
+
+def _backfill_registry(path: Path):
+    """Index a legacy file so the next lookup is served from the registry."""
+    kinds = {
+        settings.uploads_dir.resolve(): "upload",
+        settings.generated_dir.resolve(): "generated",
+        (settings.storage_dir / "masks").resolve(): "mask",
+    }
+    kind = kinds.get(path.parent)
+    if kind is None:
+        return
+    try:
+        asset_registry.register(path.stem, kind, path, size_bytes=path.stat().st_size)
+    except Exception as e:
+        logger.warning(f"Could not index {path.name}: {e}")
+
+
+def resolve_image(image_path: Optional[str] = None, asset_id: Optional[str] = None) -> Path:
+    """Resolve a request image from an asset id (preferred) or a path."""
+    if asset_id:
+        from backend.services.precompute import precompute_pipeline
+        record = precompute_pipeline.ensure(asset_id)
+        if record is None:
+            raise HTTPException(404, f"Unknown asset: {asset_id}")
+        asset_registry.touch(asset_id)
+        return record.path
+
+    if not image_path:
+        raise HTTPException(400, "Provide an image_path or an asset_id")
+    return resolve_path(image_path)
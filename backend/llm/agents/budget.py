@@ -1,48 +1,45 @@
 from typing import Dict, Any, List
-from backend.llm.ollama_client import ollama_client
-from backend.llm.prompts.budget import BUDGET_SYSTEM_PROMPT
+from backend.llm.gateway import llm_gateway
+from backend.llm.prompts.budget import BUDGET_FEEDBACK_PROMPT
+from backend.core.budget_engine import budget_engine
 from backend.services.logging import logger
-from backend.core.config import settings, BUDGET_ESTIMATES
 import json
 
 class BudgetAgent:
     """Agent that validates plans against budget."""
     
     def __init__(self):
-        self.client = ollama_client
+        self.client = llm_gateway
 
-    async def verify_plan(self, plan: List[Dict[str, Any]], budget: int) -> Dict[str, Any]:
+    async def verify_plan(self, plan: List[Dict[str, Any]], budget: int, phrase_feedback: bool = False) -> Dict[str, Any]:
         """
         Verify if the plan fits the budget.
+
+        Totals, overage and substitutions come from the deterministic budget
+        engine; the LLM is only asked to reword the feedback when requested.
         """
-        estimates = json.dumps(BUDGET_ESTIMATES, indent=2)
-        plan_str = json.dumps(plan, indent=2)
-        
-        # Construct prompt
-        full_system_prompt = BUDGET_SYSTEM_PROMPT.format(
-            estimates=estimates
-        )
-        
         logger.info(f"Budget Agent checking plan against budget: {budget}")
-        
+        result = budget_engine.verify_plan(plan, budget)
+        logger.info(f"Budget Verification: {result['approved']} (₹{result['total_cost']} / ₹{budget})")
+
+        if not phrase_feedback:
+            return result
+
+        pricing = {k: result[k] for k in ("approved", "total_cost", "budget", "overage", "projected_cost")}
+        pricing["substitutions"] = [
+            {"target": s["target"], "substitute": s["substitute"].get("name"), "savings": s["savings"]}
+            for s in result["substitutions"]
+        ]
         try:
-            # Generate JSON verification
-            result = await self.client.generate_json(
-                prompt=f"Check this plan against a budget of ${budget}: {plan_str}",
-                system_prompt=full_system_prompt
+            phrased = await self.client.generate_json(
+                prompt="Write the feedback for this plan.",
+                system_prompt=BUDGET_FEEDBACK_PROMPT.format(pricing=json.dumps(pricing, ensure_ascii=False))
             )
-            
-            logger.info(f"Budget Verification: {result.get('approved')}")
-            return result
-            
+            if phrased.get("feedback"):
+                result["feedback"] = phrased["feedback"]
         except Exception as e:
-            logger.error(f"Budget verification failed: {e}")
-            # Fail safe: approve but warn
-            return {
-                "approved": True,
-                "total_cost": 0,
-                "feedback": "Budget check failed due to system error. Proceed with caution.",
-                "error": str(e)
-            }
+            # The computed feedback is already in place
+            logger.warning(f"Budget feedback phrasing failed: {e}")
+        return result
 
 budget_agent = BudgetAgent()
@@ -1,5 +1,8 @@
-from typing import List, Dict, Any, Optional
-from backend.llm.ollama_client import ollama_client
+from typing import AsyncIterator, List, Dict, Any, Optional, Tuple
+from backend.llm.gateway import llm_gateway
+from backend.llm.cache import llm_cache
+from backend.llm.stream_parser import StepStreamParser
+from backend.core.config import settings
 from backend.llm.prompts.planner import PLANNER_SYSTEM_PROMPT
 from backend.services.logging import logger
 
@@ -7,7 +10,7 @@ class PlannerAgent:
     """Agent that plans steps based on user request."""
     
     def __init__(self):
-        self.client = ollama_client
+        self.client = llm_gateway
 
     async def create_plan(self, user_request: str, detected_items: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
         """
@@ -15,9 +18,16 @@ class PlannerAgent:
         """
         # Format detections for prompt
         detections_str = "None"
+        items = []
         if detected_items:
             items = [item['label'] for item in detected_items]
             detections_str = ", ".join(items)
+
+        if settings.llm_cache_enabled:
+            cached = llm_cache.get(self.client.model, PLANNER_SYSTEM_PROMPT, user_request, labels=items)
+            if cached is not None:
+                logger.info(f"Plan served from cache: {cached.get('summary')}")
+                return cached
             
         # Construct prompt
         full_system_prompt = PLANNER_SYSTEM_PROMPT.format(
@@ -35,6 +45,8 @@ class PlannerAgent:
             )
             
             logger.info(f"Plan generated: {plan.get('summary')}")
+            if settings.llm_cache_enabled and plan.get("steps"):
+                llm_cache.set(self.client.model, PLANNER_SYSTEM_PROMPT, user_request, plan, labels=items)
             return plan
             
         except Exception as e:
@@ -45,4 +57,65 @@ class PlannerAgent:
                 "steps": []
             }
 
+    async def stream_plan(
+        self,
+        user_request: str,
+        detected_items: Optional[List[Dict[str, Any]]] = None
+    ) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Generate a plan, yielding each step as soon as it is complete.
+
+        Yields:
+            ("step", step) for every step in order, then ("plan", plan) once
+            with the complete plan (steps included)
+        """
+        detections_str = "None"
+        items = []
+        if detected_items:
+            items = [item['label'] for item in detected_items]
+            detections_str = ", ".join(items)
+
+        if settings.llm_cache_enabled:
+            cached = llm_cache.get(self.client.model, PLANNER_SYSTEM_PROMPT, user_request, labels=items)
+            if cached is not None:
+                logger.info(f"Plan served from cache: {cached.get('summary')}")
+                for step in cached.get("steps", []):
+                    yield "step", step
+                yield "plan", cached
+                return
+
+        full_system_prompt = PLANNER_SYSTEM_PROMPT.format(
+            user_request=user_request,
+            detected_items=detections_str
+        )
+        logger.info(f"Planner Agent streaming: {user_request}")
+
+        parser = StepStreamParser()
+        try:
+            async for delta in self.client.stream_json(
+                prompt=f"Create a plan for: {user_request}",
+                system_prompt=full_system_prompt
+            ):
+                for step in parser.feed(delta):
+                    yield "step", step
+            plan = self.client.parse_json(parser.text)
+        except Exception as e:
+            logger.error(f"Planning failed: {e}")
+            yield "plan", {
+                "error": str(e),
+                "summary": "Failed to generate plan. Please try again.",
+                "steps": []
+            }
+            return
+
+        # If the incremental scan missed steps (unusual formatting), emit the rest now
+        steps = plan.get("steps") or []
+        for step in steps[parser.steps_emitted:]:
+            yield "step", step
+
+        logger.info(f"Plan generated: {plan.get('summary')}")
+        if settings.llm_cache_enabled and steps:
+            llm_cache.set(self.client.model, PLANNER_SYSTEM_PROMPT, user_request, plan, labels=items)
+        yield "plan", plan
+
 planner_agent = PlannerAgent()
@@ -1,5 +1,7 @@
 from typing import Dict, Any
-from backend.llm.ollama_client import ollama_client
+from backend.llm.gateway import llm_gateway
+from backend.llm.cache import llm_cache
+from backend.core.config import settings
 from backend.llm.prompts.prompt_optimizer import PROMPT_OPTIMIZER_SYSTEM_PROMPT
 from backend.services.logging import logger
 
@@ -7,12 +9,18 @@ class PromptAgent:
     """Agent that optimizes prompts for Stable Diffusion."""
     
     def __init__(self):
-        self.client = ollama_client
+        self.client = llm_gateway
 
     async def optimize_prompt(self, base_prompt: str, style: str) -> Dict[str, str]:
         """
         Enhance prompt with style and quality boosters.
         """
+        # Style goes in the bucket, so a prompt that normalizes to nothing is never cached
+        if settings.llm_cache_enabled:
+            cached = llm_cache.get(self.client.model, PROMPT_OPTIMIZER_SYSTEM_PROMPT, base_prompt, labels=[style])
+            if cached is not None:
+                return cached
+
         full_system_prompt = PROMPT_OPTIMIZER_SYSTEM_PROMPT.format(
             base_prompt=base_prompt,
             style=style
@@ -25,13 +33,16 @@ class PromptAgent:
                 prompt="Optimize this prompt.",
                 system_prompt=full_system_prompt
             )
+            if settings.llm_cache_enabled and result.get("optimized_prompt"):
+                llm_cache.set(self.client.model, PROMPT_OPTIMIZER_SYSTEM_PROMPT, base_prompt, result, labels=[style])
             return result
         except Exception as e:
             logger.error(f"Prompt optimization failed: {e}")
             # Fallback
             return {
                 "optimized_prompt": f"((({base_prompt}))), {style}, high quality, realistic, 4k",
-                "negative_prompt": "low quality, text, blurry"
+                "negative_prompt": "low quality, text, blurry",
+                "fallback": True
             }
 
 prompt_agent = PromptAgent()
@@ -0,0 +1,217 @@
+"""
+LLM response cache.
+
+Planner and prompt-optimizer calls come from a small input space ("make it
+modern" on the same few detections, room x style prompts), and each miss is
+a multi-second round trip. Responses are cached per process (TTL + LRU) and
+written behind to disk like the suggestion cache.
+
+The key is (model, system prompt template hash, normalized user prompt,
+sorted detected labels). Hashing the template rather than the formatted
+prompt means editing a prompt file invalidates its entries. With
+llm_cache_fuzzy enabled, a miss can still be answered by an entry in the same
+(model, template, labels) bucket whose prompt words overlap enough
+(Jaccard >= llm_cache_fuzzy_threshold). A prompt with no word characters at
+all (emoji, punctuation) is never cached, since it would normalize to the same
+empty key as every other such prompt.
+"""
+import atexit
+import copy
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from backend.core.config import settings
+from backend.services.logging import logger
+
+
+def normalize_text(text: str) -> str:
+    """Casefolded words only (any script), so case, punctuation and spacing do not split entries."""
+    return " ".join(re.findall(r"\w+", (text or "").casefold()))
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+
+class LLMCache:
+    """In-memory TTL/LRU cache of LLM JSON responses with write-behind persistence."""
+
+    def __init__(
+        self,
+        cache_file: Path = settings.storage_dir / "llm_cache.json",
+        ttl_hours: float = settings.llm_cache_ttl_hours,
+        max_entries: int = settings.llm_cache_max_entries,
+        flush_delay_s: float = settings.llm_cache_flush_s,
+        fuzzy: bool = settings.llm_cache_fuzzy,
+        fuzzy_threshold: float = settings.llm_cache_fuzzy_threshold
+    ):
+        self.cache_file = Path(cache_file)
+        self.ttl_s = ttl_hours * 3600
+        self.max_entries = max_entries
+        self.flush_delay_s = flush_delay_s
+        self.fuzzy = fuzzy
+        self.fuzzy_threshold = fuzzy_threshold
+        self._entries: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._flush_timer: Optional[threading.Timer] = None
+        self._dirty = False
+        self.hits = 0
+        self.fuzzy_hits = 0
+        self.misses = 0
+        self._load()
+        atexit.register(self.flush)
+
+    @staticmethod
+    def _parts(model: str, system_template: str, prompt: str, labels: Optional[Iterable[str]]) -> Tuple[str, str]:
+        """(bucket, key): the bucket is everything but the prompt text."""
+        labels = ",".join(sorted(normalize_text(label) for label in (labels or [])))
+        bucket = f"{model}|{_digest(system_template)}|{labels}"
+        return bucket, f"{bucket}|{normalize_text(prompt)}"
+
+    def _load(self):
+        try:
+            with open(self.cache_file, 'r') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            logger.warning(f"Failed to load LLM cache: {e}")
+            return
+
+        now = time.time()
+        entries = sorted(
+            (entry["cached_at"], key, entry) for key, entry in data.items()
+            if now - entry.get("cached_at", 0) <= self.ttl_s
+        )
+        for _, key, entry in entries[-self.max_entries:]:
+            self._entries[key] = entry
+        logger.info(f"Loaded {len(self._entries)} cached LLM responses")
+
+    def get(
+        self,
+        model: str,
+        system_template: str,
+        prompt: str,
+        labels: Optional[Iterable[str]] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Look up a response.
+
+        Args:
+            model: LLM model name
+            system_template: Unformatted system prompt (its hash is part of the key)
+            prompt: User prompt / request text
+            labels: Detected object labels, if the call depends on them
+
+        Returns:
+            A copy of the cached response (callers may mutate it), or None
+        """
+        if not normalize_text(prompt):
+            return None
+        bucket, key = self._parts(model, system_template, prompt, labels)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry["cached_at"] > self.ttl_s:
+                del self._entries[key]
+                self._schedule_flush()
+                entry = None
+            if entry is None and self.fuzzy:
+                entry, key = self._nearest(bucket, normalize_text(prompt), now)
+                if entry is not None:
+                    self.fuzzy_hits += 1
+            elif entry is not None:
+                self.hits += 1
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            return copy.deepcopy(entry["response"])
+
+    def _nearest(self, bucket: str, text: str, now: float) -> Tuple[Optional[Dict], Optional[str]]:
+        """Most similar fresh entry in the bucket by word Jaccard, if above the threshold."""
+        words = set(text.split())
+        if not words:
+            return None, None
+        best, best_key, best_score = None, None, self.fuzzy_threshold
+        for key, entry in self._entries.items():
+            if entry["bucket"] != bucket or now - entry["cached_at"] > self.ttl_s:
+                continue
+            other = set(entry["text"].split())
+            score = len(words & other) / len(words | other) if other else 0.0
+            if score >= best_score:
+                best, best_key, best_score = entry, key, score
+        return best, best_key
+
+    def set(
+        self,
+        model: str,
+        system_template: str,
+        prompt: str,
+        response: Dict[str, Any],
+        labels: Optional[Iterable[str]] = None
+    ):
+        if not normalize_text(prompt):
+            return
+        bucket, key = self._parts(model, system_template, prompt, labels)
+        with self._lock:
+            self._entries[key] = {
+                "response": copy.deepcopy(response),
+                "bucket": bucket,
+                "text": normalize_text(prompt),
+                "cached_at": time.time()
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._schedule_flush()
+
+    def _schedule_flush(self):
+        """Debounce: many updates in a burst become one write."""
+        self._dirty = True
+        if self._flush_timer is None:
+            self._flush_timer = threading.Timer(self.flush_delay_s, self.flush)
+            self._flush_timer.daemon = True
+            self._flush_timer.start()
+
+    def flush(self):
+        """Write the cache to disk (temp file + atomic rename)."""
+        with self._lock:
+            self._flush_timer = None
+            if not self._dirty:
+                return
+            snapshot = dict(self._entries)
+            self._dirty = False
+
+        try:
+            self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.cache_file.with_name(f".{self.cache_file.name}.{os.getpid()}.tmp")
+            with open(tmp_path, 'w') as f:
+                json.dump(snapshot, f)
+            tmp_path.replace(self.cache_file)
+        except Exception as e:
+            logger.warning(f"Failed to save LLM cache: {e}")
+            with self._lock:
+                self._schedule_flush()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.fuzzy_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "fuzzy_hits": self.fuzzy_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.hits + self.fuzzy_hits) / lookups, 3) if lookups else 0.0
+            }
+
+
+# Global instance
+llm_cache = LLMCache()
@@ -0,0 +1,209 @@
+"""
+LLM gateway: admission control and circuit breaking in front of OllamaClient.
+
+- Concurrency cap: at most llm_max_concurrency calls reach Ollama at once;
+  the rest wait for a slot, but only up to llm_queue_timeout_s.
+- Circuit breaker: after llm_breaker_failures consecutive backend failures
+  (connection errors, timeouts, 5xx) the circuit opens and calls fail at
+  once with LLMUnavailable, so agents drop straight to their fallbacks
+  instead of each waiting out the httpx timeout.
+- Half-open: once llm_breaker_cooldown_s has passed - or sooner, when the
+  background probe sees Ollama answering again - a single trial call is let
+  through. Success closes the circuit, failure re-opens it.
+
+Agents talk to the gateway exactly as they did to the client.
+"""
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional
+
+from backend.core.config import settings
+from backend.llm.ollama_client import OllamaClient, ollama_client
+from backend.services.logging import logger
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class LLMUnavailable(RuntimeError):
+    """Raised instead of calling Ollama when the circuit is open or the queue budget ran out."""
+
+
+class LLMGateway:
+    """Semaphore + circuit breaker around an OllamaClient."""
+
+    def __init__(
+        self,
+        client: OllamaClient = ollama_client,
+        max_concurrency: int = settings.llm_max_concurrency,
+        queue_timeout_s: float = settings.llm_queue_timeout_s,
+        failure_threshold: int = settings.llm_breaker_failures,
+        cooldown_s: float = settings.llm_breaker_cooldown_s,
+        probe_interval_s: float = settings.llm_breaker_probe_s
+    ):
+        self.client = client
+        self.max_concurrency = max_concurrency
+        self.queue_timeout_s = queue_timeout_s
+        self.failure_threshold = failure_threshold
+        self.cooldown_s = cooldown_s
+        self.probe_interval_s = probe_interval_s
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._probe_task: Optional[asyncio.Task] = None
+
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self.in_flight = 0
+        self.queued = 0
+        self.rejected_open = 0
+        self.rejected_queue = 0
+        self.failures = 0
+        self.successes = 0
+
+    @property
+    def model(self) -> str:
+        return self.client.model
+
+    def parse_json(self, content: str) -> Dict[str, Any]:
+        return self.client.parse_json(content)
+
+    # Breaker state
+
+    def _admit(self) -> bool:
+        """Decide whether a call may proceed. Returns True if it is the half-open trial."""
+        if self.state == OPEN and time.time() - self.opened_at >= self.cooldown_s:
+            self._set_state(HALF_OPEN)
+        if self.state == OPEN:
+            self.rejected_open += 1
+            raise LLMUnavailable("LLM circuit open (Ollama failing), using fallback")
+        if self.state == HALF_OPEN:
+            if self._trial_in_flight:
+                self.rejected_open += 1
+                raise LLMUnavailable("LLM circuit half-open (trial in progress), using fallback")
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def _set_state(self, state: str):
+        if state != self.state:
+            logger.warning(f"[LLMGateway] Circuit {self.state} -> {state}")
+            self.state = state
+        if state == OPEN:
+            self.opened_at = time.time()
+
+    def _record(self, ok: bool, trial: bool):
+        if trial:
+            self._trial_in_flight = False
+        if ok:
+            self.successes += 1
+            self.consecutive_failures = 0
+            if self.state != CLOSED:
+                self._set_state(CLOSED)
+            return
+        self.failures += 1
+        self.consecutive_failures += 1
+        if trial or self.consecutive_failures >= self.failure_threshold:
+            self._set_state(OPEN)
+
+    @staticmethod
+    def _is_backend_failure(error: BaseException) -> bool:
+        # A reply we could not parse still means Ollama is up
+        return not isinstance(error, ValueError)
+
+    @asynccontextmanager
+    async def _slot(self):
+        """Admission + concurrency slot; records the outcome for the breaker."""
+        trial = self._admit()
+        self.queued += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=self.queue_timeout_s)
+        except asyncio.TimeoutError:
+            self.rejected_queue += 1
+            if trial:
+                self._trial_in_flight = False
+            raise LLMUnavailable(f"LLM busy: no slot within {self.queue_timeout_s}s, using fallback")
+        except BaseException:
+            if trial:
+                self._trial_in_flight = False
+            raise
+        finally:
+            self.queued -= 1
+
+        self.in_flight += 1
+        recorded = False
+        try:
+            yield
+            self._record(True, trial)
+            recorded = True
+        except Exception as e:
+            self._record(not self._is_backend_failure(e), trial)
+            recorded = True
+            raise
+        finally:
+            # Cancelled or abandoned (deadline, client disconnect) says nothing about Ollama
+            if trial and not recorded:
+                self._trial_in_flight = False
+            self.in_flight -= 1
+            self._slots.release()
+
+    # Client API
+
+    async def generate_json(self, prompt: str, system_prompt: Optional[str] = None) -> Dict[str, Any]:
+        async with self._slot():
+            return await self.client.generate_json(prompt, system_prompt=system_prompt)
+
+    async def generate_text(self, prompt: str, system_prompt: Optional[str] = None) -> str:
+        async with self._slot():
+            return await self.client.generate_text(prompt, system_prompt=system_prompt)
+
+    async def stream_json(self, prompt: str, system_prompt: Optional[str] = None) -> AsyncIterator[str]:
+        # The slot is held for the whole stream
+        async with self._slot():
+            async for delta in self.client.stream_json(prompt, system_prompt=system_prompt):
+                yield delta
+
+    # Background probe
+
+    async def _probe_loop(self):
+        while True:
+            await asyncio.sleep(self.probe_interval_s)
+            if self.state != OPEN:
+                continue
+            if await self.client.ping():
+                logger.info("[LLMGateway] Probe succeeded, allowing a trial call")
+                self._set_state(HALF_OPEN)
+
+    def start(self):
+        """Start the background probe (called from the app lifespan)."""
+        if self._probe_task is None or self._probe_task.done():
+            self._probe_task = asyncio.create_task(self._probe_loop())
+
+    async def stop(self):
+        if self._probe_task is not None:
+            self._probe_task.cancel()
+            try:
+                await self._probe_task
+            except asyncio.CancelledError:
+                pass
+            self._probe_task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "open_for_s": round(time.time() - self.opened_at, 1) if self.state == OPEN else None,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "max_concurrency": self.max_concurrency,
+            "successes": self.successes,
+            "failures": self.failures,
+            "rejected_open": self.rejected_open,
+            "rejected_queue": self.rejected_queue
+        }
+
+
+# Global instance
+llm_gateway = LLMGateway()
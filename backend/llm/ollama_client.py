@@ -1,14 +1,95 @@
 import httpx
-from typing import List, Dict, Any, Optional
+import json
+import re
+from typing import AsyncIterator, List, Dict, Any, Optional
 from backend.core.config import settings
 from backend.services.logging import logger
 
 class OllamaClient:
-    """Async client for local Ollama instance."""
+    """
+    Async client for local Ollama instance.
+
+    One pooled httpx.AsyncClient (keep-alive, bounded connections) is shared by
+    every call. It is opened in the app lifespan and closed at shutdown; code
+    running outside the app (scripts) gets one lazily on first use.
+    """
     
     def __init__(self, base_url: str = settings.ollama_url, model: str = settings.ollama_model):
         self.base_url = base_url
         self.model = model
+        self._client: Optional[httpx.AsyncClient] = None
+        self.limits = httpx.Limits(
+            max_connections=settings.ollama_max_connections,
+            max_keepalive_connections=settings.ollama_max_keepalive,
+            keepalive_expiry=settings.ollama_keepalive_expiry_s
+        )
+        # Connection reuse metrics
+        self.requests = 0
+        self.connections_opened = 0
+        self.errors = 0
+
+    async def start(self):
+        """Open the pooled client (called from the app lifespan)."""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                limits=self.limits,
+                timeout=httpx.Timeout(settings.ollama_text_timeout_s, connect=settings.ollama_connect_timeout_s)
+            )
+            logger.info(f"[Ollama] Connection pool opened ({self.limits.max_connections} max, {self.limits.max_keepalive_connections} keep-alive)")
+
+    async def close(self):
+        """Close the pooled client and its connections."""
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+            logger.info(f"[Ollama] Connection pool closed ({self.requests} requests, {self.connections_opened} connections)")
+        self._client = None
+
+    async def _trace(self, event_name: str, info: Dict[str, Any]):
+        # httpcore reports a TCP connect only when no pooled connection could be reused
+        if event_name == "connection.connect_tcp.complete":
+            self.connections_opened += 1
+
+    async def _chat(self, payload: Dict[str, Any], timeout: float) -> Dict[str, Any]:
+        """POST /api/chat on the pooled client."""
+        if self._client is None or self._client.is_closed:
+            await self.start()
+        self.requests += 1
+        try:
+            response = await self._client.post(
+                "/api/chat",
+                json=payload,
+                timeout=httpx.Timeout(timeout, connect=settings.ollama_connect_timeout_s),
+                extensions={"trace": self._trace}
+            )
+            response.raise_for_status()
+            return response.json()
+        except Exception:
+            self.errors += 1
+            raise
+
+    async def ping(self, timeout: float = 2.0) -> bool:
+        """Cheap liveness check (model list); used by the gateway's half-open probe."""
+        if self._client is None or self._client.is_closed:
+            await self.start()
+        try:
+            response = await self._client.get("/api/tags", timeout=timeout)
+            return response.status_code == 200
+        except Exception:
+            return False
+
+    def stats(self) -> Dict[str, Any]:
+        reused = max(0, self.requests - self.connections_opened)
+        return {
+            "requests": self.requests,
+            "connections_opened": self.connections_opened,
+            "reused": reused,
+            "reuse_rate": round(reused / self.requests, 3) if self.requests else 0.0,
+            "errors": self.errors,
+            "pool_open": self._client is not None and not self._client.is_closed,
+            "max_connections": self.limits.max_connections,
+            "max_keepalive": self.limits.max_keepalive_connections
+        }
         
     async def generate_json(self, prompt: str, system_prompt: Optional[str] = None) -> Dict[str, Any]:
         """
@@ -31,53 +112,102 @@ class OllamaClient:
             }
         }
         
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.post(
-                    f"{self.base_url}/api/chat", 
-                    json=payload, 
-                    timeout=60.0 # 60s timeout for complex plans
-                )
-                response.raise_for_status()
-                
-                result = response.json()
-                content = result.get("message", {}).get("content", "{}")
+        try:
+            result = await self._chat(payload, timeout=settings.ollama_json_timeout_s)
+            content = result.get("message", {}).get("content", "{}")
+            return self.parse_json(content)
                 
-                # Verify JSON structure manually if needed (Ollama 'format': 'json' usually handles this)
-                import json
-                try:
-                    return json.loads(content)
-                except json.JSONDecodeError:
-                    logger.error(f"Ollama returned invalid JSON: {content}")
-                    # Robust fallback using regex to find matching braces
-                    import re
-                    json_match = re.search(r"\{.*\}", content, re.DOTALL)
-                    if json_match:
-                        try: 
-                            return json.loads(json_match.group(0))
+        except httpx.RequestError as e:
+            logger.error(f"Ollama connection error: {e}")
+            # Fallback mocking if offline? No, user wants it purely offline but operational.
+            # If Ollama is down, we should gracefully fail or suggest starting it.
+            raise RuntimeError(f"Could not connect to Ollama at {self.base_url}. Is it running?")
+        except Exception as e:
+            logger.error(f"LLM Generation failed: {e}")
+            raise
+
+    @staticmethod
+    def parse_json(content: str) -> Dict[str, Any]:
+        """Parse model output as JSON, tolerating prose or ``` fences around it."""
+        # Verify JSON structure manually if needed (Ollama 'format': 'json' usually handles this)
+        try:
+            return json.loads(content)
+        except json.JSONDecodeError:
+            logger.error(f"Ollama returned invalid JSON: {content}")
+            # Robust fallback using regex to find matching braces
+            json_match = re.search(r"\{.*\}", content, re.DOTALL)
+            if json_match:
+                try: 
+                    return json.loads(json_match.group(0))
+                except:
+                    pass
+                    
+            # Fallback for ```json blocks if regex failed
+            if "```" in content:
+                parts = content.split("```")
+                for part in parts:
+                    if "{" in part:
+                        try:
+                            return json.loads(part.replace("json", "").strip())
                         except:
-                            pass
+                            continue
                             
-                    # Fallback for ```json blocks if regex failed
-                    if "```" in content:
-                        parts = content.split("```")
-                        for part in parts:
-                            if "{" in part:
-                                try:
-                                    return json.loads(part.replace("json", "").strip())
-                                except:
-                                    continue
-                                    
-                    raise ValueError("Failed to parse JSON response from LLM")
-                    
-            except httpx.RequestError as e:
-                logger.error(f"Ollama connection error: {e}")
-                # Fallback mocking if offline? No, user wants it purely offline but operational.
-                # If Ollama is down, we should gracefully fail or suggest starting it.
-                raise RuntimeError(f"Could not connect to Ollama at {self.base_url}. Is it running?")
-            except Exception as e:
-                logger.error(f"LLM Generation failed: {e}")
-                raise
+            raise ValueError("Failed to parse JSON response from LLM")
+
+    async def stream_json(self, prompt: str, system_prompt: Optional[str] = None) -> AsyncIterator[str]:
+        """
+        Stream a JSON-mode generation.
+
+        Yields:
+            Content deltas as Ollama produces them (concatenated they form the JSON document)
+        """
+        messages = []
+        if system_prompt:
+            messages.append({"role": "system", "content": system_prompt})
+        messages.append({"role": "user", "content": prompt})
+
+        payload = {
+            "model": self.model,
+            "messages": messages,
+            "stream": True,
+            "format": "json",
+            "options": {
+                "temperature": 0.2,
+                "num_ctx": 4096
+            }
+        }
+
+        if self._client is None or self._client.is_closed:
+            await self.start()
+        self.requests += 1
+        try:
+            # The timeout bounds each read (time between chunks), not the whole stream
+            async with self._client.stream(
+                "POST",
+                "/api/chat",
+                json=payload,
+                timeout=httpx.Timeout(settings.ollama_json_timeout_s, connect=settings.ollama_connect_timeout_s),
+                extensions={"trace": self._trace}
+            ) as response:
+                response.raise_for_status()
+                # Ollama streams one JSON object per line
+                async for line in response.aiter_lines():
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    delta = chunk.get("message", {}).get("content", "")
+                    if delta:
+                        yield delta
+                    if chunk.get("done"):
+                        break
+        except httpx.RequestError as e:
+            self.errors += 1
+            logger.error(f"Ollama connection error: {e}")
+            raise RuntimeError(f"Could not connect to Ollama at {self.base_url}. Is it running?")
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"LLM streaming failed: {e}")
+            raise
 
     async def generate_text(self, prompt: str, system_prompt: Optional[str] = None) -> str:
         """Standard text generation."""
@@ -92,18 +222,12 @@ class OllamaClient:
             "stream": False
         }
         
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.post(
-                    f"{self.base_url}/api/chat", 
-                    json=payload,
-                    timeout=30.0
-                )
-                response.raise_for_status()
-                return response.json().get("message", {}).get("content", "")
-            except Exception as e:
-                logger.error(f"LLM Text Generation failed: {e}")
-                raise
+        try:
+            result = await self._chat(payload, timeout=settings.ollama_text_timeout_s)
+            return result.get("message", {}).get("content", "")
+        except Exception as e:
+            logger.error(f"LLM Text Generation failed: {e}")
+            raise
 
 # Global Instance
 ollama_client = OllamaClient()
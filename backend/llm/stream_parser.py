@@ -0,0 +1,76 @@
+"""
+Incremental parser for streamed JSON plans.
+
+The planner answers with {"summary": ..., "steps": [{...}, {...}]}. While the
+tokens stream in, this scanner tracks string/escape state and nesting, and
+hands back each element of the top-level "steps" array as soon as its
+closing brace arrives - long before the whole document is complete.
+"""
+import json
+from typing import Any, Dict, List
+
+
+class StepStreamParser:
+    """Feed text chunks; get back the "steps" objects completed by each chunk."""
+
+    def __init__(self, array_key: str = "steps"):
+        self.array_key = array_key
+        self.text = ""
+        self._pos = 0
+        self._stack: List[str] = []      # open containers: "{" / "["
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._last_key = None            # last string closed directly inside the root object
+        self._array_depth = None         # stack depth of the steps array, once open
+        self._item_start = None
+        self.steps_emitted = 0
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """
+        Consume a chunk of model output.
+
+        Returns:
+            Step dicts completed within this chunk (possibly empty)
+        """
+        self.text += chunk
+        completed = []
+        text = self.text
+        for i in range(self._pos, len(text)):
+            ch = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if len(self._stack) == 1 and self._stack[0] == "{":
+                        self._last_key = text[self._string_start + 1:i]
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                self._string_start = i
+            elif ch in "{[":
+                self._stack.append(ch)
+                depth = len(self._stack)
+                if ch == "[" and depth == 2 and self._last_key == self.array_key:
+                    self._array_depth = depth
+                elif ch == "{" and self._array_depth is not None and depth == self._array_depth + 1:
+                    self._item_start = i
+            elif ch in "}]":
+                depth = len(self._stack)
+                if self._stack:
+                    self._stack.pop()
+                if ch == "}" and self._item_start is not None and self._array_depth is not None and depth == self._array_depth + 1:
+                    try:
+                        completed.append(json.loads(text[self._item_start:i + 1]))
+                        self.steps_emitted += 1
+                    except json.JSONDecodeError:
+                        pass
+                    self._item_start = None
+                elif ch == "]" and depth == self._array_depth:
+                    self._array_depth = None
+        self._pos = len(text)
+        return completed
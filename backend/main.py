@@ -8,20 +8,42 @@ current_file = Path(__file__).resolve()
 project_root = current_file.parent.parent
 sys.path.append(str(project_root))
 
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from backend.core.config import settings
 from backend.api.routes import router as api_router
 from backend.services.logging import logger
+from backend.services.image_cache import image_cache
+from backend.services.encoding import await_encode
+from backend.services.asset_registry import asset_registry
+from backend.services.retention import retention_sweeper
+from backend.services.suggest_warmer import suggest_warmer
+from backend.llm.ollama_client import ollama_client
+from backend.llm.cache import llm_cache
+from backend.llm.gateway import llm_gateway
 import uvicorn
 import torch
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await ollama_client.start()
+    llm_gateway.start()
+    retention_sweeper.start()
+    suggest_warmer.start()
+    yield
+    await suggest_warmer.stop()
+    retention_sweeper.stop()
+    await llm_gateway.stop()
+    await ollama_client.close()
+
 # Create FastAPI app
 app = FastAPI(
     title="Budget-Constrained Interior Design AI",
     description="AI-powered interior design with offline and online providers",
-    version="2.0.0"
+    version="2.0.0",
+    lifespan=lifespan
 )
 
 # Configure CORS
@@ -33,22 +55,40 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+class AssetStaticFiles(StaticFiles):
+    """Static files that record an access for retention's LRU."""
+    
+    async def get_response(self, path: str, scope):
+        # Originals are named by asset id; pyramid levels live in a dir named after it
+        for candidate in (Path(path).stem, Path(path).parent.name):
+            if candidate and asset_registry.get(candidate) is not None:
+                asset_registry.touch(candidate)
+                break
+        return await super().get_response(path, scope)
+
+class GeneratedStaticFiles(AssetStaticFiles):
+    """Static files that wait for a still-running background encode before serving."""
+    
+    async def get_response(self, path: str, scope):
+        await await_encode(settings.generated_dir / path)
+        return await super().get_response(path, scope)
+
 # Mount static file serving
 app.mount(
     "/generated",
-    StaticFiles(directory=str(settings.generated_dir)),
+    GeneratedStaticFiles(directory=str(settings.generated_dir)),
     name="generated"
 )
 
 app.mount(
     "/uploads",
-    StaticFiles(directory=str(settings.uploads_dir)),
+    AssetStaticFiles(directory=str(settings.uploads_dir)),
     name="uploads"
 )
 
 app.mount(
     "/masks",
-    StaticFiles(directory=str(settings.storage_dir / "masks")),
+    AssetStaticFiles(directory=str(settings.storage_dir / "masks")),
     name="masks"
 )
 
@@ -74,7 +114,12 @@ async def health_check():
         "status": "healthy",
         "cuda_available": cuda_available,
         "cuda_device": cuda_device,
-        "mode": "offline-first"
+        "mode": "offline-first",
+        "image_cache": image_cache.stats(),
+        "storage": retention_sweeper.stats(),
+        "llm": ollama_client.stats(),
+        "llm_gateway": llm_gateway.stats(),
+        "llm_cache": llm_cache.stats()
     }
 
 if __name__ == "__main__":
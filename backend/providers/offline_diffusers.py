@@ -1,13 +1,14 @@
 import torch
 from PIL import Image
 from pathlib import Path
+from typing import Optional
 import time
 import gc
 
 from diffusers import StableDiffusionImg2ImgPipeline, DPMSolverMultistepScheduler
 from backend.core.config import settings, PROMPT_TEMPLATE, NEGATIVE_PROMPT
 from backend.services.logging import logger
-from backend.services.storage import resize_image, save_generated_image
+from backend.services.storage import resize_image, save_generated_image, load_working_image
 from backend.utils.memory import memory_manager
 
 
@@ -25,13 +26,19 @@ class OfflineDiffusersProvider:
             self.device = "cpu"
             self.dtype = torch.float32
             logger.info("[SD] CPU Mode. Using float32.")
+        # Loading and diffusion run off the event loop (generate warm-up, worker threads).
+        # Both hold memory_manager.gpu_lock: the pipeline and its scheduler keep per-call
+        # state, and no other model may take the GPU slot mid-generation.
         
     def initialize(self):
         """Initialize the Stable Diffusion pipeline (lazy loading)."""
         # NORMAL MODE: Keep resident if already loaded
         if not settings.low_vram and self.pipeline is not None:
             return
+        with memory_manager.gpu_lock:
+            self._initialize_locked()
 
+    def _initialize_locked(self):
         # Ensure GPU slot is ours (Only if we need to load or re-load)
         memory_manager.ensure_gpu("sd_img2img")
         
@@ -92,33 +99,68 @@ class OfflineDiffusersProvider:
         )
         return prompt, NEGATIVE_PROMPT
     
+    def load_input(self, image_path: Path, input_image: Optional[Image.Image] = None) -> Image.Image:
+        """
+        Decode and size the init image (no model needed, safe to run ahead of generate_image).
+        input_image: pre-resized working image (e.g. from the upload precompute).
+        """
+        # STRICT RULE: Cap resolution for VRAM safety
+        target_size = (512, 512)
+        if not settings.low_vram and self.device == "cuda":
+            # NORMAL mode allow up to 640 if possible, but 512 is safest
+            # We stick to 512 as per "Otherwise keep 512" rule for simplicity/safety
+            pass
+            
+        if input_image is None:
+            input_image = load_working_image(image_path)
+        if input_image.size != target_size:
+            input_image = input_image.resize(target_size)
+        return input_image
+
     def generate_image(
         self,
         image_path: Path,
         room_type: str,
         style: str,
-        strength: float = 0.65
+        strength: float = 0.65,
+        input_image: Optional[Image.Image] = None,
+        output_format: Optional[str] = None,
+        prompt: Optional[str] = None,
+        negative_prompt: Optional[str] = None
     ) -> tuple[Path, float]:
         """
         Generate redesigned interior image.
+        input_image: working image, or the output of load_input().
+        output_format: webp/jpeg/png, defaults to settings.output_format.
+        prompt / negative_prompt: override the room/style template (e.g. an LLM-optimized prompt).
+        Generations are serialized: one request at a time on the pipeline.
         """
+        with memory_manager.gpu_lock:
+            return self._generate_locked(
+                image_path, room_type, style, strength, input_image, output_format, prompt, negative_prompt
+            )
+
+    def _generate_locked(
+        self,
+        image_path: Path,
+        room_type: str,
+        style: str,
+        strength: float,
+        input_image: Optional[Image.Image],
+        output_format: Optional[str],
+        prompt: Optional[str],
+        negative_prompt: Optional[str]
+    ) -> tuple[Path, float]:
         # Initialize pipeline if needed
         self.initialize()
         
         start_time = time.time()
         
-        # Load and resize input image
-        # STRICT RULE: Cap resolution for VRAM safety
-        target_size = (512, 512)
-        if not settings.low_vram and self.device == "cuda":
-            # NORMAL mode allow up to 640 if possible, but 512 is safest
-            # We stick to 512 as per "Otherwise keep 512" rule for simplicity/safety
-            pass
-            
-        input_image = Image.open(image_path).convert("RGB")
-        input_image = input_image.resize(target_size)
+        input_image = self.load_input(image_path, input_image)
         
-        prompt, negative_prompt = self.generate_prompt(room_type, style)
+        template_prompt, template_negative = self.generate_prompt(room_type, style)
+        prompt = prompt or template_prompt
+        negative_prompt = negative_prompt or template_negative
         
         # Override strength/steps based on profile
         if settings.low_vram:
@@ -150,7 +192,10 @@ class OfflineDiffusersProvider:
                 torch.cuda.empty_cache()
 
             # Save
-            output_path = save_generated_image(output, prompt)
+            output_path = save_generated_image(
+                output, prefix="offline", fmt=output_format,
+                parent_id=image_path.stem, operation="generate"
+            )
             
             return output_path, time.time() - start_time
             
@@ -170,7 +215,10 @@ class OfflineDiffusersProvider:
                     num_inference_steps=15 # Safe mode
                 ).images[0]
                 
-            output_path = save_generated_image(output, prompt)
+            output_path = save_generated_image(
+                output, prefix="offline", fmt=output_format,
+                parent_id=image_path.stem, operation="generate"
+            )
             return output_path, time.time() - start_time
         logger.info(f"Processing image: {image_path.name} | Strength: {strength}")
         init_image = resize_image(
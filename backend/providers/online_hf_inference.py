@@ -4,6 +4,7 @@ Requires HF_API_TOKEN environment variable.
 """
 import time
 from pathlib import Path
+from typing import Optional
 import requests
 from PIL import Image
 import io
@@ -35,7 +36,8 @@ class HuggingFaceProvider:
         self,
         image_path: Path,
         room_type: str,
-        style: str
+        style: str,
+        output_format: Optional[str] = None
     ) -> tuple[Path, float]:
         """
         Generate redesigned interior image using HuggingFace.
@@ -44,6 +46,7 @@ class HuggingFaceProvider:
             image_path: Path to input image
             room_type: Type of room
             style: Design style
+            output_format: webp/jpeg/png, defaults to settings.output_format
             
         Returns:
             Tuple of (output_image_path, time_taken_seconds)
@@ -79,7 +82,10 @@ class HuggingFaceProvider:
         
         # Parse response
         result_image = Image.open(io.BytesIO(response.content))
-        output_path = save_generated_image(result_image, prefix="hf")
+        output_path = save_generated_image(
+            result_image, prefix="hf", fmt=output_format,
+            parent_id=image_path.stem, operation="generate"
+        )
         
         time_taken = time.time() - start_time
         logger.info(f"✓ HuggingFace image generated in {time_taken:.1f}s")
@@ -4,6 +4,7 @@ Requires REPLICATE_API_TOKEN environment variable.
 """
 import time
 from pathlib import Path
+from typing import Optional
 import base64
 
 from backend.core.config import settings
@@ -41,7 +42,8 @@ class ReplicateProvider:
         self,
         image_path: Path,
         room_type: str,
-        style: str
+        style: str,
+        output_format: Optional[str] = None
     ) -> tuple[Path, float]:
         """
         Generate redesigned interior image using Replicate.
@@ -50,6 +52,7 @@ class ReplicateProvider:
             image_path: Path to input image
             room_type: Type of room
             style: Design style
+            output_format: webp/jpeg/png, defaults to settings.output_format
             
         Returns:
             Tuple of (output_image_path, time_taken_seconds)
@@ -97,7 +100,10 @@ class ReplicateProvider:
         response.raise_for_status()
         
         result_image = Image.open(io.BytesIO(response.content))
-        output_path = save_generated_image(result_image, prefix="replicate")
+        output_path = save_generated_image(
+            result_image, prefix="replicate", fmt=output_format,
+            parent_id=image_path.stem, operation="generate"
+        )
         
         time_taken = time.time() - start_time
         logger.info(f"✓ Replicate image generated in {time_taken:.1f}s")
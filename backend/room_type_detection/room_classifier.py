@@ -6,6 +6,8 @@ from PIL import Image
 from pathlib import Path
 import time
 from backend.services.logging import logger
+from backend.services.image_cache import image_cache
+from backend.services.pyramid import select_level
 from backend.room_type_detection.cache_utils import setup_hf_cache, enable_offline_mode
 from backend.room_type_detection.label_mapping import normalize_room_label
 
@@ -62,7 +64,9 @@ class RoomClassifier:
             self.initialize()
             
         try:
-            image = Image.open(image_path).convert("RGB")
+            # Classifier input is 224px - the thumbnail level is plenty
+            level_path, _ = select_level(image_path, min_short=224)
+            image = image_cache.get_pil(level_path)
             
             start = time.time()
             # Run inference
@@ -0,0 +1,282 @@
+"""
+Persistent asset index.
+
+Maps asset ids to where the file lives, what kind it is (upload, generated,
+mask), its dimensions and hash, and where it came from (parent asset and the
+operation that produced it). Backed by SQLite with an in-memory LRU in front,
+so resolving an asset on the request path costs no filesystem probing.
+"""
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from backend.core.config import settings
+
+ASSET_KINDS = ("upload", "generated", "mask")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS assets (
+    asset_id    TEXT PRIMARY KEY,
+    kind        TEXT NOT NULL,
+    path        TEXT NOT NULL,
+    width       INTEGER,
+    height      INTEGER,
+    bytes       INTEGER,
+    hash        TEXT,
+    parent_id   TEXT,
+    operation   TEXT,
+    created_at  REAL NOT NULL,
+    accessed_at REAL,
+    pinned      INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_assets_kind_created ON assets (kind, created_at DESC, asset_id DESC);
+CREATE INDEX IF NOT EXISTS idx_assets_parent ON assets (parent_id);
+"""
+
+# Added after the first release of the table: (column, DDL)
+_MIGRATIONS = (
+    ("accessed_at", "ALTER TABLE assets ADD COLUMN accessed_at REAL"),
+    ("pinned", "ALTER TABLE assets ADD COLUMN pinned INTEGER NOT NULL DEFAULT 0"),
+)
+
+_INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_assets_kind_lru ON assets (kind, pinned, accessed_at);
+"""
+
+_COLUMNS = ("asset_id", "kind", "path", "width", "height", "bytes", "hash", "parent_id", "operation", "created_at", "accessed_at", "pinned")
+
+
+class AssetRegistry:
+    """SQLite-backed asset index with an LRU cache of recent lookups."""
+
+    def __init__(self, db_path: Path = settings.storage_dir / "assets.db", cache_size: int = 4096):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        existing = {r["name"] for r in self._conn.execute("PRAGMA table_info(assets)")}
+        for column, ddl in _MIGRATIONS:
+            if column not in existing:
+                self._conn.execute(ddl)
+        self._conn.executescript(_INDEXES)
+        self._conn.commit()
+        self._lock = threading.Lock()
+        self._cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._cache_size = cache_size
+        # asset_id -> last access time, flushed in batches by the retention sweeper
+        self._touches: Dict[str, float] = {}
+
+    def _remember(self, row: Dict[str, Any]):
+        self._cache[row["asset_id"]] = row
+        self._cache.move_to_end(row["asset_id"])
+        while len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+
+    def register(
+        self,
+        asset_id: str,
+        kind: str,
+        path: Path,
+        width: Optional[int] = None,
+        height: Optional[int] = None,
+        size_bytes: Optional[int] = None,
+        content_hash: Optional[str] = None,
+        parent_id: Optional[str] = None,
+        operation: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Insert or update an asset record."""
+        if kind not in ASSET_KINDS:
+            raise ValueError(f"Invalid asset kind: {kind}")
+
+        row = {
+            "asset_id": asset_id,
+            "kind": kind,
+            "path": Path(path).resolve().relative_to(settings.storage_dir.resolve()).as_posix(),
+            "width": width,
+            "height": height,
+            "bytes": size_bytes,
+            "hash": content_hash,
+            "parent_id": parent_id,
+            "operation": operation,
+            "created_at": time.time(),
+            "accessed_at": time.time(),
+            "pinned": 0,
+        }
+
+        with self._lock:
+            existing = self._get_locked(asset_id)
+            if existing is not None:
+                # Re-registration (dedup hit, overwritten recolor) keeps the original timestamp and pin
+                row["created_at"] = existing["created_at"]
+                row["pinned"] = existing["pinned"]
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO assets ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))})",
+                tuple(row[c] for c in _COLUMNS)
+            )
+            self._conn.commit()
+            self._remember(row)
+        return row
+
+    def _get_locked(self, asset_id: str) -> Optional[Dict[str, Any]]:
+        row = self._cache.get(asset_id)
+        if row is not None:
+            self._cache.move_to_end(asset_id)
+            return row
+
+        found = self._conn.execute("SELECT * FROM assets WHERE asset_id = ?", (asset_id,)).fetchone()
+        if found is None:
+            return None
+        row = dict(found)
+        self._remember(row)
+        return row
+
+    def get(self, asset_id: str) -> Optional[Dict[str, Any]]:
+        """Look up an asset record (LRU first, then SQLite)."""
+        with self._lock:
+            return self._get_locked(asset_id)
+
+    def resolve(self, asset_id: str) -> Optional[Path]:
+        """Absolute path of an asset, without touching the filesystem."""
+        row = self.get(asset_id)
+        return settings.storage_dir / row["path"] if row else None
+
+    def remove(self, asset_id: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM assets WHERE asset_id = ?", (asset_id,))
+            self._conn.commit()
+            self._cache.pop(asset_id, None)
+            self._touches.pop(asset_id, None)
+
+    def touch(self, asset_id: str):
+        """Record an access for LRU retention. Buffered in memory - no DB write here."""
+        now = time.time()
+        with self._lock:
+            self._touches[asset_id] = now
+            row = self._cache.get(asset_id)
+            if row is not None:
+                row["accessed_at"] = now
+
+    def flush_touches(self) -> int:
+        """Persist buffered access times; returns how many were written."""
+        with self._lock:
+            touches, self._touches = self._touches, {}
+            if touches:
+                self._conn.executemany(
+                    "UPDATE assets SET accessed_at = ? WHERE asset_id = ?",
+                    [(t, asset_id) for asset_id, t in touches.items()]
+                )
+                self._conn.commit()
+        return len(touches)
+
+    def set_bytes(self, asset_id: str, size_bytes: int):
+        with self._lock:
+            self._conn.execute("UPDATE assets SET bytes = ? WHERE asset_id = ?", (size_bytes, asset_id))
+            self._conn.commit()
+            row = self._cache.get(asset_id)
+            if row is not None:
+                row["bytes"] = size_bytes
+
+    def pin(self, asset_ids, with_parents: bool = True) -> int:
+        """
+        Protect assets from retention (e.g. referenced by a saved history session).
+        Parents are pinned too, so a kept result never loses its source image.
+        Unknown ids are ignored. Returns the number of assets pinned.
+        """
+        pending = list(dict.fromkeys(asset_ids))
+        pinned = set()
+        with self._lock:
+            while pending:
+                asset_id = pending.pop()
+                if asset_id in pinned:
+                    continue
+                row = self._get_locked(asset_id)
+                if row is None:
+                    continue
+                pinned.add(asset_id)
+                row["pinned"] = 1
+                if with_parents and row["parent_id"]:
+                    pending.append(row["parent_id"])
+            if pinned:
+                self._conn.executemany("UPDATE assets SET pinned = 1 WHERE asset_id = ?", [(a,) for a in pinned])
+                self._conn.commit()
+        return len(pinned)
+
+    def usage(self, kind: str) -> Tuple[int, int]:
+        """(asset count, total known bytes) for a kind."""
+        with self._lock:
+            count, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM assets WHERE kind = ?", (kind,)
+            ).fetchone()
+        return count, total
+
+    def eviction_candidates(self, kind: str, limit: int, accessed_before: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Least recently used unpinned assets of a kind, optionally only those idle since a cutoff."""
+        query = "SELECT * FROM assets WHERE kind = ? AND pinned = 0"
+        params: list = [kind]
+        if accessed_before is not None:
+            query += " AND COALESCE(accessed_at, created_at) < ?"
+            params.append(accessed_before)
+        query += " ORDER BY COALESCE(accessed_at, created_at) ASC LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            return [dict(r) for r in self._conn.execute(query, params).fetchall()]
+
+    def list(
+        self,
+        kind: Optional[str] = None,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+        parent_id: Optional[str] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Newest-first page of assets.
+
+        Args:
+            kind: Filter by asset kind
+            limit: Page size
+            cursor: Opaque cursor from the previous page ("<created_at>:<asset_id>")
+            parent_id: Only assets derived from this asset
+
+        Returns:
+            (rows, next_cursor) - next_cursor is None on the last page
+        """
+        clauses, params = [], []
+        if kind:
+            clauses.append("kind = ?")
+            params.append(kind)
+        if parent_id:
+            clauses.append("parent_id = ?")
+            params.append(parent_id)
+        if cursor:
+            created_at, _, last_id = cursor.partition(":")
+            clauses.append("(created_at < ? OR (created_at = ? AND asset_id < ?))")
+            params.extend([float(created_at), float(created_at), last_id])
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        query = f"SELECT * FROM assets {where} ORDER BY created_at DESC, asset_id DESC LIMIT ?"
+        params.append(limit + 1)
+
+        with self._lock:
+            rows = [dict(r) for r in self._conn.execute(query, params).fetchall()]
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            next_cursor = f"{last['created_at']!r}:{last['asset_id']}"
+        return rows, next_cursor
+
+
+def asset_url(row: Dict[str, Any]) -> str:
+    """Public URL of an asset (storage subdirs are mounted under the same names)."""
+    return f"/{row['path']}"
+
+
+# Global instance
+asset_registry = AssetRegistry()
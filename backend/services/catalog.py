@@ -0,0 +1,277 @@
+"""
+Product catalog.
+
+Items are held column-wise (one numpy array per field) rather than as a list
+of dicts, with a price-sorted row index per category and per style. Price
+range filters are two binary searches into those indexes; a style filter on
+top of a category is an intersection of two already-narrowed slices. Dicts
+are only built for the rows actually returned.
+
+The source file is watched: when its mtime/size changes, a new snapshot is
+built on a background thread and swapped in atomically, so a catalog update
+needs no restart and readers never see a half-built index.
+"""
+import hashlib
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from backend.core.config import settings
+from backend.services.logging import logger
+
+# Fields stored as columns; anything else on an item is kept per row in `extras`
+_STRING_FIELDS = ("sku", "name", "vendor", "vendor_link")
+
+
+class PriceIndex:
+    """Row ids of one category/style, sorted by price, with the matching prices."""
+
+    __slots__ = ("rows", "prices")
+
+    def __init__(self, rows: np.ndarray, prices: np.ndarray):
+        self.rows = rows
+        self.prices = prices
+
+    def range(self, min_price: Optional[int] = None, max_price: Optional[int] = None) -> slice:
+        """Positions (into rows/prices) with min_price <= price <= max_price."""
+        lo = 0 if min_price is None else int(np.searchsorted(self.prices, min_price, side="left"))
+        hi = len(self.prices) if max_price is None else int(np.searchsorted(self.prices, max_price, side="right"))
+        return slice(lo, max(lo, hi))
+
+    def __len__(self):
+        return len(self.rows)
+
+
+def item_key(item: Dict[str, Any]) -> str:
+    """
+    Stable identity of a catalog item across versions: its sku, or (sku is
+    optional) a hash of category + name + vendor.
+    """
+    sku = str(item.get("sku") or "")
+    if sku:
+        return sku
+    basis = "|".join(str(item.get(field) or "").lower() for field in ("category", "name", "vendor"))
+    return "h:" + hashlib.sha1(basis.encode("utf-8")).hexdigest()[:16]
+
+
+def _index_by(keys: np.ndarray, prices: np.ndarray, names: List[str]) -> Dict[str, PriceIndex]:
+    """Group row ids by key code, each group sorted by price."""
+    # One lexsort: by key, then price within key
+    order = np.lexsort((prices, keys))
+    sorted_keys = keys[order]
+    bounds = np.searchsorted(sorted_keys, np.arange(len(names) + 1), side="left")
+    index = {}
+    for code, name in enumerate(names):
+        rows = order[bounds[code]:bounds[code + 1]].astype(np.int32)
+        if len(rows):
+            index[name] = PriceIndex(rows, prices[rows])
+    return index
+
+
+class CatalogSnapshot:
+    """Immutable columnar view of one version of the catalog file."""
+
+    def __init__(self, items: List[Dict[str, Any]], version: int):
+        self.version = version
+        n = len(items)
+        self.size = n
+
+        self.columns: Dict[str, np.ndarray] = {
+            field: np.array([item.get(field, "") for item in items], dtype=object)
+            for field in _STRING_FIELDS
+        }
+        # item_key() per row: what indexes keyed outside the snapshot (search, visual) use
+        self.keys = np.array([item_key(item) for item in items], dtype=object)
+        self.price = np.array([item.get("price", 999999) for item in items], dtype=np.int64)
+        self.score = np.array(
+            [item["score"] if item.get("score") is not None else np.nan for item in items],
+            dtype=np.float32
+        )
+
+        categories = [str(item.get("category", "")).lower() for item in items]
+        self.category_names, category_codes = np.unique(np.array(categories, dtype=object), return_inverse=True)
+        self.category_code = category_codes.astype(np.int32)
+
+        # Styles: "style" (str) and/or "styles"/"tags" (lists); an item can be in several.
+        # Rows with none of those are unstyled (no style filter or bonus ever matches them).
+        style_rows: Dict[str, List[int]] = {}
+        for row, item in enumerate(items):
+            styles = []
+            if item.get("style"):
+                styles.append(item["style"])
+            styles.extend(item.get("styles", []) or [])
+            styles.extend(item.get("tags", []) or [])
+            for style in {str(s).lower() for s in styles}:
+                style_rows.setdefault(style, []).append(row)
+
+        known = set(_STRING_FIELDS) | {"price", "score", "category"}
+        self.extras = [
+            {k: v for k, v in item.items() if k not in known} or None
+            for item in items
+        ]
+
+        self.by_category = _index_by(self.category_code, self.price, list(self.category_names))
+        self.by_style: Dict[str, PriceIndex] = {}
+        for style, rows in style_rows.items():
+            rows = np.array(rows, dtype=np.int32)
+            rows = rows[np.argsort(self.price[rows], kind="stable")]
+            self.by_style[style] = PriceIndex(rows, self.price[rows])
+
+        everything = np.argsort(self.price, kind="stable").astype(np.int32)
+        self.all = PriceIndex(everything, self.price[everything])
+
+    def item(self, row: int) -> Dict[str, Any]:
+        """Materialize one row as the catalog dict it came from."""
+        row = int(row)
+        item = {field: self.columns[field][row] for field in _STRING_FIELDS}
+        item["category"] = self.category_names[self.category_code[row]]
+        item["price"] = int(self.price[row])
+        if not np.isnan(self.score[row]):
+            item["score"] = float(self.score[row])
+        if self.extras[row]:
+            item.update(self.extras[row])
+        return item
+
+    def items(self, rows) -> List[Dict[str, Any]]:
+        return [self.item(row) for row in rows]
+
+    def query_rows(
+        self,
+        category: Optional[str] = None,
+        style: Optional[str] = None,
+        min_price: Optional[int] = None,
+        max_price: Optional[int] = None
+    ) -> np.ndarray:
+        """Row ids matching the filters, price ascending."""
+        if category is not None:
+            index = self.by_category.get(category.lower())
+            if index is None:
+                return np.empty(0, dtype=np.int32)
+        else:
+            index = self.all
+        rows = index.rows[index.range(min_price, max_price)]
+
+        if style is not None:
+            style_index = self.by_style.get(style.lower())
+            if style_index is None:
+                return np.empty(0, dtype=np.int32)
+            style_rows = style_index.rows[style_index.range(min_price, max_price)]
+            # Keep the price order of `rows`
+            rows = rows[np.isin(rows, style_rows, assume_unique=True)]
+        return rows
+
+
+class Catalog:
+    """Hot-reloading catalog; `snapshot` is always a complete, consistent version."""
+
+    def __init__(self, path: Path = settings.catalog_path, check_interval_s: float = settings.catalog_reload_check_s):
+        self.path = Path(path)
+        self.check_interval_s = check_interval_s
+        self._lock = threading.Lock()
+        self._signature = None
+        self._last_check = 0.0
+        self._reloading = False
+        self._listeners: List[Callable[[CatalogSnapshot], None]] = []
+        self._snapshot = self._load(version=1)
+
+    def _file_signature(self):
+        try:
+            stat = self.path.stat()
+            return stat.st_mtime_ns, stat.st_size
+        except FileNotFoundError:
+            return None
+
+    def _load(self, version: int) -> CatalogSnapshot:
+        signature = self._file_signature()
+        items = []
+        if signature is None:
+            logger.warning(f"Catalog not found at {self.path}, using empty catalog")
+        else:
+            with open(self.path, "r") as f:
+                items = json.load(f)
+        start = time.time()
+        snapshot = CatalogSnapshot(items, version)
+        self._signature = signature
+        logger.info(f"Loaded catalog v{version}: {snapshot.size} items in {int((time.time() - start) * 1000)}ms")
+        return snapshot
+
+    def _reload(self):
+        try:
+            snapshot = self._load(version=self._snapshot.version + 1)
+            self._snapshot = snapshot
+            for listener in self._listeners:
+                listener(snapshot)
+        except Exception as e:
+            # Keep serving the previous version (e.g. file caught mid-write)
+            logger.error(f"Catalog reload failed, keeping v{self._snapshot.version}: {e}")
+        finally:
+            with self._lock:
+                self._reloading = False
+
+    def _maybe_reload(self):
+        now = time.time()
+        if now - self._last_check < self.check_interval_s:
+            return
+        with self._lock:
+            if self._reloading or now - self._last_check < self.check_interval_s:
+                return
+            self._last_check = now
+            if self._file_signature() == self._signature:
+                return
+            self._reloading = True
+        threading.Thread(target=self._reload, name="catalog-reload", daemon=True).start()
+
+    @property
+    def snapshot(self) -> CatalogSnapshot:
+        self._maybe_reload()
+        return self._snapshot
+
+    def on_reload(self, listener: Callable[[CatalogSnapshot], None]):
+        """Call listener(snapshot) after each successful reload."""
+        self._listeners.append(listener)
+
+    def search(
+        self,
+        category: Optional[str] = None,
+        style: Optional[str] = None,
+        min_price: Optional[int] = None,
+        max_price: Optional[int] = None,
+        limit: int = 50,
+        offset: int = 0,
+        descending: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Filter the catalog by category, style and price range.
+
+        Args:
+            category: Catalog category (sofa, bed, ...)
+            style: Style tag
+            min_price: Inclusive lower price bound
+            max_price: Inclusive upper price bound
+            limit: Page size
+            offset: Rows to skip
+            descending: Most expensive first
+
+        Returns:
+            {"items": [...], "total": int, "next_offset": int | None, "version": int}
+        """
+        snapshot = self.snapshot
+        rows = snapshot.query_rows(category, style, min_price, max_price)
+        if descending:
+            rows = rows[::-1]
+        page = rows[offset:offset + limit]
+        next_offset = offset + limit if offset + limit < len(rows) else None
+        return {
+            "items": snapshot.items(page),
+            "total": int(len(rows)),
+            "next_offset": next_offset,
+            "version": snapshot.version
+        }
+
+
+# Global instance
+catalog = Catalog()
@@ -0,0 +1,159 @@
+"""
+Output image encoding.
+
+Generated images used to be written as lossless PNG on the request path.
+Encoding now happens on a small worker pool in the configured (or negotiated)
+format, together with a thumbnail. Callers get the final path immediately;
+anything that needs the bytes (static file serving, resolve_path) waits on
+the pending encode for that path.
+"""
+import asyncio
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Optional
+
+from PIL import Image
+
+from backend.core.config import settings
+from backend.services.logging import logger
+
+# format name -> PIL format, file extension, MIME type
+OUTPUT_FORMATS = {
+    "webp": {"pil": "WEBP", "ext": ".webp", "mime": "image/webp"},
+    "jpeg": {"pil": "JPEG", "ext": ".jpg", "mime": "image/jpeg"},
+    "png": {"pil": "PNG", "ext": ".png", "mime": "image/png"},
+}
+
+_MIME_TO_FORMAT = {spec["mime"]: name for name, spec in OUTPUT_FORMATS.items()}
+_MIME_TO_FORMAT["image/jpg"] = "jpeg"
+
+_executor = ThreadPoolExecutor(max_workers=settings.encode_workers, thread_name_prefix="encode")
+_pending: Dict[str, Future] = {}
+_pending_lock = threading.Lock()
+
+
+def negotiate_format(accept: Optional[str] = None, requested: Optional[str] = None) -> str:
+    """
+    Pick the output format for a request.
+
+    Args:
+        accept: HTTP Accept header value
+        requested: Explicit format from the request body/form (wins if valid)
+
+    Returns:
+        Key of OUTPUT_FORMATS
+    """
+    if requested:
+        requested = requested.lower().replace("jpg", "jpeg")
+        if requested in OUTPUT_FORMATS:
+            return requested
+
+    if accept:
+        best, best_q = None, 0.0
+        for part in accept.split(","):
+            media, _, params = part.strip().partition(";")
+            fmt = _MIME_TO_FORMAT.get(media.strip().lower())
+            if fmt is None:
+                continue
+            q = 1.0
+            for param in params.split(";"):
+                key, _, value = param.strip().partition("=")
+                if key == "q":
+                    try:
+                        q = float(value)
+                    except ValueError:
+                        q = 0.0
+            if q > best_q:
+                best, best_q = fmt, q
+        if best:
+            return best
+
+    return settings.output_format
+
+
+def output_extension(fmt: Optional[str] = None) -> str:
+    return OUTPUT_FORMATS[fmt or settings.output_format]["ext"]
+
+
+def thumbnail_path(image_path: Path) -> Path:
+    """Where the thumbnail for a generated image lives."""
+    image_path = Path(image_path)
+    return image_path.parent / "thumbs" / image_path.name
+
+
+def _save(image: Image.Image, path: Path, fmt: str, quality: int):
+    spec = OUTPUT_FORMATS[fmt]
+    options = {}
+    if fmt == "webp":
+        # method=4 is the libwebp default speed/size trade-off; 6 is much slower
+        options = {"quality": quality, "method": 4}
+    elif fmt == "jpeg":
+        options = {"quality": quality, "optimize": False, "progressive": False}
+    elif fmt == "png":
+        # Lossless; low compress_level keeps encode fast at a modest size cost
+        options = {"compress_level": 3}
+
+    if fmt == "jpeg" and image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+
+    # Write to a temp name and rename so readers never see half a file
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    image.save(tmp_path, format=spec["pil"], **options)
+    tmp_path.replace(path)
+
+
+def _encode(image: Image.Image, path: Path, fmt: str, quality: int):
+    try:
+        _save(image, path, fmt, quality)
+
+        thumb = image.copy()
+        thumb.thumbnail((settings.thumbnail_size, settings.thumbnail_size), Image.Resampling.BILINEAR)
+        thumb_path = thumbnail_path(path)
+        thumb_path.parent.mkdir(parents=True, exist_ok=True)
+        _save(thumb, thumb_path, fmt, quality)
+    except Exception as e:
+        logger.error(f"Encoding {path.name} failed: {e}")
+        raise
+
+
+def encode_image(image: Image.Image, path: Path, fmt: Optional[str] = None, quality: Optional[int] = None) -> Future:
+    """
+    Queue an image (and its thumbnail) for encoding on the worker pool.
+    The returned future resolves once both files are on disk.
+    """
+    fmt = fmt or settings.output_format
+    quality = quality or settings.output_quality
+    path = Path(path)
+
+    keys = (str(path), str(thumbnail_path(path)))
+
+    def _done(finished: Future):
+        with _pending_lock:
+            for key in keys:
+                if _pending.get(key) is finished:
+                    del _pending[key]
+
+    future = _executor.submit(_encode, image, path, fmt, quality)
+    with _pending_lock:
+        for key in keys:
+            _pending[key] = future
+    # Runs immediately if the encode already finished
+    future.add_done_callback(_done)
+    return future
+
+
+def wait_for_encode(path: Path, timeout: Optional[float] = 60.0):
+    """Block until a pending encode for path (if any) has finished."""
+    with _pending_lock:
+        future = _pending.get(str(Path(path)))
+    if future is not None:
+        future.result(timeout=timeout)
+
+
+async def await_encode(path: Path, timeout: Optional[float] = 60.0):
+    """Async version of wait_for_encode for use on the event loop."""
+    with _pending_lock:
+        future = _pending.get(str(Path(path)))
+    if future is not None:
+        await asyncio.wait_for(asyncio.wrap_future(future), timeout)
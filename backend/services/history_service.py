@@ -1,50 +1,172 @@
+"""
+Session history store.
+
+Sessions are appended to an SQLite table (WAL mode) instead of rewriting a
+single JSON file on every save: an insert is one atomic append, ids come from
+AUTOINCREMENT so they never collide, and reads are paginated by id cursor with
+indexed project/time filters. An existing history.json is imported once on
+first start and renamed out of the way.
+"""
 import json
+import sqlite3
+import threading
 from datetime import datetime
-from typing import List, Dict, Any
-from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 from backend.services.logging import logger
 from backend.core.config import settings
 
 HISTORY_FILE = settings.storage_dir / "history.json"
+HISTORY_DB = settings.storage_dir / "history.db"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id           INTEGER PRIMARY KEY AUTOINCREMENT,
+    project_name TEXT NOT NULL,
+    total_cost   INTEGER NOT NULL,
+    created_at   REAL NOT NULL,
+    actions      TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_sessions_created ON sessions (created_at);
+CREATE INDEX IF NOT EXISTS idx_sessions_project ON sessions (project_name, id);
+"""
+
 
 class HistoryService:
     """Manage session history."""
-    
-    def __init__(self):
-        self._ensure_file()
-        
-    def _ensure_file(self):
+
+    def __init__(self, db_path=HISTORY_DB):
+        self._conn = sqlite3.connect(str(db_path), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+        self._lock = threading.Lock()
+        self._migrate_json()
+
+    def _migrate_json(self):
+        """One-shot import of the legacy history.json (oldest first, fresh ids)."""
         if not HISTORY_FILE.exists():
-            with open(HISTORY_FILE, "w") as f:
-                json.dump([], f)
-                
-    def get_history(self) -> List[Dict[str, Any]]:
-        """Get all past sessions."""
+            return
         try:
             with open(HISTORY_FILE, "r") as f:
-                return json.load(f)
+                legacy = json.load(f)
         except Exception as e:
-            logger.error(f"Failed to read history: {e}")
-            return []
-            
-    def add_session(self, project_name: str, actions: List[Dict], total_cost: int):
-        """Record a new session."""
-        entry = {
-            "id": int(datetime.now().timestamp()), # Simple ID
-            "project_name": project_name,
-            "actions": actions,
-            "total_cost": total_cost,
-            "timestamp": datetime.now().isoformat()
+            logger.error(f"Failed to read legacy history for migration: {e}")
+            return
+
+        rows = []
+        for entry in legacy:
+            try:
+                created_at = datetime.fromisoformat(entry["timestamp"]).timestamp()
+            except (KeyError, TypeError, ValueError):
+                created_at = float(entry.get("id") or 0)
+            rows.append((
+                entry.get("project_name", ""),
+                int(entry.get("total_cost") or 0),
+                created_at,
+                json.dumps(entry.get("actions", []))
+            ))
+        rows.sort(key=lambda r: r[2])
+
+        with self._lock:
+            self._conn.executemany(
+                "INSERT INTO sessions (project_name, total_cost, created_at, actions) VALUES (?, ?, ?, ?)",
+                rows
+            )
+            self._conn.commit()
+        HISTORY_FILE.replace(HISTORY_FILE.with_name(HISTORY_FILE.name + ".migrated"))
+        logger.info(f"Migrated {len(rows)} sessions from {HISTORY_FILE.name}")
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> Dict[str, Any]:
+        return {
+            "id": row["id"],
+            "project_name": row["project_name"],
+            "actions": json.loads(row["actions"]),
+            "total_cost": row["total_cost"],
+            "timestamp": datetime.fromtimestamp(row["created_at"]).isoformat()
         }
-        
-        history = self.get_history()
-        history.append(entry)
-        
+
+    def list_sessions(
+        self,
+        project_name: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        limit: int = 50,
+        cursor: Optional[int] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """
+        Newest-first page of sessions.
+
+        Args:
+            project_name: Only sessions for this project
+            since: Only sessions saved at or after this time
+            until: Only sessions saved before this time
+            limit: Page size
+            cursor: Session id from the previous page's next_cursor
+
+        Returns:
+            (sessions, next_cursor) - next_cursor is None on the last page
+        """
+        clauses, params = [], []
+        if project_name:
+            clauses.append("project_name = ?")
+            params.append(project_name)
+        if since:
+            clauses.append("created_at >= ?")
+            params.append(since.timestamp())
+        if until:
+            clauses.append("created_at < ?")
+            params.append(until.timestamp())
+        if cursor is not None:
+            clauses.append("id < ?")
+            params.append(cursor)
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        params.append(limit + 1)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT * FROM sessions {where} ORDER BY id DESC LIMIT ?", params
+            ).fetchall()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = rows[-1]["id"]
+        return [self._to_dict(r) for r in rows], next_cursor
+
+    def iter_sessions(self, batch: int = 500) -> Iterator[Dict[str, Any]]:
+        """Walk every session (newest first) without loading them all at once."""
+        cursor = None
+        while True:
+            sessions, cursor = self.list_sessions(limit=batch, cursor=cursor)
+            yield from sessions
+            if cursor is None:
+                return
+
+    def get_history(self) -> List[Dict[str, Any]]:
+        """Get all past sessions (oldest first)."""
+        return list(reversed(list(self.iter_sessions())))
+
+    def add_session(self, project_name: str, actions: List[Dict], total_cost: int) -> Optional[int]:
+        """Record a new session. Returns its id."""
         try:
-            with open(HISTORY_FILE, "w") as f:
-                json.dump(history, f, indent=2)
+            with self._lock:
+                cur = self._conn.execute(
+                    "INSERT INTO sessions (project_name, total_cost, created_at, actions) VALUES (?, ?, ?, ?)",
+                    (project_name, total_cost, datetime.now().timestamp(), json.dumps(actions))
+                )
+                self._conn.commit()
+            session_id = cur.lastrowid
             logger.info(f"Saved session to history: {project_name}")
         except Exception as e:
             logger.error(f"Failed to save history: {e}")
+            return None
+
+        # Keep the session's images from being evicted by retention
+        from backend.services.retention import pin_history_assets
+        pin_history_assets([{"actions": actions}])
+        return session_id
 
 history_service = HistoryService()
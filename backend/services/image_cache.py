@@ -0,0 +1,146 @@
+"""
+Shared decoded-image cache for the vision stages.
+
+Room classification, YOLO, SAM, wall recolor and inpainting all start from the
+same upload. Decoding a multi-megapixel JPEG five times per session is wasted
+CPU, so every stage asks this cache instead of PIL/cv2 directly. Entries are
+read-only numpy arrays, bounded by total bytes with LRU eviction.
+"""
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional, Tuple
+
+import numpy as np
+from PIL import Image, ImageOps
+
+from backend.core.config import settings
+from backend.services.logging import logger
+
+
+class DecodedImageCache:
+    """Byte-bounded LRU of decoded images keyed by (path, mtime, size, order)."""
+
+    def __init__(self, max_bytes: int = settings.image_cache_mb * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[tuple, np.ndarray]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        # Per-source locks so two stages asking for the same file decode it once
+        self._decode_locks = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, path: Path, size: Optional[Tuple[int, int]], order: str, resample: int) -> tuple:
+        path = Path(path)
+        return (str(path.resolve()), path.stat().st_mtime_ns, size, order, resample if size else None)
+
+    def _lookup(self, key: tuple) -> Optional[np.ndarray]:
+        with self._lock:
+            array = self._entries.get(key)
+            if array is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            return array
+
+    def _store(self, key: tuple, array: np.ndarray) -> np.ndarray:
+        array.setflags(write=False)
+        with self._lock:
+            if key in self._entries:
+                return self._entries[key]
+
+            self._entries[key] = array
+            self._bytes += array.nbytes
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.nbytes
+        return array
+
+    def _decode(self, path: Path) -> np.ndarray:
+        """Full-resolution RGB decode, honouring EXIF orientation like cv2.imread does."""
+        with Image.open(path) as img:
+            img = ImageOps.exif_transpose(img)
+            return np.asarray(img.convert("RGB"))
+
+    def get_array(
+        self,
+        path: Path,
+        size: Optional[Tuple[int, int]] = None,
+        order: str = "RGB",
+        resample: int = Image.Resampling.BICUBIC
+    ) -> np.ndarray:
+        """
+        Get a read-only HxWx3 uint8 array of the image.
+
+        Args:
+            path: Image file
+            size: Optional (width, height) to resize to
+            order: "RGB" (PIL/transformers) or "BGR" (OpenCV/Ultralytics)
+            resample: PIL resampling filter used when size is given
+
+        Returns:
+            Read-only numpy array; copy it before modifying
+        """
+        if order not in ("RGB", "BGR"):
+            raise ValueError(f"Unsupported channel order: {order}")
+
+        key = self._key(path, size, order, resample)
+        array = self._lookup(key)
+        if array is not None:
+            return array
+
+        if order == "BGR":
+            # Channel swap of the cached RGB variant is far cheaper than a decode
+            rgb = self.get_array(path, size, "RGB", resample)
+            with self._lock:
+                self.misses += 1
+            return self._store(key, np.ascontiguousarray(rgb[:, :, ::-1]))
+
+        if size is not None:
+            full = self.get_array(path, None, "RGB")
+            resized = np.asarray(Image.fromarray(full).resize(size, resample))
+            with self._lock:
+                self.misses += 1
+            return self._store(key, resized)
+
+        with self._lock:
+            decode_lock = self._decode_locks.setdefault(key[0], threading.Lock())
+        with decode_lock:
+            array = self._lookup(key)
+            if array is not None:
+                return array
+            with self._lock:
+                self.misses += 1
+            logger.debug(f"[ImageCache] Decoding {Path(path).name}")
+            return self._store(key, self._decode(path))
+
+    def get_pil(
+        self,
+        path: Path,
+        size: Optional[Tuple[int, int]] = None,
+        resample: int = Image.Resampling.BICUBIC
+    ) -> Image.Image:
+        """Get an RGB PIL image backed by the cached array."""
+        return Image.fromarray(self.get_array(path, size, "RGB", resample))
+
+    def invalidate(self, path: Path):
+        """Drop every cached variant of a file."""
+        resolved = str(Path(path).resolve())
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == resolved]:
+                self._bytes -= self._entries.pop(key).nbytes
+            self._decode_locks.pop(resolved, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
+
+# Global instance
+image_cache = DecodedImageCache()
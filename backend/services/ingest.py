@@ -0,0 +1,129 @@
+"""
+Streaming upload ingest.
+
+Reading an UploadFile with `await image.read()` buffers the whole body in RAM.
+Here chunks are written straight to a temp file while the content hash is
+updated and the format/dimensions are sniffed from the first bytes, so size
+and pixel limits are enforced early and memory stays constant per upload.
+The finished file is atomically renamed into the content-addressed store.
+
+File I/O, hashing and the commit (which builds the resolution pyramid: a
+full decode plus several encodes) run on worker threads, so an upload never
+stalls other requests on the event loop.
+"""
+import asyncio
+import hashlib
+import io
+from pathlib import Path
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, UploadFile
+from PIL import Image
+
+from backend.core.config import settings
+from backend.services.logging import logger
+from backend.services.storage import ASSET_ID_LENGTH, commit_upload, new_upload_temp_path
+
+# Bytes needed to find dimensions; JPEG SOF can sit after a large EXIF block
+HEADER_PROBE_LIMIT = 512 * 1024
+
+
+def sniff_format(head: bytes) -> Optional[str]:
+    """Map magic bytes to a file extension, or None for unsupported content."""
+    if head.startswith(b"\xff\xd8\xff"):
+        return ".jpg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return ".png"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return ".webp"
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return ".gif"
+    if head[:2] == b"BM":
+        return ".bmp"
+    return None
+
+
+def _write_chunk(f, hasher, chunk: bytes):
+    # hashlib releases the GIL for large buffers, so both halves run off the loop
+    hasher.update(chunk)
+    f.write(chunk)
+
+
+def _probe_size(head: bytes) -> Optional[Tuple[int, int]]:
+    """Read image dimensions from a (possibly truncated) header buffer."""
+    try:
+        with Image.open(io.BytesIO(head)) as img:
+            return img.size
+    except Exception:
+        return None
+
+
+async def ingest_upload(upload: UploadFile) -> Path:
+    """
+    Stream an UploadFile into the upload store.
+
+    Args:
+        upload: FastAPI upload
+
+    Returns:
+        Path to the stored upload (stem is the asset id)
+
+    Raises:
+        HTTPException: 400 empty, 413 too large (bytes or pixels), 415 not an image
+    """
+    max_bytes = settings.max_upload_mb * 1024 * 1024
+    chunk_size = settings.upload_chunk_kb * 1024
+
+    # Starlette knows the spooled size already - reject before reading anything
+    if upload.size is not None and upload.size > max_bytes:
+        raise HTTPException(413, f"Upload exceeds {settings.max_upload_mb}MB")
+
+    hasher = hashlib.sha256()
+    head = b""
+    ext = None
+    size = None
+    total = 0
+    tmp_path = new_upload_temp_path()
+
+    try:
+        f = await asyncio.to_thread(open, tmp_path, "wb")
+        try:
+            while True:
+                chunk = await upload.read(chunk_size)
+                if not chunk:
+                    break
+
+                total += len(chunk)
+                if total > max_bytes:
+                    raise HTTPException(413, f"Upload exceeds {settings.max_upload_mb}MB")
+
+                # Sniff format and dimensions from the first bytes only
+                if size is None and len(head) < HEADER_PROBE_LIMIT:
+                    head += chunk[:HEADER_PROBE_LIMIT - len(head)]
+                    if ext is None and len(head) >= 12:
+                        ext = sniff_format(head)
+                        if ext is None:
+                            raise HTTPException(415, "File must be a JPEG, PNG, WebP, GIF or BMP image")
+                    size = _probe_size(head)
+                    if size is not None and size[0] * size[1] > settings.max_upload_pixels:
+                        raise HTTPException(413, f"Image is {size[0]}x{size[1]}, above the {settings.max_upload_pixels} pixel limit")
+
+                await asyncio.to_thread(_write_chunk, f, hasher, chunk)
+        finally:
+            await asyncio.to_thread(f.close)
+
+        if total == 0:
+            raise HTTPException(400, "Empty image file")
+        if ext is None:
+            raise HTTPException(415, "File must be a JPEG, PNG, WebP, GIF or BMP image")
+        if size is None:
+            raise HTTPException(415, "Could not read image dimensions")
+
+        asset_id = hasher.hexdigest()[:ASSET_ID_LENGTH]
+        path = await asyncio.to_thread(commit_upload, tmp_path, asset_id, ext)
+        logger.info(f"Ingested {upload.filename} -> {path.name} ({total / 1024:.0f}KB, {size[0]}x{size[1]})")
+        return path
+
+    finally:
+        # commit_upload renames or removes the temp file; anything left is a failed upload
+        tmp_path.unlink(missing_ok=True)
@@ -0,0 +1,194 @@
+"""
+Upload-time precompute pipeline.
+
+When an image is uploaded we already know what the next requests will need:
+room type, YOLO detections, a working-resolution copy and the SAM embedding.
+Those stages run in a background worker and their results are stored against
+the asset id so later endpoints can await them instead of recomputing.
+"""
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from backend.core.config import settings
+from backend.services.logging import logger
+from backend.services.storage import find_upload, load_working_image, upload_url
+
+
+class AssetRecord:
+    """Precompute state for a single uploaded asset."""
+
+    STAGES = ("working", "room", "detections", "sam_embedding")
+
+    def __init__(self, asset_id: str, path: Path):
+        self.asset_id = asset_id
+        self.path = path
+        self.created_at = time.time()
+        # One future per stage; resolved by the worker as each stage finishes
+        self.stages: Dict[str, Future] = {name: Future() for name in self.STAGES}
+        self.timings_ms: Dict[str, int] = {}
+
+    def stage_status(self, name: str) -> str:
+        future = self.stages[name]
+        if not future.done():
+            return "running" if future.running() else "pending"
+        if future.cancelled():
+            return "skipped"
+        return "failed" if future.exception() else "done"
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-friendly view of the finished stages."""
+        data = {
+            "asset_id": self.asset_id,
+            "image_path": upload_url(self.path),
+            "stages": {name: self.stage_status(name) for name in self.STAGES},
+            "timings_ms": dict(self.timings_ms),
+        }
+
+        if self.stage_status("room") == "done":
+            data.update(self.stages["room"].result())
+        if self.stage_status("detections") == "done":
+            data["detections"] = self.stages["detections"].result()
+        if self.stage_status("working") == "done":
+            data["working_size"] = list(self.stages["working"].result().size)
+
+        return data
+
+
+class PrecomputePipeline:
+    """Runs upload-time analysis in the background and caches it per asset."""
+
+    def __init__(self, max_workers: int = settings.precompute_workers, max_assets: int = settings.precompute_max_assets):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="precompute")
+        self._records: "OrderedDict[str, AssetRecord]" = OrderedDict()
+        self._max_assets = max_assets
+        self._lock = threading.Lock()
+
+    def submit(self, asset_id: str, path: Path) -> AssetRecord:
+        """Register an asset and queue its precompute stages."""
+        with self._lock:
+            record = self._records.get(asset_id)
+            if record is not None:
+                self._records.move_to_end(asset_id)
+                return record
+
+            record = AssetRecord(asset_id, path)
+            self._records[asset_id] = record
+            while len(self._records) > self._max_assets:
+                self._records.popitem(last=False)
+
+        if settings.precompute_enabled:
+            self._executor.submit(self._run, record)
+        else:
+            for future in record.stages.values():
+                future.cancel()
+
+        return record
+
+    def get(self, asset_id: str) -> Optional[AssetRecord]:
+        with self._lock:
+            return self._records.get(asset_id)
+
+    def discard(self, asset_id: str):
+        """Forget an asset whose files were deleted."""
+        with self._lock:
+            self._records.pop(asset_id, None)
+
+    def ensure(self, asset_id: str) -> Optional[AssetRecord]:
+        """
+        Get the record for an asset, re-queuing it if the upload exists on disk
+        but its record was evicted (or the server restarted).
+        """
+        record = self.get(asset_id)
+        if record is not None:
+            return record
+
+        path = find_upload(asset_id)
+        if path is None:
+            return None
+        return self.submit(asset_id, path)
+
+    async def result(self, asset_id: str, stage: str, timeout: Optional[float] = None) -> Any:
+        """
+        Await a precomputed stage for an asset.
+        Returns None if the asset is unknown or the stage failed/was skipped,
+        so callers can fall back to computing it themselves.
+        """
+        record = self.ensure(asset_id)
+        if record is None:
+            return None
+
+        future = record.stages[stage]
+        if future.cancelled():
+            return None
+
+        try:
+            return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"[Precompute] {stage} for {asset_id} not ready after {timeout}s")
+            return None
+        except Exception as e:
+            logger.warning(f"[Precompute] {stage} for {asset_id} failed: {e}")
+            return None
+
+    def _run_stage(self, record: AssetRecord, name: str, fn):
+        future = record.stages[name]
+        if not future.set_running_or_notify_cancel():
+            return
+
+        start = time.time()
+        try:
+            future.set_result(fn(record.path))
+        except Exception as e:
+            logger.error(f"[Precompute] {name} failed for {record.asset_id}: {e}")
+            future.set_exception(e)
+        finally:
+            record.timings_ms[name] = int((time.time() - start) * 1000)
+
+    def _run(self, record: AssetRecord):
+        """Worker body: cheap stages first so the UI gets something quickly."""
+        logger.info(f"[Precompute] Starting stages for {record.asset_id}")
+
+        self._run_stage(record, "working", _working_image)
+        self._run_stage(record, "room", _classify_room)
+        self._run_stage(record, "detections", _detect_furniture)
+        if settings.precompute_sam:
+            self._run_stage(record, "sam_embedding", _sam_embedding)
+        else:
+            record.stages["sam_embedding"].cancel()
+
+        logger.info(f"[Precompute] Done {record.asset_id}: {record.timings_ms}")
+
+
+# Stage implementations (imported lazily so importing this module stays cheap)
+
+def _working_image(path: Path):
+    return load_working_image(path)
+
+
+def _classify_room(path: Path) -> Dict[str, Any]:
+    from backend.room_type_detection.room_classifier import room_classifier
+    room_type, confidence, candidates = room_classifier.classify(path)
+    return {
+        "detected_room_type": room_type,
+        "room_confidence": confidence,
+        "room_top3": candidates
+    }
+
+
+def _detect_furniture(path: Path):
+    from backend.ai.vision.detector import YOLODetector
+    return YOLODetector().detect_furniture(path)
+
+
+def _sam_embedding(path: Path) -> bool:
+    from backend.ai.segmentation.sam_service import sam_segmenter
+    return sam_segmenter.precompute_embedding(path)
+
+
+# Global instance
+precompute_pipeline = PrecomputePipeline()
@@ -0,0 +1,137 @@
+"""
+Multi-resolution image pyramid built at ingest.
+
+Consumers rarely need the full-resolution original: the room classifier looks
+at 224px, YOLO letterboxes to 640px, SAM encodes at 1024px and the diffusion
+pipelines run at 512px. At upload we decode once at reduced scale (JPEG draft
+mode lets libjpeg skip most of the IDCT work) and write a few smaller levels
+next to the original. Each stage then opens the smallest level that meets its
+needs via select_level().
+"""
+import json
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from PIL import Image, ImageOps
+
+from backend.services.logging import logger
+
+# Level name -> target length of the SHORT side (matches resize_image semantics)
+LEVELS = (
+    ("thumb", 256),
+    ("work", 512),
+    ("edit", 1024),
+)
+
+MANIFEST_NAME = "manifest.json"
+
+
+def pyramid_dir(image_path: Path) -> Path:
+    """Levels live in a directory named after the original, next to it."""
+    image_path = Path(image_path)
+    return image_path.parent / image_path.stem
+
+
+def build_pyramid(image_path: Path, quality: int = 90) -> Dict:
+    """
+    Build the pyramid levels for an uploaded image.
+
+    Args:
+        image_path: Path to the stored original
+        quality: JPEG quality for the levels
+
+    Returns:
+        Manifest dict with the original size and each level's file and size
+    """
+    image_path = Path(image_path)
+    out_dir = pyramid_dir(image_path)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    largest = LEVELS[-1][1]
+    with Image.open(image_path) as img:
+        # Upright size of the original, without decoding pixels
+        orientation = img.getexif().get(0x0112, 1)
+        orig_w, orig_h = img.size
+        if orientation in (5, 6, 7, 8):
+            orig_w, orig_h = orig_h, orig_w
+
+        # Reduced-scale decode: libjpeg picks the largest 1/2, 1/4, 1/8 scale
+        # that still leaves both sides >= the requested size. No-op for PNG etc.
+        img.draft("RGB", (largest, largest))
+        base = ImageOps.exif_transpose(img).convert("RGB")
+
+    manifest = {
+        "original": {"file": image_path.name, "size": [orig_w, orig_h]},
+        "levels": {}
+    }
+
+    for name, short_side in LEVELS:
+        if short_side >= min(orig_w, orig_h):
+            # Level would not be smaller than the original - just use the original
+            continue
+
+        scale = short_side / min(orig_w, orig_h)
+        size = (max(1, round(orig_w * scale)), max(1, round(orig_h * scale)))
+        level = base.resize(size, Image.Resampling.LANCZOS) if base.size != size else base
+        level_file = f"{name}.jpg"
+        level.save(out_dir / level_file, format="JPEG", quality=quality)
+        manifest["levels"][name] = {"file": level_file, "size": list(size)}
+
+    (out_dir / MANIFEST_NAME).write_text(json.dumps(manifest))
+    load_manifest.cache_clear()
+    logger.info(f"[Pyramid] {image_path.name}: {orig_w}x{orig_h} -> {list(manifest['levels'])}")
+    return manifest
+
+
+@lru_cache(maxsize=1024)
+def load_manifest(image_path: Path) -> Optional[Dict]:
+    """Read the pyramid manifest for an image, or None if it has no pyramid."""
+    manifest_path = pyramid_dir(image_path) / MANIFEST_NAME
+    if not manifest_path.exists():
+        return None
+    try:
+        return json.loads(manifest_path.read_text())
+    except Exception as e:
+        logger.warning(f"[Pyramid] Bad manifest for {Path(image_path).name}: {e}")
+        return None
+
+
+def original_size(image_path: Path) -> Optional[Tuple[int, int]]:
+    """Upright (width, height) of the original, if a pyramid exists."""
+    manifest = load_manifest(Path(image_path))
+    return tuple(manifest["original"]["size"]) if manifest else None
+
+
+def select_level(image_path: Path, min_short: int = 0, min_long: int = 0) -> Tuple[Path, float]:
+    """
+    Pick the smallest pyramid level meeting a stage's resolution needs.
+
+    Args:
+        image_path: Path to the original image
+        min_short: Required length of the short side in pixels
+        min_long: Required length of the long side in pixels
+
+    Returns:
+        (path to read, scale) where scale = level pixels per original pixel.
+        Images without a pyramid (generated images, masks) return (image_path, 1.0).
+    """
+    image_path = Path(image_path)
+    manifest = load_manifest(image_path)
+    if not manifest:
+        return image_path, 1.0
+
+    orig_w = manifest["original"]["size"][0]
+    out_dir = pyramid_dir(image_path)
+
+    for name, _ in LEVELS:
+        level = manifest["levels"].get(name)
+        if level is None:
+            continue
+        w, h = level["size"]
+        if min(w, h) >= min_short and max(w, h) >= min_long:
+            level_path = out_dir / level["file"]
+            if level_path.exists():
+                return level_path, w / orig_w
+
+    return image_path, 1.0
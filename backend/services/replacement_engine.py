@@ -1,76 +1,275 @@
-import json
-from pathlib import Path
-from typing import List, Dict
+import math
+import numpy as np
+from typing import List, Dict, Optional, Tuple
+from backend.services.catalog import Catalog, CatalogSnapshot, catalog
 from backend.services.logging import logger
 
 class ReplacementEngine:
     """Rule-based furniture replacement suggestions"""
-    
-    def __init__(self, catalog_path: str = "catalog.json"):
-        self.catalog_path = Path(catalog_path)
-        self.catalog = self._load_catalog()
-        self.grouped_catalog = self._group_by_category()
-    
-    def _load_catalog(self) -> List[Dict]:
-        """Load furniture catalog"""
-        if not self.catalog_path.exists():
-            logger.warning(f"Catalog not found at {self.catalog_path}, using empty catalog")
+
+    # The knapsack DP works in cost units. When the gcd of the candidate prices
+    # keeps the capacity within BUDGET_RESOLUTION, that gcd is the unit and
+    # costs are exact. Otherwise the budget is discretized into
+    # BUDGET_RESOLUTION units and item costs are rounded UP: every allocation
+    # returned still fits in rupees, but one that fits only within the rounding
+    # slack (at most one unit per chosen item) can be missed.
+    BUDGET_RESOLUTION = 1000
+    # Options per detection kept for the DP: the cheapest item in each of this
+    # many equal-width score buckets, so a pick is never more than one bucket
+    # (1/MAX_GROUP_OPTIONS of the category's score range) below the best
+    # affordable item at that cost.
+    MAX_GROUP_OPTIONS = 32
+
+    def __init__(self, catalog: Catalog = catalog):
+        self.catalog = catalog
+        self._version = None
+        self._quality: Dict[str, np.ndarray] = {}
+
+    def _quality_for(self, snapshot: CatalogSnapshot) -> Dict[str, np.ndarray]:
+        """Per-category quality arrays (aligned with the category price index), rebuilt per catalog version."""
+        if self._version != snapshot.version:
+            self._quality = {
+                category: self._quality_scores(snapshot.score[index.rows], index.prices)
+                for category, index in snapshot.by_category.items()
+            }
+            self._version = snapshot.version
+        return self._quality
+
+    @staticmethod
+    def _quality_scores(explicit: np.ndarray, prices: np.ndarray) -> np.ndarray:
+        """
+        Quality in [0, 1] per item. Uses an explicit "score" field when the
+        catalog has one; otherwise price is the quality proxy, log-scaled
+        within the category so a 2x price is not worth 2x the score.
+        """
+        if len(explicit) and not np.isnan(explicit).any():
+            return np.clip(explicit.astype(np.float64), 0.0, 1.0)
+        top = math.log1p(prices.max()) if len(prices) else 1.0
+        return np.log1p(prices) / top if top > 0 else np.ones(len(prices))
+
+    def _item_scores(self, snapshot: CatalogSnapshot, category: str, style: Optional[str]) -> np.ndarray:
+        scores = self._quality_for(snapshot)[category].copy()
+        style_index = snapshot.by_style.get(style.lower()) if style else None
+        if style_index is not None:
+            # Style match bonus
+            scores[np.isin(snapshot.by_category[category].rows, style_index.rows)] += 0.5
+        return scores
+
+    def _candidates(self, snapshot: CatalogSnapshot, category: str, budget: int, style: Optional[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Positions in the category's price index worth considering for one
+        detection: affordable and not dominated (a pricier item must score
+        strictly higher than every cheaper one). Returns (positions, scores),
+        price ascending.
+        """
+        index = snapshot.by_category[category]
+        scores = self._item_scores(snapshot, category, style)
+        affordable = index.range(max_price=budget).stop
+        if affordable == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        best_cheaper = np.maximum.accumulate(np.concatenate(([-np.inf], scores[:affordable - 1])))
+        keep = np.nonzero(scores[:affordable] > best_cheaper)[0]
+        return keep, scores[keep]
+
+    def _cost_unit(self, budget: int, prices: List[np.ndarray]) -> int:
+        """
+        Rupees per DP cost unit: the gcd of all candidate prices when that
+        keeps the capacity within BUDGET_RESOLUTION (exact), else a
+        budget/BUDGET_RESOLUTION grid with costs rounded up (approximate).
+        """
+        exact = int(np.gcd.reduce(np.concatenate(prices))) if prices else 0
+        if exact > 0 and budget // exact <= self.BUDGET_RESOLUTION:
+            return exact
+        unit = max(1, math.ceil(budget / self.BUDGET_RESOLUTION))
+        logger.debug(f"Allocation uses approximate cost unit ₹{unit} (price gcd ₹{exact})")
+        return unit
+
+    def _bucketed(self, scores: np.ndarray) -> np.ndarray:
+        """
+        Positions to keep out of a price-ascending, score-increasing option
+        list: the cheapest option in each score bucket (see MAX_GROUP_OPTIONS).
+        """
+        if len(scores) <= self.MAX_GROUP_OPTIONS:
+            return np.arange(len(scores))
+        low, high = scores[0], scores[-1]
+        buckets = np.minimum(
+            ((scores - low) / (high - low) * self.MAX_GROUP_OPTIONS).astype(np.int64),
+            self.MAX_GROUP_OPTIONS - 1
+        )
+        first_of_bucket = np.concatenate(([True], buckets[1:] != buckets[:-1]))
+        return np.nonzero(first_of_bucket)[0]
+
+    def allocate(
+        self,
+        detections: List[Dict],
+        budget: int,
+        top_k: int = 3,
+        style: Optional[str] = None,
+        snapshot: Optional[CatalogSnapshot] = None
+    ) -> List[Dict]:
+        """
+        Choose at most one catalog item per detection to maximize total score
+        within the budget (multiple-choice knapsack, top-k by DP). Work and
+        memory are O(detections x MAX_GROUP_OPTIONS x BUDGET_RESOLUTION x top_k)
+        whatever the catalog size; see the class constants for the two
+        approximations (cost rounding, score buckets).
+
+        Args:
+            detections: List of detected furniture items
+            budget: User's budget
+            top_k: Number of allocations to return
+            style: Optional design style; matching items score higher
+            snapshot: Catalog version to use (defaults to the current one)
+
+        Returns:
+            Allocations, best first:
+            [{"items": [{"detection_index", "item"}], "total_cost", "score", "remaining_budget"}]
+        """
+        if budget <= 0:
             return []
-        
-        with open(self.catalog_path, 'r') as f:
-            return json.load(f)
-    
-    def _group_by_category(self) -> Dict[str, List[Dict]]:
-        """Group catalog items by category, sorted by price"""
-        grouped = {}
-        
-        for item in self.catalog:
-            category = item.get("category", "").lower()
-            if category not in grouped:
-                grouped[category] = []
-            grouped[category].append(item)
-        
-        # Sort each category by price ascending
-        for category in grouped:
-            grouped[category].sort(key=lambda x: x.get("price", 999999))
-        
-        return grouped
-    
-    def suggest_replacements(self, detections: List[Dict], budget: int, max_suggestions: int = 3):
+        snapshot = snapshot or self.catalog.snapshot
+
+        # One group per detection with a catalog category; option 0 = keep the existing item
+        candidates = []
+        for index, detection in enumerate(detections):
+            category = detection["category"]
+            if category not in snapshot.by_category:
+                continue
+            indices, scores = self._candidates(snapshot, category, budget, style)
+            if len(indices) == 0:
+                continue
+            candidates.append((index, category, indices, scores, snapshot.by_category[category].prices[indices]))
+
+        if not candidates:
+            return []
+
+        unit = self._cost_unit(budget, [prices for *_, prices in candidates])
+        capacity = budget // unit
+
+        groups = []
+        for index, category, indices, scores, prices in candidates:
+            costs = -(-prices // unit)
+            # Items rounding to the same cost unit: only the best-scoring one can matter
+            # (costs are ascending and scores strictly increasing after _candidates)
+            last_of_unit = np.append(costs[1:] != costs[:-1], True)
+            indices, costs, scores = indices[last_of_unit], costs[last_of_unit], scores[last_of_unit]
+            keep = self._bucketed(scores)
+            indices, costs, scores = indices[keep], costs[keep], scores[keep]
+            groups.append({
+                "detection_index": index,
+                "category": category,
+                "indices": indices,
+                "costs": np.concatenate(([0], costs)),
+                "scores": np.concatenate(([0.0], scores)),
+            })
+
+        # Extra DP depth: identical categories produce permuted duplicates that are dropped below
+        depth = top_k * 3
+        # dp[c, r] = r-th best score of choices so far costing exactly c units
+        dp = np.full((capacity + 1, depth), -np.inf)
+        dp[0, 0] = 0.0
+        back = []
+        for group in groups:
+            # Merge one option at a time into the running top-depth per capacity,
+            # never materializing the (capacity x options x depth) tensor
+            best = np.full((capacity + 1, depth), -np.inf)
+            best_option = np.zeros((capacity + 1, depth), dtype=np.int64)
+            best_rank = np.zeros((capacity + 1, depth), dtype=np.int64)
+            ranks = np.broadcast_to(np.arange(depth), (capacity + 1, depth))
+            for option, (cost, score) in enumerate(zip(group["costs"], group["scores"])):
+                if cost > capacity:
+                    break
+                shifted = np.full((capacity + 1, depth), -np.inf)
+                shifted[cost:] = dp[:capacity + 1 - cost] + score
+                merged = np.concatenate((best, shifted), axis=1)
+                order = np.argsort(-merged, axis=1, kind="stable")[:, :depth]
+                best = np.take_along_axis(merged, order, axis=1)
+                best_option = np.take_along_axis(
+                    np.concatenate((best_option, np.full((capacity + 1, depth), option)), axis=1), order, axis=1
+                )
+                best_rank = np.take_along_axis(np.concatenate((best_rank, ranks), axis=1), order, axis=1)
+            dp = best
+            back.append((best_option, best_rank))
+
+        # Best end states across all capacities (ties -> cheaper first)
+        finite = np.argwhere(np.isfinite(dp))
+        ranked = sorted(finite.tolist(), key=lambda cr: (-dp[cr[0], cr[1]], cr[0]))
+
+        allocations = []
+        seen = set()
+        for c, r in ranked:
+            if len(allocations) >= top_k:
+                break
+            score = float(dp[c, r])
+            chosen = []
+            picks = []
+            for group, (options, ranks) in zip(reversed(groups), reversed(back)):
+                option, prev_rank = int(options[c, r]), int(ranks[c, r])
+                if option > 0:
+                    row = snapshot.by_category[group["category"]].rows[group["indices"][option - 1]]
+                    item = snapshot.item(row)
+                    chosen.append({"detection_index": group["detection_index"], "item": item})
+                    picks.append((group["category"], int(row)))
+                c, r = c - int(group["costs"][option]), prev_rank
+            chosen.reverse()
+            # Same items on interchangeable detections (two chairs swapped) is one allocation.
+            # Keyed by catalog row, since sku is optional in the catalog file.
+            signature = tuple(sorted(picks))
+            if signature in seen:
+                continue
+            seen.add(signature)
+            total_cost = sum(entry["item"].get("price", 0) for entry in chosen)
+            allocations.append({
+                "items": chosen,
+                "total_cost": total_cost,
+                "score": round(score, 4),
+                "remaining_budget": budget - total_cost
+            })
+
+        return allocations
+
+    def suggest_replacements(self, detections: List[Dict], budget: int, max_suggestions: int = 3, top_k: int = 3):
         """
         Generate replacement suggestions for detected items
-        
+
         Args:
             detections: List of detected furniture items
             budget: User's budget
             max_suggestions: Number of alternatives per item
-        
+            top_k: Number of alternative whole-room allocations to compute
+
         Returns:
             suggestions: List of suggestions with detected item and alternatives
-            remaining_budget: Budget after suggestions
+                (the budget-optimal pick first)
+            remaining_budget: Budget after the best allocation
+            allocations: Top-k allocations from allocate()
         """
+        snapshot = self.catalog.snapshot
+        allocations = self.allocate(detections, budget, top_k=top_k, snapshot=snapshot)
+        best = {entry["detection_index"]: entry["item"] for entry in allocations[0]["items"]} if allocations else {}
+
         suggestions = []
-        total_cost = 0
-        
-        for detection in detections:
+        for index, detection in enumerate(detections):
             category = detection["category"]
-            
-            # Get cheapest alternatives from catalog
-            alternatives = self.grouped_catalog.get(category, [])[:max_suggestions]
-            
+
+            # Cheapest alternatives from catalog, with the allocated pick in front
+            category_index = snapshot.by_category.get(category)
+            alternatives = snapshot.items(category_index.rows[:max_suggestions]) if category_index else []
+            chosen = best.get(index)
+            if chosen is not None:
+                alternatives = [chosen] + [item for item in alternatives if item != chosen][:max_suggestions - 1]
+
             if alternatives:
-                # Calculate cost (use first/cheapest option)
-                item_cost = alternatives[0].get("price", 0)
-                total_cost += item_cost
-                
                 suggestions.append({
                     "detected": detection,
-                    "suggested_items": alternatives
+                    "suggested_items": alternatives,
+                    "allocated": chosen
                 })
-        
+
+        total_cost = allocations[0]["total_cost"] if allocations else 0
         remaining_budget = budget - total_cost
-        
+
         logger.info(f"Generated {len(suggestions)} replacement suggestions")
         logger.info(f"Total suggested cost: ₹{total_cost} | Remaining: ₹{remaining_budget}")
-        
-        return suggestions, remaining_budget
+
+        return suggestions, remaining_budget, allocations
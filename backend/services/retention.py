@@ -0,0 +1,190 @@
+"""
+Storage quota and retention.
+
+Uploads, generated images and masks accumulate forever otherwise. Each asset
+kind gets a size quota and a maximum idle age (settings.retention_*). A
+background sweeper enforces them incrementally: every tick it flushes buffered
+access times, deletes at most retention_batch expired assets per kind and then
+evicts least-recently-used ones until the kind is back under quota.
+
+Everything is driven by the asset registry - the sweeper never walks the
+storage directories, and nothing here runs on the request path. Assets
+referenced by saved history sessions (and their parents) are pinned and never
+evicted.
+"""
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Set
+
+from backend.core.config import settings
+from backend.services.asset_registry import ASSET_KINDS, asset_registry
+from backend.services.logging import logger
+from backend.services.storage import purge_asset
+
+
+def retention_policy(kind: str) -> Dict[str, Optional[float]]:
+    """Quota for an asset kind: max_bytes / max_age_s (None = unlimited)."""
+    max_mb = getattr(settings, f"retention_{kind}_max_mb", 0)
+    max_days = getattr(settings, f"retention_{kind}_max_age_days", 0)
+    return {
+        "max_bytes": max_mb * 1024 * 1024 if max_mb > 0 else None,
+        "max_age_s": max_days * 86400 if max_days > 0 else None,
+    }
+
+
+def referenced_asset_ids(value: Any) -> Set[str]:
+    """
+    Candidate asset ids mentioned anywhere in a history payload.
+
+    Actions are free-form, so every string is treated as a possible asset id,
+    path or URL; the stem (and the parent directory, for pyramid levels and
+    thumbnails) is taken. Unknown ids are ignored by the registry when pinning.
+    """
+    found: Set[str] = set()
+    stack = [value]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, dict):
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple)):
+            stack.extend(item)
+        elif isinstance(item, str) and 0 < len(item) < 1024:
+            path = Path(item.split("?", 1)[0])
+            if path.stem:
+                found.add(path.stem)
+            if path.parent.name:
+                found.add(path.parent.name)
+    return found
+
+
+def pin_history_assets(sessions: Iterable[Dict[str, Any]]) -> int:
+    """Pin every asset referenced by the given history sessions."""
+    ids: Set[str] = set()
+    for session in sessions:
+        ids |= referenced_asset_ids(session.get("actions", []))
+    return asset_registry.pin(ids) if ids else 0
+
+
+class RetentionSweeper:
+    """Background thread that enforces per-kind quotas in bounded batches."""
+
+    def __init__(self, interval_s: float = settings.retention_interval_s, batch: int = settings.retention_batch):
+        self.interval_s = interval_s
+        self.batch = batch
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._history_pinned = False
+        self.last_run: Optional[float] = None
+        self.last_duration_ms: Optional[int] = None
+        self.deleted: Dict[str, int] = {kind: 0 for kind in ASSET_KINDS}
+        self.freed_bytes: Dict[str, int] = {kind: 0 for kind in ASSET_KINDS}
+
+    def start(self):
+        if not settings.retention_enabled or (self._thread and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="retention", daemon=True)
+        self._thread.start()
+        logger.info(f"[Retention] Sweeper started (every {self.interval_s}s)")
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.error(f"[Retention] Sweep failed: {e}")
+            self._stop.wait(self.interval_s)
+
+    def _pin_existing_history(self):
+        """One-off: pin assets from sessions saved before pinning existed."""
+        if self._history_pinned:
+            return
+        from backend.services.history_service import history_service
+        pinned = pin_history_assets(history_service.iter_sessions())
+        self._history_pinned = True
+        if pinned:
+            logger.info(f"[Retention] Pinned {pinned} assets referenced by history")
+
+    def sweep(self) -> Dict[str, int]:
+        """Run one bounded pass over every kind. Returns deletions per kind."""
+        start = time.time()
+        asset_registry.flush_touches()
+        self._pin_existing_history()
+
+        deleted = {}
+        for kind in ASSET_KINDS:
+            deleted[kind] = self._sweep_kind(kind, retention_policy(kind), start)
+
+        self.last_run = start
+        self.last_duration_ms = int((time.time() - start) * 1000)
+        if any(deleted.values()):
+            logger.info(f"[Retention] Deleted {deleted} in {self.last_duration_ms}ms")
+        return deleted
+
+    def _sweep_kind(self, kind: str, policy: Dict[str, Optional[float]], now: float) -> int:
+        budget = self.batch
+        deleted = 0
+
+        # Idle for too long
+        if policy["max_age_s"] is not None:
+            for row in asset_registry.eviction_candidates(kind, budget, accessed_before=now - policy["max_age_s"]):
+                self._purge(row)
+                deleted += 1
+            budget -= deleted
+
+        # Over quota: LRU until under
+        if policy["max_bytes"] is not None and budget > 0:
+            _, total = asset_registry.usage(kind)
+            if total > policy["max_bytes"]:
+                for row in asset_registry.eviction_candidates(kind, budget):
+                    total -= self._purge(row)
+                    deleted += 1
+                    if total <= policy["max_bytes"]:
+                        break
+
+        return deleted
+
+    def _purge(self, row: Dict[str, Any]) -> int:
+        size = row["bytes"] or 0
+        try:
+            purge_asset(row)
+        except Exception as e:
+            logger.warning(f"[Retention] Could not delete {row['asset_id']}: {e}")
+            return 0
+        if row["kind"] == "upload":
+            from backend.services.precompute import precompute_pipeline
+            precompute_pipeline.discard(row["asset_id"])
+        self.deleted[row["kind"]] += 1
+        self.freed_bytes[row["kind"]] += size
+        return size
+
+    def stats(self) -> Dict[str, Any]:
+        usage = {}
+        for kind in ASSET_KINDS:
+            count, total = asset_registry.usage(kind)
+            policy = retention_policy(kind)
+            usage[kind] = {
+                "count": count,
+                "bytes": total,
+                "max_bytes": policy["max_bytes"],
+                "max_age_days": policy["max_age_s"] / 86400 if policy["max_age_s"] else None,
+                "deleted": self.deleted[kind],
+                "freed_bytes": self.freed_bytes[kind],
+            }
+        return {
+            "enabled": settings.retention_enabled,
+            "running": bool(self._thread and self._thread.is_alive()),
+            "last_run": self.last_run,
+            "last_duration_ms": self.last_duration_ms,
+            "kinds": usage,
+        }
+
+
+# Global instance
+retention_sweeper = RetentionSweeper()
@@ -0,0 +1,206 @@
+"""
+Offline product/vendor search.
+
+An in-memory inverted index with BM25 ranking over catalog items (name,
+category, vendor, style tags) and the curated vendor directory (title,
+snippet, category). Planner steps like "modern platform bed" resolve to
+ranked products locally instead of a keyword if/elif chain plus a live web
+search per step.
+
+Documents can be added and removed one at a time; catalog reloads are
+applied as a diff by SKU, so the index never needs a full rebuild.
+"""
+import heapq
+import math
+import re
+import threading
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from backend.services.catalog import CatalogSnapshot, catalog
+from backend.services.logging import logger
+from backend.services.vendor_links import VendorLinks
+
+_STOPWORDS = {"a", "an", "and", "the", "for", "with", "of", "in", "to", "on", "new", "buy", "replace", "add", "my", "it", "this"}
+
+# Words users (and the planner) use for our categories
+_ALIASES = {
+    "couch": "sofa", "settee": "sofa", "loveseat": "sofa", "recliner": "sofa",
+    "monitor": "tv", "television": "tv",
+    "lamp": "decor", "plant": "decor", "vase": "decor", "rug": "decor", "clock": "decor",
+    "desk": "table", "stool": "chair", "armchair": "chair",
+}
+
+
+def canonical_token(token: str) -> str:
+    """Catalog category a token is an alias for ("couch" -> "sofa"), else the token itself."""
+    return _ALIASES.get(token, token)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens with stopwords dropped and plurals folded."""
+    tokens = []
+    for token in re.findall(r"[a-z0-9]+", text.lower()):
+        if token in _STOPWORDS:
+            continue
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+class SearchIndex:
+    """Inverted index with incremental add/remove and BM25 scoring."""
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._lengths: Dict[str, int] = {}
+        self._docs: Dict[str, Dict[str, Any]] = {}
+        self._doc_terms: Dict[str, List[str]] = {}
+        self._total_length = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._docs)
+
+    def add(self, doc_id: str, text: str, payload: Dict[str, Any]):
+        """Index (or re-index) a document."""
+        terms = Counter(tokenize(text))
+        with self._lock:
+            self._remove_locked(doc_id)
+            for term, tf in terms.items():
+                self._postings.setdefault(term, {})[doc_id] = tf
+            self._doc_terms[doc_id] = list(terms)
+            length = sum(terms.values())
+            self._lengths[doc_id] = length
+            self._total_length += length
+            self._docs[doc_id] = payload
+
+    def remove(self, doc_id: str):
+        with self._lock:
+            self._remove_locked(doc_id)
+
+    def _remove_locked(self, doc_id: str):
+        if doc_id not in self._docs:
+            return
+        del self._docs[doc_id]
+        self._total_length -= self._lengths.pop(doc_id)
+        for term in self._doc_terms.pop(doc_id, ()):
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self._postings[term]
+
+    def search(self, query: str, limit: int = 5, doc_type: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Rank documents for a free-text query.
+
+        Args:
+            query: Free text (planner prompt/target, user search)
+            limit: Max hits
+            doc_type: Only "product" or "vendor" documents
+
+        Returns:
+            Payload dicts with a "score" field, best first
+        """
+        terms = []
+        for token in tokenize(query):
+            terms.append(token)
+            if token in _ALIASES:
+                terms.append(_ALIASES[token])
+
+        with self._lock:
+            n = len(self._docs)
+            if n == 0 or not terms:
+                return []
+            avgdl = self._total_length / n
+            scores: Dict[str, float] = {}
+            for term in set(terms):
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, tf in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._lengths[doc_id] / avgdl)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+
+            if doc_type is not None:
+                scores = {d: s for d, s in scores.items() if self._docs[d]["type"] == doc_type}
+            best = heapq.nlargest(limit, scores.items(), key=lambda kv: kv[1])
+            return [dict(self._docs[doc_id], score=round(score, 3)) for doc_id, score in best]
+
+
+class ProductSearch(SearchIndex):
+    """SearchIndex fed from the catalog and the vendor directory."""
+
+    def __init__(self):
+        super().__init__()
+        self._catalog_docs: Dict[str, str] = {}   # doc id -> signature, for diffing on reload
+        self._index_vendors()
+        self.sync_catalog(catalog.snapshot)
+        catalog.on_reload(self.sync_catalog)
+
+    def _index_vendors(self):
+        for category, entries in VendorLinks.VENDOR_DIRECTORY.items():
+            for i, entry in enumerate(entries):
+                # Category twice: a field boost over incidental snippet words
+                text = f"{category} {category} {entry['title']} {entry.get('vendor', '')} {entry.get('snippet', '')}"
+                self.add(f"vendor:{category}:{i}", text, dict(entry, type="vendor", category=category, source="vendor_directory"))
+
+    def sync_catalog(self, snapshot: CatalogSnapshot):
+        """Apply a catalog version to the index: add new/changed items, drop removed ones."""
+        current: Dict[str, str] = {}
+        changed = []
+        for row in range(snapshot.size):
+            item = snapshot.item(row)
+            tags = [item.get("style", "")] + list(item.get("styles", []) or []) + list(item.get("tags", []) or [])
+            text = f"{item['category']} {item['category']} {item['name']} {item['vendor']} {' '.join(map(str, tags))}"
+            doc_id = f"catalog:{snapshot.keys[row]}"
+            signature = f"{text}|{item['price']}|{item['vendor_link']}"
+            current[doc_id] = signature
+            if self._catalog_docs.get(doc_id) != signature:
+                changed.append((doc_id, text, item))
+
+        removed = set(self._catalog_docs) - set(current)
+        for doc_id in removed:
+            self.remove(doc_id)
+        for doc_id, text, item in changed:
+            self.add(doc_id, text, {
+                "type": "product",
+                "sku": item["sku"],
+                "title": item["name"],
+                "link": item["vendor_link"],
+                "vendor": item["vendor"],
+                "category": item["category"],
+                "approx_price": item["price"],
+                "source": "catalog"
+            })
+        self._catalog_docs = current
+        logger.info(f"[Search] Catalog v{snapshot.version} indexed: ~{len(changed)} -{len(removed)} ({len(self)} docs)")
+
+    def resolve(self, query: str, limit: int = 5) -> Dict[str, Any]:
+        """
+        Resolve a planner step to a category and ranked suggestions.
+
+        Only categories the text names (directly or via an alias) count: a hit
+        that matched on a style or descriptive word alone ("modern" in
+        "Modern L-Shape Sofa Set" for "new modern curtains") says nothing about
+        what is being bought. When no indexed category is named, nothing is
+        resolved and the caller falls back to web search.
+
+        Returns:
+            {"category": str | None, "results": [...]}
+        """
+        named = {canonical_token(token) for token in tokenize(query)}
+        # Over-fetch: hits outside the named categories are dropped below
+        hits = [hit for hit in self.search(query, limit=limit * 4) if hit["category"] in named][:limit]
+        if not hits:
+            return {"category": None, "results": []}
+        return {"category": hits[0]["category"], "results": hits}
+
+
+# Global instance
+product_search = ProductSearch()
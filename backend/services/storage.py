@@ -2,58 +2,248 @@
 Storage utilities for managing uploads and generated images.
 """
 import hashlib
+import shutil
+import threading
 import uuid
 from pathlib import Path
+from typing import Optional
 from PIL import Image
-import io
 
 from backend.core.config import settings
+from backend.services.image_cache import image_cache
+from backend.services.pyramid import build_pyramid, select_level, pyramid_dir
+from backend.services.asset_registry import asset_registry
+from backend.services.logging import logger
+from backend.services.encoding import encode_image, output_extension, thumbnail_path
+
+
+# Uploads are content-addressed: <uploads>/<id[:2]>/<id[2:4]>/<id><ext>
+# where id is a truncated SHA-256 of the bytes. Re-uploading the same photo
+# is a hash + stat instead of a write, and the id is stable across sessions.
+# Lifetime is owned by the asset registry: history pins what sessions use and
+# the retention sweeper evicts the rest by access time.
+ASSET_ID_LENGTH = 32
+# Serializes dedup/commit against deletion, so a dedup hit never returns a path being purged
+_upload_lock = threading.Lock()
+
+
+def compute_asset_id(image_data: bytes) -> str:
+    """Content hash used as the upload's asset id."""
+    return hashlib.sha256(image_data).hexdigest()[:ASSET_ID_LENGTH]
+
+
+def upload_dir_for(asset_id: str) -> Path:
+    """Fanned-out directory holding an asset (keeps any one directory small)."""
+    return settings.uploads_dir / asset_id[:2] / asset_id[2:4]
+
+
+def upload_url(image_path: Path) -> str:
+    """Public /uploads URL for a stored upload."""
+    return "/uploads/" + Path(image_path).relative_to(settings.uploads_dir).as_posix()
+
+
+def _delete_upload_locked(asset_id: str):
+    path = find_upload(asset_id)
+    if path is not None:
+        image_cache.invalidate(path)
+        path.unlink(missing_ok=True)
+        shutil.rmtree(pyramid_dir(path), ignore_errors=True)
+    asset_registry.remove(asset_id)
+
+
+def purge_asset(row: dict):
+    """
+    Delete an asset and its derived files (used by retention).
+    
+    Args:
+        row: Asset registry record
+    """
+    if row["kind"] == "upload":
+        with _upload_lock:
+            _delete_upload_locked(row["asset_id"])
+        return
+    
+    path = settings.storage_dir / row["path"]
+    image_cache.invalidate(path)
+    path.unlink(missing_ok=True)
+    if row["kind"] == "generated":
+        thumbnail_path(path).unlink(missing_ok=True)
+    asset_registry.remove(row["asset_id"])
 
 
 def save_uploaded_image(image_data: bytes, filename: str) -> Path:
     """
-    Save uploaded image to storage.
+    Save uploaded image to the content-addressed store.
     
     Args:
         image_data: Image file bytes
         filename: Original filename
         
     Returns:
-        Path to saved file
+        Path to saved file (its stem is the asset id)
     """
-    # Generate unique filename
-    ext = Path(filename).suffix or ".jpg"
-    unique_name = f"{uuid.uuid4()}{ext}"
-    filepath = settings.uploads_dir / unique_name
+    asset_id = compute_asset_id(image_data)
+    ext = (Path(filename or "").suffix or ".jpg").lower()
+    
+    # Dedup check and write under one lock, so retention cannot purge in between
+    with _upload_lock:
+        existing = _dedup_hit_locked(asset_id)
+        if existing is not None:
+            return existing
+        tmp_path = new_upload_temp_path()
+        with open(tmp_path, "wb") as f:
+            f.write(image_data)
+        filepath = _store_locked(tmp_path, asset_id, ext)
+    
+    return _finish_upload(filepath, asset_id)
+
+
+def new_upload_temp_path() -> Path:
+    """Temp file on the same filesystem as the store, so commit is a rename."""
+    tmp_dir = settings.uploads_dir / ".tmp"
+    tmp_dir.mkdir(parents=True, exist_ok=True)
+    return tmp_dir / f"{uuid.uuid4().hex}.part"
+
+
+def commit_upload(tmp_path: Path, asset_id: str, ext: str) -> Path:
+    """
+    Move a fully written temp file into the content-addressed store.
+    
+    Args:
+        tmp_path: Temp file holding the bytes
+        asset_id: Content hash of the bytes
+        ext: File extension to store under
+        
+    Returns:
+        Path to the stored upload
+    """
+    with _upload_lock:
+        existing = _dedup_hit_locked(asset_id)
+        if existing is not None:
+            tmp_path.unlink(missing_ok=True)
+            return existing
+        filepath = _store_locked(tmp_path, asset_id, ext)
     
-    # Save image
-    with open(filepath, "wb") as f:
-        f.write(image_data)
+    return _finish_upload(filepath, asset_id)
+
+
+def _dedup_hit_locked(asset_id: str) -> Optional[Path]:
+    """Stored path if identical bytes are already stored (with their pyramid), else None."""
+    existing = find_upload(asset_id)
+    if existing is not None:
+        # Counts as a use, so retention keeps it as long as it keeps being uploaded
+        asset_registry.touch(asset_id)
+        logger.info(f"Upload dedup hit: {asset_id}")
+    return existing
+
+
+def _store_locked(tmp_path: Path, asset_id: str, ext: str) -> Path:
+    target_dir = upload_dir_for(asset_id)
+    target_dir.mkdir(parents=True, exist_ok=True)
+    filepath = target_dir / f"{asset_id}{ext}"
+    
+    # Atomic rename - concurrent identical uploads never expose a partial file
+    tmp_path.replace(filepath)
+    return filepath
+
+
+def _finish_upload(filepath: Path, asset_id: str) -> Path:
+    # Build reduced-resolution levels so consumers never decode the full original
+    manifest = None
+    try:
+        manifest = build_pyramid(filepath)
+    except Exception as e:
+        logger.warning(f"Pyramid build failed for {filepath.name}: {e}")
+    
+    width, height = manifest["original"]["size"] if manifest else (None, None)
+    asset_registry.register(
+        asset_id, "upload", filepath,
+        width=width, height=height,
+        size_bytes=filepath.stat().st_size,
+        content_hash=asset_id
+    )
     
     return filepath
 
 
-def save_generated_image(image: Image.Image, prefix: str = "generated") -> Path:
+def find_upload(asset_id: str) -> Optional[Path]:
+    """
+    Locate an uploaded image by its asset id (the stored file stem).
+
+    Args:
+        asset_id: Asset id returned by the upload endpoints
+
+    Returns:
+        Path to the upload, or None if it does not exist
     """
-    Save generated image to storage.
+    # Asset ids are bare stems; refuse anything that could escape uploads_dir
+    if not asset_id or Path(asset_id).name != asset_id or asset_id.startswith("."):
+        return None
+
+    # Indexed lookup - no filesystem probing on the hot path
+    row = asset_registry.get(asset_id)
+    if row is not None and row["kind"] == "upload":
+        return settings.storage_dir / row["path"]
+
+    # Content-addressed location first, then legacy flat uploads (uuid names)
+    for directory in (upload_dir_for(asset_id), settings.uploads_dir):
+        for candidate in directory.glob(f"{asset_id}.*"):
+            if candidate.is_file():
+                return candidate
+    return None
+
+
+def save_generated_image(
+    image: Image.Image,
+    prefix: str = "generated",
+    fmt: Optional[str] = None,
+    quality: Optional[int] = None,
+    stem: Optional[str] = None,
+    parent_id: Optional[str] = None,
+    operation: Optional[str] = None
+) -> Path:
+    """
+    Save generated image (and its thumbnail) to storage.
+    
+    Encoding runs on a worker thread; the returned path is final but the file
+    may still be being written. Use encoding.wait_for_encode() before reading it.
     
     Args:
         image: PIL Image object
         prefix: Filename prefix
+        fmt: Output format (webp, jpeg, png); defaults to settings.output_format
+        quality: Lossy quality; defaults to settings.output_quality
+        stem: Exact filename stem to use instead of prefix + uuid
+        parent_id: Asset id of the source image (lineage)
+        operation: What produced it (generate, inpaint, recolor)
         
     Returns:
         Path to saved file
     """
     # Generate unique filename
-    unique_name = f"{prefix}_{uuid.uuid4()}.png"
+    unique_name = f"{stem or f'{prefix}_{uuid.uuid4()}'}{output_extension(fmt)}"
     filepath = settings.generated_dir / unique_name
     
-    # Save as PNG for quality
-    image.save(filepath, format="PNG", quality=95)
+    future = encode_image(image, filepath, fmt, quality)
+    asset_registry.register(
+        filepath.stem, "generated", filepath,
+        width=image.width, height=image.height,
+        parent_id=parent_id, operation=operation
+    )
+    # Size is only known once encoded; retention quotas need it
+    future.add_done_callback(lambda f: f.exception() is None and _record_generated_bytes(filepath))
     
     return filepath
 
 
+def _record_generated_bytes(filepath: Path):
+    try:
+        size = filepath.stat().st_size + thumbnail_path(filepath).stat().st_size
+        asset_registry.set_bytes(filepath.stem, size)
+    except OSError as e:
+        logger.warning(f"Could not size {filepath.name}: {e}")
+
+
 def compute_image_hash(image_path: Path) -> str:
     """
     Compute hash of an image file for caching.
@@ -98,7 +288,9 @@ def resize_image(image_path: Path, target_width: int = 512, target_height: int =
     Returns:
         Resized PIL Image
     """
-    img = Image.open(image_path).convert("RGB")
+    # Smallest pyramid level whose short side still covers the target
+    level_path, _ = select_level(image_path, min_short=min(target_width, target_height))
+    img = image_cache.get_pil(level_path)
     
     # Calculate target dimensions ensuring multiples of 8
     width, height = img.size
@@ -130,3 +322,18 @@ def resize_image(image_path: Path, target_width: int = 512, target_height: int =
     
     # No cropping - return exact aspect ratio sized image
     return img
+
+
+def load_working_image(image_path: Path) -> Image.Image:
+    """
+    Load the image at the resolution the diffusion pipelines work at.
+    
+    Args:
+        image_path: Path to image file
+        
+    Returns:
+        RGB PIL Image at settings.image_width x settings.image_height
+    """
+    size = (settings.image_width, settings.image_height)
+    level_path, _ = select_level(image_path, min_short=max(size))
+    return image_cache.get_pil(level_path, size)
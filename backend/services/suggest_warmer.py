@@ -0,0 +1,125 @@
+"""
+Background warming of the web suggestion cache.
+
+Without it, the first request for a category after its entry expires pays
+for a full DuckDuckGo fan-out. The warmer runs on the event loop on a fixed
+schedule and re-fetches entries that are missing or close to expiry, for
+every detector category plus the queries users ask for most (planner
+targets). Calls are spread out with random jitter and capped in concurrency
+so a warm cycle never looks like a burst to the search backend.
+
+The vendor directory is static data and needs no warming.
+"""
+import asyncio
+import random
+import time
+from typing import Any, Dict, List, Optional
+
+from backend.core.config import settings
+from backend.services.logging import logger
+from backend.services.web_suggest import WebSuggest, normalize_query, web_suggest
+
+
+class SuggestWarmer:
+    """Periodically refreshes suggestion cache entries before they expire."""
+
+    def __init__(self, suggester: WebSuggest = web_suggest):
+        self.suggester = suggester
+        self.interval_s = settings.suggest_warm_interval_s
+        self._task: Optional[asyncio.Task] = None
+        self.last_run: Optional[float] = None
+        self.last_duration_ms: Optional[int] = None
+        self.last_warmed = 0
+        self.failures: Dict[str, str] = {}
+
+    def targets(self) -> List[str]:
+        """Detector categories first, then the most requested queries."""
+        from backend.ai.vision.detector import YOLODetector
+        categories = sorted(set(YOLODetector.CATEGORY_MAP.values()))
+        frequent = self.suggester.frequent_queries(settings.suggest_warm_top_queries)
+        return list(dict.fromkeys(normalize_query(t) for t in categories + frequent))
+
+    def needs_warming(self, key: str) -> bool:
+        age = self.suggester.cache.age(key)
+        return age is None or age >= self.suggester.cache.ttl_s * settings.suggest_warm_refresh_ratio
+
+    def start(self):
+        if not settings.suggest_warm_enabled or (self._task and not self._task.done()):
+            return
+        self._task = asyncio.get_running_loop().create_task(self._loop())
+        logger.info(f"[SuggestWarmer] Started (every {self.interval_s}s)")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _loop(self):
+        await asyncio.sleep(settings.suggest_warm_initial_delay_s)
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"[SuggestWarmer] Cycle failed: {e}")
+            await asyncio.sleep(self.interval_s)
+
+    async def run_once(self) -> int:
+        """Warm every target that is missing or near expiry. Returns how many were fetched."""
+        start = time.time()
+        due = [key for key in self.targets() if self.needs_warming(key)]
+        semaphore = asyncio.Semaphore(settings.suggest_warm_concurrency)
+
+        async def warm(key: str) -> bool:
+            # Jitter before taking a slot so calls trickle out instead of bursting
+            await asyncio.sleep(random.uniform(0, settings.suggest_warm_jitter_s))
+            async with semaphore:
+                try:
+                    await self.suggester.warm(key)
+                    self.failures.pop(key, None)
+                    return True
+                except Exception as e:
+                    self.failures[key] = str(e)
+                    logger.warning(f"[SuggestWarmer] {key} failed: {e}")
+                    return False
+
+        warmed = sum(await asyncio.gather(*(warm(key) for key in due)))
+
+        self.last_run = start
+        self.last_duration_ms = int((time.time() - start) * 1000)
+        self.last_warmed = warmed
+        if due:
+            logger.info(f"[SuggestWarmer] Warmed {warmed}/{len(due)} entries in {self.last_duration_ms}ms")
+        return warmed
+
+    def stats(self) -> Dict[str, Any]:
+        cache = self.suggester.cache
+        entries = {}
+        for key in self.targets():
+            age = cache.age(key)
+            entries[key] = {
+                "cached": age is not None,
+                "age_s": int(age) if age is not None else None,
+                "expires_in_s": int(cache.ttl_s - age) if age is not None else None,
+                "fresh": age is not None and age <= cache.ttl_s,
+            }
+        return {
+            "enabled": settings.suggest_warm_enabled,
+            "running": bool(self._task and not self._task.done()),
+            "interval_s": self.interval_s,
+            "last_run": self.last_run,
+            "last_duration_ms": self.last_duration_ms,
+            "last_warmed": self.last_warmed,
+            "warm": all(e["fresh"] for e in entries.values()),
+            "targets": entries,
+            "failures": self.failures,
+            "cache": cache.stats(),
+        }
+
+
+# Global instance
+suggest_warmer = SuggestWarmer()
@@ -173,28 +173,24 @@ class VendorLinks:
         Get direct vendor links for a category
         
         Returns:
+            Same shape as WebSuggest.search_suggestions:
             {
                 "results": [...],
-                "cache": "vendor_directory",
+                "source": "vendor_directory",
+                "cache": {"status": "static", "key": str, "hit_rate": None},
                 "latency_ms": 0
             }
         """
         category = category.lower()
         
-        if category in self.VENDOR_DIRECTORY:
-            results = self.VENDOR_DIRECTORY[category]
-            # Add source field
-            for result in results:
-                result["source"] = "vendor_directory"
-            
-            return {
-                "results": results,
-                "cache": "vendor_directory",
-                "latency_ms": 0
-            }
-        else:
-            return {
-                "results": [],
-                "cache": "vendor_directory",
-                "latency_ms": 0
-            }
+        results = self.VENDOR_DIRECTORY.get(category, [])
+        # Add source field
+        for result in results:
+            result["source"] = "vendor_directory"
+        
+        return {
+            "results": results,
+            "source": "vendor_directory",
+            "cache": {"status": "static", "key": category, "hit_rate": None},
+            "latency_ms": 0
+        }
@@ -0,0 +1,224 @@
+"""
+Visual similarity index over catalog item images.
+
+Built offline (python -m backend.services.visual_index): every catalog item
+with an "image" (URL, or path relative to the catalog file) is embedded and
+the vectors are written as one float16 matrix next to a small JSON manifest
+mapping rows to catalog item keys (catalog.item_key: the sku, or a hash when
+an item has none). At runtime the matrix is memory-mapped - nothing is
+loaded up front, and pages for categories nobody searches stay on disk.
+
+A query narrows to the in-budget rows of the detection's category via the
+catalog's price index, gathers just those vectors and ranks them with one
+matrix product and an argpartition.
+"""
+import io
+import json
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from PIL import Image
+
+from backend.core.config import settings
+from backend.services.catalog import catalog
+from backend.services.logging import logger
+
+MANIFEST_NAME = "manifest.json"
+
+
+class VisualIndex:
+    """Memory-mapped float16 embedding matrix with filtered top-k search."""
+
+    def __init__(self, index_dir: Path = settings.visual_index_dir):
+        self.index_dir = Path(index_dir)
+        self._lock = threading.Lock()
+        self._signature = None
+        self._matrix: Optional[np.memmap] = None
+        self._key_rows: Dict[str, int] = {}
+        self._row_map_version = None
+        self._catalog_rows: Optional[np.ndarray] = None
+        self.model: Optional[str] = None
+
+    def _manifest_signature(self):
+        try:
+            stat = (self.index_dir / MANIFEST_NAME).stat()
+            return stat.st_mtime_ns, stat.st_size
+        except FileNotFoundError:
+            return None
+
+    def _ensure_loaded(self) -> bool:
+        """(Re)map the matrix if the manifest changed. Returns False if there is no index."""
+        signature = self._manifest_signature()
+        if signature == self._signature:
+            return self._matrix is not None
+        with self._lock:
+            if signature != self._signature:
+                self._load(signature)
+        return self._matrix is not None
+
+    def _load(self, signature):
+        self._signature = signature
+        self._matrix, self._key_rows, self._row_map_version = None, {}, None
+        if signature is None:
+            return
+        manifest = json.loads((self.index_dir / MANIFEST_NAME).read_text())
+        # Manifests from before item keys list skus; their "" rows cannot be told apart
+        keys = manifest["keys"] if "keys" in manifest else manifest["skus"]
+        if keys:
+            self._matrix = np.memmap(
+                self.index_dir / manifest["matrix"], dtype=np.float16, mode="r",
+                shape=(len(keys), manifest["dim"])
+            )
+        self._key_rows = {key: row for row, key in enumerate(keys) if key}
+        self.model = manifest.get("model")
+        logger.info(f"[VisualIndex] Mapped {len(keys)} embeddings ({manifest['dim']}-d, {self.model})")
+
+    def _catalog_to_matrix(self, snapshot) -> np.ndarray:
+        """Catalog row -> matrix row (-1 = no embedding), rebuilt per catalog version."""
+        if self._row_map_version != (snapshot.version, self._signature):
+            self._catalog_rows = np.array([self._key_rows.get(key, -1) for key in snapshot.keys], dtype=np.int64)
+            self._row_map_version = (snapshot.version, self._signature)
+        return self._catalog_rows
+
+    @property
+    def available(self) -> bool:
+        return self._ensure_loaded()
+
+    def search(
+        self,
+        queries: np.ndarray,
+        categories: List[Optional[str]],
+        max_price: Optional[int] = None,
+        k: int = settings.visual_top_k
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Most similar catalog items for each query embedding.
+
+        Args:
+            queries: (q, dim) unit-length embeddings
+            categories: Catalog category per query (None = any)
+            max_price: Only items at or under this price
+            k: Results per query
+
+        Returns:
+            Per query, catalog item dicts with a "similarity" field, best first
+        """
+        if not self._ensure_loaded():
+            return [[] for _ in range(len(queries))]
+
+        snapshot = catalog.snapshot
+        to_matrix = self._catalog_to_matrix(snapshot)
+        queries = np.asarray(queries, dtype=np.float32)
+
+        # Queries sharing a category share one gather + one matmul
+        by_category: Dict[Optional[str], List[int]] = {}
+        for i, category in enumerate(categories):
+            by_category.setdefault(category, []).append(i)
+        per_query: Dict[int, List[Dict[str, Any]]] = {}
+
+        for category, query_ids in by_category.items():
+            catalog_rows = snapshot.query_rows(category=category, max_price=max_price)
+            matrix_rows = to_matrix[catalog_rows] if len(catalog_rows) else np.empty(0, dtype=np.int64)
+            has_vec = matrix_rows >= 0
+            catalog_rows, matrix_rows = catalog_rows[has_vec], matrix_rows[has_vec]
+            if len(matrix_rows) == 0:
+                for qi in query_ids:
+                    per_query[qi] = []
+                continue
+
+            # Sorted gather reads the memmap sequentially
+            order = np.argsort(matrix_rows)
+            catalog_rows, matrix_rows = catalog_rows[order], matrix_rows[order]
+            vectors = np.asarray(self._matrix[matrix_rows], dtype=np.float32)
+            sims = queries[query_ids] @ vectors.T   # (q, n)
+
+            top = min(k, sims.shape[1])
+            best = np.argpartition(-sims, top - 1, axis=1)[:, :top]
+            for j, (qi, cols) in enumerate(zip(query_ids, best)):
+                cols = cols[np.argsort(-sims[j, cols])]
+                per_query[qi] = [
+                    dict(snapshot.item(catalog_rows[c]), similarity=round(float(sims[j, c]), 4))
+                    for c in cols
+                ]
+
+        return [per_query.get(i, []) for i in range(len(queries))]
+
+
+def _load_item_image(image_ref: str, base_dir: Path) -> Image.Image:
+    if image_ref.startswith(("http://", "https://")):
+        import requests
+        response = requests.get(image_ref, timeout=20)
+        response.raise_for_status()
+        return Image.open(io.BytesIO(response.content)).convert("RGB")
+    return Image.open(base_dir / image_ref).convert("RGB")
+
+
+def build_index(index_dir: Path = settings.visual_index_dir, batch_size: int = 64) -> int:
+    """
+    Embed every catalog item that has an "image" and write the index.
+
+    Args:
+        index_dir: Output directory
+        batch_size: Images per encoder pass
+
+    Returns:
+        Number of items embedded
+    """
+    from backend.ai.vision.embedder import image_embedder
+
+    index_dir = Path(index_dir)
+    index_dir.mkdir(parents=True, exist_ok=True)
+    snapshot = catalog.snapshot
+    base_dir = catalog.path.parent
+    dim = image_embedder.dim
+
+    todo = [
+        (snapshot.keys[row], snapshot.extras[row]["image"])
+        for row in range(snapshot.size)
+        if snapshot.extras[row] and snapshot.extras[row].get("image")
+    ]
+
+    # Each build writes a new matrix file; swapping the manifest is what readers watch,
+    # and processes still mapping the old file keep a valid mapping until they reload
+    matrix_name = f"embeddings-{int(time.time())}.f16"
+    matrix = np.memmap(index_dir / matrix_name, dtype=np.float16, mode="w+", shape=(max(1, len(todo)), dim))
+    keys: List[str] = []
+    start = time.time()
+    for i in range(0, len(todo), batch_size):
+        batch_keys, images = [], []
+        for key, image_ref in todo[i:i + batch_size]:
+            try:
+                images.append(_load_item_image(image_ref, base_dir))
+                batch_keys.append(key)
+            except Exception as e:
+                logger.warning(f"[VisualIndex] Skipping {key}: {e}")
+        if not images:
+            continue
+        vectors = image_embedder.embed(images, batch_size=batch_size)
+        matrix[len(keys):len(keys) + len(vectors)] = vectors.astype(np.float16)
+        keys.extend(batch_keys)
+        logger.info(f"[VisualIndex] {len(keys)}/{len(todo)} embedded")
+    matrix.flush()
+    del matrix
+
+    manifest = {"dim": dim, "model": image_embedder.model_name, "matrix": matrix_name, "keys": keys, "built_at": time.time()}
+    tmp_manifest = index_dir / f".{MANIFEST_NAME}.tmp"
+    tmp_manifest.write_text(json.dumps(manifest))
+    tmp_manifest.replace(index_dir / MANIFEST_NAME)
+    for old in index_dir.glob("embeddings-*.f16"):
+        if old.name != matrix_name:
+            old.unlink(missing_ok=True)
+    logger.info(f"[VisualIndex] Built {len(keys)} embeddings in {time.time() - start:.1f}s")
+    return len(keys)
+
+
+# Global instance
+visual_index = VisualIndex()
+
+
+if __name__ == "__main__":
+    build_index(Path(sys.argv[1]) if len(sys.argv) > 1 else settings.visual_index_dir)
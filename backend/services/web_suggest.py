@@ -1,60 +1,238 @@
 """
 Web-based furniture suggestion service using DuckDuckGo search.
 No API keys required, with caching and offline fallback.
+
+Suggestions are cached per process in memory (TTL + LRU). The JSON file is
+only read once at startup and rewritten behind the scenes (debounced, atomic
+rename), and entries past their TTL are still served while a background
+refresh fetches new ones - hot categories never wait on disk or DuckDuckGo.
+
+On a miss the vendor queries run concurrently (DDGS is synchronous, so each
+runs on a small thread pool with one reused session per thread). Cancelling
+the asyncio side cannot stop a call already running on a worker, so each
+session carries an HTTP timeout that bounds the call inside the thread, and
+the per-query timeout only starts once a worker picks the query up - time
+spent queued behind other queries is not charged to it. Queries still
+waiting for a worker once max_results distinct domains are collected are
+dropped from the queue.
+
+Searches never depend on the budget, so the cache is keyed on the normalized
+query alone and stores a raw result pool; budget filtering and ranking by
+approx_price happen per request on top of it.
 """
+import asyncio
+import atexit
 import json
+import math
+import os
 import re
+import threading
 import time
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from datetime import datetime, timedelta
-from typing import List, Dict, Optional
+from datetime import datetime
+from typing import Any, List, Dict, Optional, Tuple
+from urllib.parse import urlparse
 from ddgs import DDGS
+from backend.core.config import settings
 from backend.services.logging import logger
 
 
-class WebSuggest:
-    """Search for furniture suggestions using DuckDuckGo"""
+class SuggestCache:
+    """In-memory TTL/LRU cache of search results with write-behind persistence."""
     
-    def __init__(self, cache_file: str = "storage/suggest_cache.json"):
+    def __init__(
+        self,
+        cache_file: Path = settings.storage_dir / "suggest_cache.json",
+        ttl_hours: float = settings.suggest_cache_ttl_hours,
+        stale_hours: float = settings.suggest_cache_stale_hours,
+        max_entries: int = settings.suggest_cache_max_entries,
+        flush_delay_s: float = settings.suggest_cache_flush_s
+    ):
         self.cache_file = Path(cache_file)
-        self.cache_ttl_hours = 24
-        self._ensure_cache_dir()
+        self.ttl_s = ttl_hours * 3600
+        self.stale_s = max(stale_hours * 3600, self.ttl_s)
+        self.max_entries = max_entries
+        self.flush_delay_s = flush_delay_s
+        self._entries: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._flush_timer: Optional[threading.Timer] = None
+        self._dirty = False
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self._load()
+        atexit.register(self.flush)
     
-    def _ensure_cache_dir(self):
-        """Create cache directory if not exists"""
-        self.cache_file.parent.mkdir(parents=True, exist_ok=True)
-        if not self.cache_file.exists():
-            self.cache_file.write_text("{}")
-    
-    def _load_cache(self) -> dict:
-        """Load cache from file"""
+    def _load(self):
+        """Read the persisted cache once (accepts the old ISO-timestamp format)."""
         try:
             with open(self.cache_file, 'r') as f:
-                return json.load(f)
+                data = json.load(f)
+        except FileNotFoundError:
+            return
         except Exception as e:
             logger.warning(f"Failed to load cache: {e}")
-            return {}
+            return
+        
+        entries = []
+        for key, entry in data.items():
+            try:
+                cached_at = datetime.fromisoformat(entry["timestamp"]).timestamp()
+            except (KeyError, TypeError, ValueError):
+                continue
+            entries.append((cached_at, key, entry["results"]))
+        
+        # Oldest first so the LRU order matches age
+        for cached_at, key, results in sorted(entries)[-self.max_entries:]:
+            self._entries[key] = {"results": results, "cached_at": cached_at}
+        logger.info(f"Loaded {len(self._entries)} cached suggestion sets")
     
-    def _save_cache(self, cache: dict):
-        """Save cache to file"""
+    def get(self, key: str) -> Optional[Dict]:
+        """
+        Look up an entry.
+        
+        Returns:
+            {"results": [...], "age_s": float, "fresh": bool} or None if absent/expired
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            age = time.time() - entry["cached_at"]
+            if age > self.stale_s:
+                del self._entries[key]
+                self._schedule_flush()
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            fresh = age <= self.ttl_s
+            if fresh:
+                self.hits += 1
+            else:
+                self.stale_hits += 1
+            return {"results": entry["results"], "age_s": age, "fresh": fresh}
+    
+    def age(self, key: str) -> Optional[float]:
+        """Seconds since an entry was cached (None if absent). Not counted as a lookup."""
+        with self._lock:
+            entry = self._entries.get(key)
+            return time.time() - entry["cached_at"] if entry else None
+    
+    def set(self, key: str, results: List[Dict]):
+        with self._lock:
+            self._entries[key] = {"results": results, "cached_at": time.time()}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._schedule_flush()
+    
+    def _schedule_flush(self):
+        """Debounce: many updates in a burst become one write."""
+        self._dirty = True
+        if self._flush_timer is None:
+            self._flush_timer = threading.Timer(self.flush_delay_s, self.flush)
+            self._flush_timer.daemon = True
+            self._flush_timer.start()
+    
+    def flush(self):
+        """Write the cache to disk (temp file + atomic rename)."""
+        with self._lock:
+            self._flush_timer = None
+            if not self._dirty:
+                return
+            snapshot = {
+                key: {
+                    "results": entry["results"],
+                    "timestamp": datetime.fromtimestamp(entry["cached_at"]).isoformat()
+                }
+                for key, entry in self._entries.items()
+            }
+            self._dirty = False
+        
         try:
-            with open(self.cache_file, 'w') as f:
-                json.dump(cache, f, indent=2)
+            self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.cache_file.with_name(f".{self.cache_file.name}.{os.getpid()}.tmp")
+            with open(tmp_path, 'w') as f:
+                json.dump(snapshot, f)
+            tmp_path.replace(self.cache_file)
         except Exception as e:
             logger.warning(f"Failed to save cache: {e}")
+            with self._lock:
+                self._schedule_flush()
     
-    def _get_cache_key(self, category: str, budget: int) -> str:
-        """Generate cache key"""
-        return f"{category.lower()}_{budget}"
+    def hit_rate(self) -> float:
+        """Share of lookups answered from memory (fresh or stale)."""
+        lookups = self.hits + self.stale_hits + self.misses
+        return round((self.hits + self.stale_hits) / lookups, 3) if lookups else 0.0
     
-    def _is_cache_valid(self, cached_time: str) -> bool:
-        """Check if cache entry is still valid (within TTL)"""
-        try:
-            cached = datetime.fromisoformat(cached_time)
-            expiry = cached + timedelta(hours=self.cache_ttl_hours)
-            return datetime.now() < expiry
-        except:
-            return False
+    def stats(self) -> Dict:
+        with self._lock:
+            now = time.time()
+            fresh = sum(1 for e in self._entries.values() if now - e["cached_at"] <= self.ttl_s)
+            return {
+                "entries": len(self._entries),
+                "fresh": fresh,
+                "stale": len(self._entries) - fresh,
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "hit_rate": self.hit_rate()
+            }
+
+
+def normalize_query(text: str) -> str:
+    """Cache key for a search: lowercase words, punctuation and extra spaces dropped."""
+    return " ".join(re.findall(r"[a-z0-9]+", text.lower()))
+
+
+def rank_for_budget(results: List[Dict], budget: Optional[int], max_results: int) -> List[Dict]:
+    """
+    Filter a cached result pool down to what fits the budget.
+    
+    Priced results over budget are dropped; affordable priced results come
+    first (most expensive first - the best item the budget buys), then
+    unpriced ones in search order.
+    """
+    if not budget:
+        return results[:max_results]
+    priced = [r for r in results if r.get("approx_price") and r["approx_price"] <= budget]
+    priced.sort(key=lambda r: r["approx_price"], reverse=True)
+    unpriced = [r for r in results if not r.get("approx_price")]
+    return (priced + unpriced)[:max_results]
+
+
+_sessions = threading.local()
+
+
+def _session() -> DDGS:
+    """DDGS session for the current worker thread, created once and reused."""
+    ddgs = getattr(_sessions, "ddgs", None)
+    if ddgs is None:
+        # HTTP-level timeout: the only thing that frees a worker stuck on a slow request
+        ddgs = _sessions.ddgs = DDGS(timeout=max(1, math.ceil(settings.suggest_query_timeout_s)))
+    return ddgs
+
+
+class WebSuggest:
+    """Search for furniture suggestions using DuckDuckGo"""
+    
+    def __init__(self, cache: Optional[SuggestCache] = None):
+        self.cache = cache or SuggestCache()
+        self.query_timeout_s = settings.suggest_query_timeout_s
+        # Raw results fetched (and cached) per query, enough for any request's filtering
+        self.pool_size = settings.suggest_pool_size
+        self._executor = ThreadPoolExecutor(max_workers=settings.suggest_workers, thread_name_prefix="ddgs")
+        # cache key -> background refresh task for a stale entry
+        self._refreshing: Dict[str, asyncio.Task] = {}
+        # Requests per cache key, so the warmer knows what is in demand
+        self.demand: Counter = Counter()
+    
+    def _get_cache_key(self, category: str) -> str:
+        """Generate cache key (the budget never changes what is searched)"""
+        return normalize_query(category)
     
     def _extract_price(self, text: str) -> Optional[int]:
         """Extract approximate price from text snippet"""
@@ -76,118 +254,212 @@ class WebSuggest:
                     continue
         return None
     
-    def search_suggestions(self, category: str, budget: int = 50000, max_results: int = 5) -> Dict:
+    @staticmethod
+    def _cacheable(results: List[Dict], query_stats: List[Dict]) -> bool:
+        """
+        Whether a fetch is worth caching. _timed_query swallows timeouts and
+        errors, so offline or rate-limited fetches come back as an empty pool
+        rather than an exception - caching that would replace good entries
+        with [] for a full TTL.
+        """
+        return bool(results) and any(q["status"] == "ok" for q in query_stats)
+    
+    async def _refresh(self, cache_key: str, category: str):
+        try:
+            results, query_stats = await self._fetch(category, self.pool_size)
+            if not self._cacheable(results, query_stats):
+                logger.warning(f"Background refresh for {category} got no results, keeping the cached entry")
+                return
+            self.cache.set(cache_key, results)
+            logger.info(f"✓ Refreshed stale suggestions for {category}")
+        except Exception as e:
+            logger.warning(f"Background refresh for {category} failed: {e}")
+    
+    def frequent_queries(self, n: int) -> List[str]:
+        """Most requested cache keys (planner targets, detected categories)."""
+        return [key for key, _ in self.demand.most_common(n)]
+    
+    async def warm(self, query: str) -> int:
+        """Fetch a query's result pool and cache it. Returns the number of results."""
+        cache_key = self._get_cache_key(query)
+        results, query_stats = await self._fetch(cache_key, self.pool_size)
+        if not self._cacheable(results, query_stats):
+            statuses = ", ".join(sorted({q["status"] for q in query_stats}))
+            raise RuntimeError(f"No results ({statuses}), keeping the cached entry")
+        self.cache.set(cache_key, results)
+        return len(results)
+    
+    def _schedule_refresh(self, cache_key: str, category: str):
+        if cache_key in self._refreshing:
+            return
+        task = asyncio.get_running_loop().create_task(self._refresh(cache_key, category))
+        self._refreshing[cache_key] = task
+        task.add_done_callback(lambda _: self._refreshing.pop(cache_key, None))
+    
+    async def search_suggestions(self, category: str, budget: int = 50000, max_results: int = 5) -> Dict:
         """
         Search for furniture suggestions using DuckDuckGo
         
         Args:
             category: Furniture category (sofa, bed, table, chair, tv)
-            budget: User's budget (used for cache key)
+            budget: User's budget (filters/ranks results by approx_price)
             max_results: Number of results to return
         
         Returns:
             {
                 "results": [...],
-                "cache": "hit" | "miss",
-                "latency_ms": int
+                "source": "web",
+                "cache": {"status": "hit" | "stale" | "miss", "key": str, "hit_rate": float},
+                "latency_ms": int,
+                "queries": [...]   # per-query status/latency, misses only
             }
         """
         start_time = time.time()
         
-        # Check cache
-        cache_key = self._get_cache_key(category, budget)
-        cache = self._load_cache()
+        # Check cache (memory only - no disk I/O on the request path)
+        cache_key = self._get_cache_key(category)
+        self.demand[cache_key] += 1
+        if len(self.demand) > 2000:
+            # Long tail of one-off queries - keep the popular half
+            self.demand = Counter(dict(self.demand.most_common(1000)))
+        cached = self.cache.get(cache_key)
         
-        if cache_key in cache and self._is_cache_valid(cache[cache_key].get("timestamp", "")):
-            logger.info(f"✓ Cache hit for {category}")
-            latency = int((time.time() - start_time) * 1000)
-            return {
-                "results": cache[cache_key]["results"],
-                "cache": "hit",
-                "latency_ms": latency
-            }
+        query_stats = None
+        if cached is not None:
+            status = "hit"
+            pool = cached["results"]
+            if not cached["fresh"]:
+                # Serve what we have; fetch a fresh copy in the background
+                status = "stale"
+                self._schedule_refresh(cache_key, cache_key)
+            logger.info(f"✓ Cache {status} for {cache_key}")
+        else:
+            status = "miss"
+            try:
+                pool, query_stats = await self._fetch(cache_key, max(max_results, self.pool_size))
+                # An empty pool is not cached, so the next request tries again
+                if self._cacheable(pool, query_stats):
+                    self.cache.set(cache_key, pool)
+            except Exception as e:
+                logger.error(f"DuckDuckGo search failed: {e}")
+                pool = []
+        
+        response = {
+            "results": rank_for_budget(pool, budget, max_results),
+            "source": "web",
+            "cache": {"status": status, "key": cache_key, "hit_rate": self.cache.hit_rate()},
+            "latency_ms": int((time.time() - start_time) * 1000)
+        }
+        if query_stats is not None:
+            response["queries"] = query_stats
+        return response
+    
+    def _run_query(self, query: str, max_results: int, on_start=None) -> List[Dict]:
+        if on_start is not None:
+            on_start()
+        return list(_session().text(query, region='in-en', max_results=max_results * 2))
+    
+    async def _timed_query(self, query: str, max_results: int) -> Dict[str, Any]:
+        """
+        Run one DDGS query on the pool. The per-query timeout starts when a
+        worker picks it up; until then it is only queued (and still cancellable).
+        """
+        loop = asyncio.get_running_loop()
+        started = asyncio.Event()
+        future = loop.run_in_executor(
+            self._executor, self._run_query, query, max_results,
+            lambda: loop.call_soon_threadsafe(started.set)
+        )
+        outcome = {"query": query, "results": [], "status": "ok"}
+        picked_up = asyncio.ensure_future(started.wait())
+        try:
+            await asyncio.wait({future, picked_up}, return_when=asyncio.FIRST_COMPLETED)
+            start = time.time()
+            outcome["results"] = await asyncio.wait_for(future, self.query_timeout_s)
+        except asyncio.TimeoutError:
+            outcome["status"] = "timeout"
+            logger.warning(f"Query '{query}' timed out after {self.query_timeout_s}s")
+        except asyncio.CancelledError:
+            # Still queued: drop it so it never occupies a worker
+            future.cancel()
+            raise
+        except Exception as e:
+            outcome["status"] = "error"
+            logger.warning(f"Query '{query}' failed: {e}")
+        finally:
+            picked_up.cancel()
+        outcome["latency_ms"] = int((time.time() - start) * 1000)
+        return outcome
+    
+    async def _fetch(self, category: str, max_results: int) -> Tuple[List[Dict], List[Dict]]:
+        """
+        Query DuckDuckGo for a category.
         
-        # Search DuckDuckGo
+        Returns:
+            (results, per-query stats)
+        """
         logger.info(f"Searching DuckDuckGo for: {category}")
         results = []
+        seen_domains = set()
         
+        # Build multiple search query variations (prioritizing requested vendors)
+        queries = [
+            f"{category} amazon india",
+            f"{category} flipkart furniture",
+            f"{category} ikea india",
+            f"{category} damro india",
+            f"buy {category} online amazon flipkart"
+        ]
+        
+        tasks = {asyncio.ensure_future(self._timed_query(q, max_results)): q for q in queries}
+        query_stats = []
         try:
-            # Build multiple search query variations (prioritizing requested vendors)
-            queries = [
-                f"{category} amazon india",
-                f"{category} flipkart furniture",
-                f"{category} ikea india",
-                f"{category} damro india",
-                f"buy {category} online amazon flipkart"
-            ]
-            
-            # Use DuckDuckGo search
-            for query in queries:
-                if len(results) >= max_results:
-                    break
+            for next_done in asyncio.as_completed(list(tasks)):
+                outcome = await next_done
+                query_stats.append({k: outcome[k] for k in ("query", "status", "latency_ms")})
+                if outcome["results"]:
+                    logger.info(f"✓ Query '{outcome['query']}' returned {len(outcome['results'])} results in {outcome['latency_ms']}ms")
                 
-                try:
-                    with DDGS() as ddgs:
-                        search_results = list(ddgs.text(query, region='in-en', max_results=max_results * 2))
+                for result in outcome["results"]:
+                    if len(results) >= max_results:
+                        break
+                    
+                    # Extract domain
+                    try:
+                        domain = urlparse(result['href']).netloc.replace('www.', '')
+                    except:
+                        domain = "unknown"
+                    
+                    # Skip duplicates from same domain (across all queries)
+                    if domain in seen_domains:
+                        continue
+                    seen_domains.add(domain)
+                    
+                    # Extract approximate price from snippet
+                    snippet = result.get('body', '')
+                    approx_price = self._extract_price(snippet)
                     
-                    if search_results:
-                        logger.info(f"✓ Query '{query}' returned {len(search_results)} results")
-                        # Process results
-                        seen_domains = set()
-                        for result in search_results:
-                            if len(results) >= max_results:
-                                break
-                            
-                            # Extract domain
-                            try:
-                                from urllib.parse import urlparse
-                                domain = urlparse(result['href']).netloc.replace('www.', '')
-                            except:
-                                domain = "unknown"
-                            
-                            # Skip duplicates from same domain
-                            if domain in seen_domains:
-                                continue
-                            seen_domains.add(domain)
-                            
-                            # Extract approximate price from snippet
-                            snippet = result.get('body', '')
-                            approx_price = self._extract_price(snippet)
-                            
-                            results.append({
-                                "title": result.get('title', 'No title'),
-                                "link": result['href'],
-                                "snippet": snippet[:200] if snippet else "No description available",
-                                "source": "duckduckgo",
-                                "domain": domain,
-                                "approx_price": approx_price
-                            })
-                        
-                        # If we got enough results, break
-                        if len(results) >= max_results:
-                            break
+                    results.append({
+                        "title": result.get('title', 'No title'),
+                        "link": result['href'],
+                        "snippet": snippet[:200] if snippet else "No description available",
+                        "source": "duckduckgo",
+                        "domain": domain,
+                        "approx_price": approx_price
+                    })
                 
-                except Exception as e:
-                    logger.warning(f"Query '{query}' failed: {e}")
-                    continue
-            
-            # Cache results
-            cache[cache_key] = {
-                "results": results,
-                "timestamp": datetime.now().isoformat()
-            }
-            self._save_cache(cache)
-            
-            logger.info(f"✓ Found {len(results)} suggestions for {category}")
-            
-        except Exception as e:
-            logger.error(f"DuckDuckGo search failed: {e}")
-            results = []
-        
-        latency = int((time.time() - start_time) * 1000)
+                # Enough distinct domains - stop waiting on the slower queries
+                if len(results) >= max_results:
+                    break
+        finally:
+            for task, query in tasks.items():
+                if not task.done():
+                    task.cancel()
+                    query_stats.append({"query": query, "status": "cancelled", "latency_ms": None})
         
-        return {
-            "results": results,
-            "cache": "miss",
-            "latency_ms": latency
-        }
+        logger.info(f"✓ Found {len(results)} suggestions for {category}")
+        return results, query_stats
+
+
+# Global instance (one cache per process)
+web_suggest = WebSuggest()
@@ -1,9 +1,15 @@
 """
 Global GPU Memory Manager.
 Ensures only one heavy model is loaded on VRAM at a time.
+
+Every GPU model (YOLO, SD img2img, SD inpaint) holds gpu_lock from
+ensure_gpu() through the end of its inference. In low_vram mode ensure_gpu()
+offloads whatever else is resident, so without the lock an upload's YOLO pass
+could pull the diffusion pipeline off the GPU mid-denoise.
 """
 import torch
 import gc
+import threading
 from typing import Any, Optional
 from backend.services.logging import logger
 from backend.core.config import settings
@@ -13,6 +19,8 @@ class MemoryManager:
     
     _current_model: Optional[str] = None
     _loaded_models: dict = {}
+    # Process-wide: held across ensure_gpu() + inference. Reentrant so a holder can (re)load its model.
+    gpu_lock = threading.RLock()
 
     @classmethod
     def register_model(cls, name: str, model_instance: Any):
@@ -7,6 +7,7 @@ document.addEventListener("DOMContentLoaded", () => {
     file: null,
     serverPath: null,   // Current image (result or original)
     originalPath: null, // Always the original uploaded image
+    assetId: null,      // Server asset id of the original upload (precomputed results)
     maskPath: null,
     isProcessing: false,
     currentTab: 'create',
@@ -172,6 +173,7 @@ document.addEventListener("DOMContentLoaded", () => {
 
     function handleFile(file) {
       state.file = file;
+      state.assetId = null;
       const reader = new FileReader();
       reader.onload = (e) => {
         state.originalPath = e.target.result; // Store base64 for comparison
@@ -205,6 +207,13 @@ document.addEventListener("DOMContentLoaded", () => {
       const res = await fetch(`${BACKEND_URL}/api/upload`, { method: 'POST', body: formData });
       const data = await res.json();
       state.serverPath = data.image_path; // Backend relative path
+      state.assetId = data.asset_id || null;
+
+      // Room type is classified in the background - wait for that stage only
+      if (state.assetId && !data.detected_room_type) {
+        const assetRes = await fetch(`${BACKEND_URL}/api/assets/${state.assetId}?wait=room`);
+        Object.assign(data, await assetRes.json());
+      }
 
       // Handle Auto-Detect Logic
       if (data.detected_room_type) {
@@ -407,7 +416,9 @@ document.addEventListener("DOMContentLoaded", () => {
       try {
         // Re-use detection logic
         const formData = new FormData();
-        formData.append('image', state.file);
+        // Reuse the upload (and its precomputed detections) when we have it
+        if (state.assetId) formData.append('asset_id', state.assetId);
+        else formData.append('image', state.file);
         formData.append('budget', 50000);
         const res = await fetch(`${BACKEND_URL}/vision/detect`, { method: 'POST', body: formData });
         const data = await res.json();